@@ -0,0 +1,101 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Hashable, Tuple
+
+
+class ResultCache:
+    """
+    In-process LRU cache of query results with a time to live.
+    Entries are valid only for the dataset version, for which they were stored.
+    """
+    MISSING = object()
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        :param maxsize: int - maximum number of entries, 0 disables the cache
+        :param ttl: float - seconds for which an entry is valid
+        """
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version) -> Any:
+        """
+        Get a result from the cache.
+        :param key: Hashable
+        :param version: version of the dataset
+        :return: the result or ResultCache.MISSING
+        """
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+            entry: Tuple[float, Any] = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return self.MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, version, value: Any) -> None:
+        """
+        Store a result in the cache, evicting the least recently used entries.
+        :param key: Hashable
+        :param version: version of the dataset
+        :param value: Any
+        :return: None
+        """
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters.
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Counters of the cache.
+        :return: dict
+        """
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                version=self._version,
+            )
@@ -1,4 +1,7 @@
-from .abstract import ReaderEngine
+from .abstract import ReaderEngine, UnsupportedQuery
 from .sqlite import SqliteEngine
 from .mysql import MySQLEngine
 from .postgre import PostgreSQLEngine
+from .asynchronous import AsyncReaderEngine, AsyncSqliteEngine, AsyncMySQLEngine, AsyncPostgreSQLEngine
+from .memory import MemoryEngine, AsyncMemoryEngine
+from .snapshot import SnapshotEngine, AsyncSnapshotEngine
@@ -1,4 +1,33 @@
+import datetime
+from typing import Dict, Iterator, List, Tuple
+
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.sql.elements import TextClause
+
+
+from ..schemas import Birthday, TopSellingProduct, ProductSales, LastOrderPerCustomer
+
+
+class UnsupportedQuery(NotImplementedError):
+    """
+    Query, which an engine can not answer, since it does not keep the data of the query.
+    """
+
+
 class ReaderEngine:
+    # Columns of the date table, which select the period of a time grain within a year.
+    GRAINS = {
+        "year": None,
+        "quarter": "quarter_id",
+        "month": "month_id",
+        "week": "week_id",
+    }
+
+    # Statements are built once for their SQL and reused by every call, so that the text is not parsed again,
+    # and the SQLAlchemy engine finds their compiled form for its dialect by the cache key of the construct.
+    _statements: Dict[str, TextClause] = dict()
+
     @property
     def reader(self):
         return self._reader
@@ -6,11 +35,311 @@ class ReaderEngine:
     def __init__(self, reader):
         self._reader = reader
 
-    def read_birthdays(self, date):
-        raise NotImplementedError
+    def dataset_version_statement(self) -> Tuple:
+        """
+        Statement and parameters of the query for the version of the loaded dataset.
+        :return: Tuple[TextClause, dict]
+        """
+        return self.statement("SELECT version FROM dataset_version WHERE id = 1"), dict()
+
+    def birthdays_statement(self, date: datetime.date) -> Tuple:
+        """
+        Statement and parameters of the query for customers, which have birthday on the given date.
+        :param date: datetime.date
+        :return: Tuple[TextClause, dict]
+        """
+        sql = """
+        SELECT customer_id, name
+        FROM customer
+        WHERE birth_month_day = :month_day
+        ORDER BY customer_id ASC
+        """
+        params = dict(month_day=date.month * 100 + date.day)
+
+        return self.statement(sql), params
+
+    def top_selling_products_statement(self, year: int) -> Tuple:
+        """
+        Statement and parameters of the query for the top 10 selling products for a specific year.
+        :param year: int
+        :return: Tuple[TextClause, dict]
+        """
+        sql = """
+        SELECT p.product, s.quantity
+        FROM product_year_sales s
+        JOIN product p ON p.product_id = s.product_id
+        WHERE s.year_id = :year
+        ORDER BY s.quantity DESC, s.product_id ASC
+        LIMIT 10
+        """
+        params = dict(year=year)
+
+        return self.statement(sql), params
+
+    def top_selling_products_by_year_statement(self, years: List[int], limit: int = 10) -> Tuple:
+        """
+        Statement and parameters of the query for the top selling products of every year of a list.
+        The products are ranked within every year with ROW_NUMBER(), so that all years are read with one query.
+        The rows are year, product and quantity, ordered by year and by rank.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Tuple[TextClause, dict]
+        """
+        sql = """
+        SELECT year_id, product, quantity
+        FROM (
+            SELECT s.year_id, p.product, s.quantity,
+                ROW_NUMBER() OVER (PARTITION BY s.year_id ORDER BY s.quantity DESC, s.product_id ASC) AS position
+            FROM product_year_sales s
+            JOIN product p ON p.product_id = s.product_id
+            WHERE s.year_id IN :years
+        ) ranked
+        WHERE position <= :limit
+        ORDER BY year_id ASC, position ASC
+        """
+        params = dict(years=list(years), limit=limit)
+
+        return self.statement(sql, "years"), params
+
+    def top_products_statement(self, limit: int, year: int, grain: str = "year", period: int = None,
+                               outlet: int = None, category: str = None) -> Tuple:
+        """
+        Statement and parameters of the query for the top selling products of a period from the sales rollup.
+        The period is selected by the columns of the date table, and the products are ranked by quantity.
+        :param limit: int - number of products
+        :param year: int
+        :param grain: str - year, quarter, month or week
+        :param period: int | None - quarter, month or week of the year, when the grain is not year
+        :param outlet: int | None - sales_outlet_id
+        :param category: str | None - product_category
+        :return: Tuple[TextClause, dict]
+        """
+        if grain not in self.GRAINS:
+            raise ValueError("Unknown grain '{}'.".format(grain))
+
+        sql = """
+        SELECT p.product_id, p.product, p.product_category, SUM(s.quantity), SUM(s.revenue)
+        FROM sales_rollup s
+        JOIN date d ON d.transaction_date = s.transaction_date
+        JOIN product p ON p.product_id = s.product_id
+        WHERE d.year_id = :year
+        """
+        params = dict(year=year, limit=limit)
+
+        if self.GRAINS[grain] is not None:
+            if period is None:
+                raise ValueError("The period of the {} is missing.".format(grain))
+            sql += "AND d.{} = :period\n".format(self.GRAINS[grain])
+            params["period"] = period
+
+        if outlet is not None:
+            sql += "AND s.sales_outlet_id = :outlet\n"
+            params["outlet"] = outlet
+
+        if category is not None:
+            sql += "AND p.product_category = :category\n"
+            params["category"] = category
+
+        sql += """GROUP BY p.product_id, p.product, p.product_category
+        ORDER BY SUM(s.quantity) DESC, p.product_id ASC
+        LIMIT :limit
+        """
+
+        return self.statement(sql), params
+
+    def last_order_per_customer_statement(self, cursor: int = None, limit: int = None) -> Tuple:
+        """
+        Statement and parameters of the query for the last order per customer with their email.
+        Only customers after the cursor are selected, and at most `limit` of them when it is given.
+        :param cursor: int | None - customer_id of the last customer of the previous page
+        :param limit: int | None - maximum number of customers, all of them when None
+        :return: Tuple[TextClause, dict]
+        """
+        sql = """
+        SELECT c.customer_id, c.email, l.last_order_date
+        FROM customer_last_order l
+        JOIN customer c ON c.customer_id = l.customer_id
+        """
+        params = dict()
+
+        if cursor is not None:
+            sql += "WHERE l.customer_id > :cursor\n"
+            params["cursor"] = cursor
+
+        sql += "ORDER BY l.customer_id ASC\n"
+
+        if limit is not None:
+            sql += "LIMIT :limit\n"
+            params["limit"] = limit
+
+        return self.statement(sql), params
+
+    @classmethod
+    def statement(cls, sql: str, *expanding: str) -> TextClause:
+        """
+        Statement of a query, which is built on the first call with its SQL, and reused afterwards.
+        :param sql: str
+        :param expanding: str - names of the parameters, which are lists of values of IN
+        :return: TextClause
+        """
+        statement = cls._statements.get(sql)
+        if statement is None:
+            statement = text(sql)
+            if expanding:
+                statement = statement.bindparams(*(bindparam(name, expanding=True) for name in expanding))
+            cls._statements[sql] = statement
+        return statement
+
+    def execute(self, statement: TextClause, params: dict, **options):
+        """
+        Execute a statement in the session of the reader.
+        :param statement: TextClause
+        :param params: dict
+        :param options: execution options
+        :return: sqlalchemy.engine.Result
+        """
+        if options:
+            return self.reader.session.execute(statement, params, execution_options=options)
+        return self.reader.session.execute(statement, params)
+
+    @classmethod
+    def format_date(cls, value) -> str:
+        """
+        Format a date, which may be returned as a string by the driver.
+        :param value: datetime.date | str
+        :return: str
+        """
+        if isinstance(value, str):
+            return value
+        return value.strftime('%Y-%m-%d')
+
+    # Rows come from the loaded database, so the models are constructed without validation.
+
+    @classmethod
+    def to_birthdays(cls, rows) -> List[Birthday]:
+        result = []
+        for row in rows:
+            result.append(Birthday.model_construct(
+                customer_id=row[0],
+                customer_first_name=row[1]
+            ))
+        return result
+
+    @classmethod
+    def to_top_selling_products(cls, rows) -> List[TopSellingProduct]:
+        result = []
+        for row in rows:
+            result.append(TopSellingProduct.model_construct(
+                product_name=row[0],
+                total_sales=row[1]
+            ))
+        return result
+
+    @classmethod
+    def to_top_selling_products_by_year(cls, rows, years: List[int]) -> Dict[int, List[TopSellingProduct]]:
+        result = {year: [] for year in years}
+        for row in rows:
+            result[row[0]].append(TopSellingProduct.model_construct(
+                product_name=row[1],
+                total_sales=row[2]
+            ))
+        return result
+
+    @classmethod
+    def to_product_sales(cls, rows) -> List[ProductSales]:
+        result = []
+        for row in rows:
+            result.append(ProductSales.model_construct(
+                product_id=row[0],
+                product_name=row[1],
+                product_category=row[2],
+                quantity=int(row[3]),
+                revenue=round(float(row[4]), 2)
+            ))
+        return result
+
+    @classmethod
+    def to_last_order_per_customer(cls, rows) -> List[LastOrderPerCustomer]:
+        result = []
+        for row in rows:
+            result.append(LastOrderPerCustomer.model_construct(
+                customer_id=row[0],
+                customer_email=row[1],
+                last_order_date=cls.format_date(row[2])
+            ))
+        return result
+
+    def read_dataset_version(self) -> int:
+        """
+        Version of the loaded dataset, which is increased by every load.
+        :return: int
+        """
+        version = self.execute(*self.dataset_version_statement()).scalar()
+        return version or 0
+
+    def read_birthdays(self, date: datetime.date) -> List[Birthday]:
+        """
+        Get list of customers, which have birthday on the given date.
+        :param date: datetime.date
+        :return: List[Birthday]
+        """
+        rows = self.execute(*self.birthdays_statement(date))
+        return self.to_birthdays(rows)
+
+    def read_top_selling_products(self, year: int) -> List[TopSellingProduct]:
+        """
+        The top 10 selling products for a specific year.
+        :param year: int
+        :return: List[TopSellingProduct]
+        """
+        rows = self.execute(*self.top_selling_products_statement(year))
+        return self.to_top_selling_products(rows)
+
+    def read_top_selling_products_by_year(self, years: List[int], limit: int = 10) \
+            -> Dict[int, List[TopSellingProduct]]:
+        """
+        The top selling products of every year of a list, which are read with one query.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Dict[int, List[TopSellingProduct]] - products of every year, empty for years without sales
+        """
+        rows = self.execute(*self.top_selling_products_by_year_statement(years, limit))
+        return self.to_top_selling_products_by_year(rows, years)
+
+    def read_top_products(self, limit: int, year: int, grain: str = "year", period: int = None,
+                          outlet: int = None, category: str = None) -> List[ProductSales]:
+        """
+        The top selling products of a period, of an outlet or a category, from the sales rollup.
+        :param limit: int - number of products
+        :param year: int
+        :param grain: str - year, quarter, month or week
+        :param period: int | None - quarter, month or week of the year, when the grain is not year
+        :param outlet: int | None - sales_outlet_id
+        :param category: str | None - product_category
+        :return: List[ProductSales]
+        """
+        rows = self.execute(*self.top_products_statement(limit, year, grain, period, outlet, category))
+        return self.to_product_sales(rows)
 
-    def read_top_selling_products(self, year):
-        raise NotImplementedError
+    def read_last_order_per_customer(self, cursor: int = None, limit: int = None) -> List[LastOrderPerCustomer]:
+        """
+        The last order per customer with their email.
+        :param cursor: int | None - customer_id of the last customer of the previous page
+        :param limit: int | None - maximum number of customers, all of them when None
+        :return: List[LastOrderPerCustomer]
+        """
+        rows = self.execute(*self.last_order_per_customer_statement(cursor, limit))
+        return self.to_last_order_per_customer(rows)
 
-    def read_last_order_per_customer(self):
-        raise NotImplementedError
+    def stream_last_order_per_customer(self, batch_size: int, cursor: int = None) \
+            -> Iterator[List[LastOrderPerCustomer]]:
+        """
+        The last order per customer with their email, which are fetched through a server-side cursor.
+        :param batch_size: int - number of rows fetched at once
+        :param cursor: int | None - customer_id of the last customer, which is already read
+        :return: Iterator[List[LastOrderPerCustomer]] - batches of at most `batch_size` customers
+        """
+        result = self.execute(
+            *self.last_order_per_customer_statement(cursor), stream_results=True, max_row_buffer=batch_size)
+        for rows in result.partitions(batch_size):
+            yield self.to_last_order_per_customer(rows)
@@ -0,0 +1,106 @@
+import datetime
+from typing import AsyncIterator, Dict, List
+
+
+from .abstract import ReaderEngine
+from .sqlite import SqliteEngine
+from .mysql import MySQLEngine
+from .postgre import PostgreSQLEngine
+from ..schemas import Birthday, TopSellingProduct, ProductSales, LastOrderPerCustomer
+
+
+class AsyncReaderEngine(ReaderEngine):
+    """
+    Engine, which executes the queries of a dialect engine through an AsyncSession,
+    so that the event loop is not blocked while the database works.
+    """
+
+    async def read_dataset_version(self) -> int:
+        """
+        Version of the loaded dataset, which is increased by every load.
+        :return: int
+        """
+        version = (await self.reader.session.execute(*self.dataset_version_statement())).scalar()
+        return version or 0
+
+    async def read_birthdays(self, date: datetime.date) -> List[Birthday]:
+        """
+        Get list of customers, which have birthday on the given date.
+        :param date: datetime.date
+        :return: List[Birthday]
+        """
+        rows = await self.reader.session.execute(*self.birthdays_statement(date))
+        return self.to_birthdays(rows)
+
+    async def read_top_selling_products(self, year: int) -> List[TopSellingProduct]:
+        """
+        The top 10 selling products for a specific year.
+        :param year: int
+        :return: List[TopSellingProduct]
+        """
+        rows = await self.reader.session.execute(*self.top_selling_products_statement(year))
+        return self.to_top_selling_products(rows)
+
+    async def read_top_selling_products_by_year(self, years: List[int], limit: int = 10) \
+            -> Dict[int, List[TopSellingProduct]]:
+        """
+        The top selling products of every year of a list, which are read with one query.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Dict[int, List[TopSellingProduct]] - products of every year, empty for years without sales
+        """
+        rows = await self.reader.session.execute(*self.top_selling_products_by_year_statement(years, limit))
+        return self.to_top_selling_products_by_year(rows, years)
+
+    async def read_top_products(self, limit: int, year: int, grain: str = "year", period: int = None,
+                                outlet: int = None, category: str = None) -> List[ProductSales]:
+        """
+        The top selling products of a period, of an outlet or a category, from the sales rollup.
+        :param limit: int - number of products
+        :param year: int
+        :param grain: str - year, quarter, month or week
+        :param period: int | None - quarter, month or week of the year, when the grain is not year
+        :param outlet: int | None - sales_outlet_id
+        :param category: str | None - product_category
+        :return: List[ProductSales]
+        """
+        rows = await self.reader.session.execute(
+            *self.top_products_statement(limit, year, grain, period, outlet, category))
+        return self.to_product_sales(rows)
+
+    async def read_last_order_per_customer(self, cursor: int = None, limit: int = None) \
+            -> List[LastOrderPerCustomer]:
+        """
+        The last order per customer with their email.
+        :param cursor: int | None - customer_id of the last customer of the previous page
+        :param limit: int | None - maximum number of customers, all of them when None
+        :return: List[LastOrderPerCustomer]
+        """
+        rows = await self.reader.session.execute(*self.last_order_per_customer_statement(cursor, limit))
+        return self.to_last_order_per_customer(rows)
+
+    async def stream_last_order_per_customer(self, batch_size: int, cursor: int = None) \
+            -> AsyncIterator[List[LastOrderPerCustomer]]:
+        """
+        The last order per customer with their email, which are fetched through a server-side cursor.
+        :param batch_size: int - number of rows fetched at once
+        :param cursor: int | None - customer_id of the last customer, which is already read
+        :return: AsyncIterator[List[LastOrderPerCustomer]] - batches of at most `batch_size` customers
+        """
+        result = await self.reader.session.stream(
+            *self.last_order_per_customer_statement(cursor),
+            execution_options=dict(stream_results=True, max_row_buffer=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield self.to_last_order_per_customer(rows)
+
+
+class AsyncSqliteEngine(AsyncReaderEngine, SqliteEngine):
+    pass
+
+
+class AsyncMySQLEngine(AsyncReaderEngine, MySQLEngine):
+    pass
+
+
+class AsyncPostgreSQLEngine(AsyncReaderEngine, PostgreSQLEngine):
+    pass
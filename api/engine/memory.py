@@ -0,0 +1,269 @@
+import asyncio
+import datetime
+import logging
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
+
+
+from snapshot import ColumnStore
+from .abstract import ReaderEngine, UnsupportedQuery
+from ..schemas import Birthday, TopSellingProduct, ProductSales, LastOrderPerCustomer
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MemoryEngine(ReaderEngine):
+    """
+    Engine, which answers the queries from NumPy columns of the tables, which are loaded once per process.
+    The columns are loaded again when the dataset version changes, which is checked every `refresh` seconds.
+    The statements and, when `use_fallback` is set, the queries which cannot be answered from memory,
+    are given to the SQL engine of the database.
+    """
+
+    # Column stores are shared by all readers of the process, one per connection string.
+    _stores: Dict[str, ColumnStore] = dict()
+    _stores_lock = threading.Lock()
+
+    @property
+    def fallback(self) -> ReaderEngine:
+        return self._fallback
+
+    def __init__(self, reader, fallback: ReaderEngine, refresh: float = 60.0, use_fallback: bool = True):
+        """
+        :param reader: DataReader
+        :param fallback: ReaderEngine - SQL engine of the database
+        :param refresh: float - seconds between the checks of the dataset version
+        :param use_fallback: bool - use the SQL engine, when the columns cannot be loaded
+        """
+        super().__init__(reader)
+        self._fallback = fallback
+        self._refresh = refresh
+        self._use_fallback = use_fallback
+
+    def dataset_version_statement(self) -> Tuple:
+        return self.fallback.dataset_version_statement()
+
+    def birthdays_statement(self, date: datetime.date) -> Tuple:
+        return self.fallback.birthdays_statement(date)
+
+    def top_selling_products_statement(self, year: int) -> Tuple:
+        return self.fallback.top_selling_products_statement(year)
+
+    def top_selling_products_by_year_statement(self, years: List[int], limit: int = 10) -> Tuple:
+        return self.fallback.top_selling_products_by_year_statement(years, limit)
+
+    def top_products_statement(self, limit: int, year: int, grain: str = "year", period: int = None,
+                               outlet: int = None, category: str = None) -> Tuple:
+        return self.fallback.top_products_statement(limit, year, grain, period, outlet, category)
+
+    def last_order_per_customer_statement(self, cursor: int = None, limit: int = None) -> Tuple:
+        return self.fallback.last_order_per_customer_statement(cursor, limit)
+
+    def is_stale(self, store: ColumnStore) -> bool:
+        """
+        Check if the dataset version of a store should be checked again.
+        :param store: ColumnStore | None
+        :return: bool
+        """
+        return store is None or time.monotonic() - store.checked_at >= self._refresh
+
+    def store(self):
+        """
+        Columns of the database, which are loaded when they are missing or the dataset version has changed.
+        :return: ColumnStore | None - None when the columns cannot be loaded and the fallback is used
+        """
+        key = self.reader.connection_string
+        store = self._stores.get(key)
+        if not self.is_stale(store):
+            return store
+
+        with self._stores_lock:
+            store = self._stores.get(key)
+            if not self.is_stale(store):
+                return store
+            try:
+                version = self.fallback.read_dataset_version()
+                if store is not None and store.version == version:
+                    store.checked_at = time.monotonic()
+                else:
+                    store = ColumnStore.load(self.reader.session, version)
+                    self._stores[key] = store
+            except Exception as ex:
+                if not self._use_fallback:
+                    raise
+                LOGGER.error("Can not load the columns into memory, reading with SQL: {}".format(ex))
+                self.reader.session.rollback()
+                return None
+        return store
+
+    @classmethod
+    def clear(cls) -> None:
+        """
+        Drop the column stores of the process.
+        :return: None
+        """
+        with cls._stores_lock:
+            cls._stores.clear()
+
+    def read_dataset_version(self) -> int:
+        store = self.store()
+        if store is None:
+            return self.fallback.read_dataset_version()
+        return store.version
+
+    def read_birthdays(self, date: datetime.date) -> List[Birthday]:
+        store = self.store()
+        if store is None:
+            return self.fallback.read_birthdays(date)
+        return self.to_birthdays(store.birthdays(date))
+
+    def read_top_selling_products(self, year: int) -> List[TopSellingProduct]:
+        store = self.store()
+        if store is None:
+            return self.fallback.read_top_selling_products(year)
+        return self.to_top_selling_products(store.top_selling_products(year))
+
+    def read_top_selling_products_by_year(self, years: List[int], limit: int = 10) \
+            -> Dict[int, List[TopSellingProduct]]:
+        store = self.store()
+        if store is None:
+            return self.fallback.read_top_selling_products_by_year(years, limit)
+        return {year: self.to_top_selling_products(store.top_selling_products(year, limit)) for year in years}
+
+    def read_top_products(self, limit: int, year: int, grain: str = "year", period: int = None,
+                          outlet: int = None, category: str = None) -> List[ProductSales]:
+        # The sales rollup is not kept in memory, it is read with SQL.
+        if self.fallback is None:
+            raise UnsupportedQuery("The sales rollup is not kept in the memory of a snapshot.")
+        return self.fallback.read_top_products(limit, year, grain, period, outlet, category)
+
+    def read_last_order_per_customer(self, cursor: int = None, limit: int = None) -> List[LastOrderPerCustomer]:
+        store = self.store()
+        if store is None:
+            return self.fallback.read_last_order_per_customer(cursor, limit)
+        return self.to_last_order_per_customer(store.last_order_per_customer(cursor, limit))
+
+    def stream_last_order_per_customer(self, batch_size: int, cursor: int = None) \
+            -> Iterator[List[LastOrderPerCustomer]]:
+        store = self.store()
+        if store is None:
+            yield from self.fallback.stream_last_order_per_customer(batch_size, cursor)
+            return
+        while True:
+            rows = store.last_order_per_customer(cursor, batch_size)
+            if not rows:
+                break
+            yield self.to_last_order_per_customer(rows)
+            cursor = rows[-1][0]
+
+
+class AsyncMemoryEngine(MemoryEngine):
+    """
+    Memory engine of the AsyncDataReader. The columns are fetched through the sync session of the AsyncSession,
+    and arranged in a worker thread, so that the event loop keeps serving the other requests.
+    """
+
+    # Lock of the load of every store, and the event loop it belongs to, since a lock can not be shared by loops.
+    _load_locks: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = dict()
+
+    @classmethod
+    def load_lock(cls, key: str) -> asyncio.Lock:
+        """
+        Lock of the load of a store in the running event loop, so that concurrent requests wait for one load.
+        :param key: str - connection string of the store
+        :return: asyncio.Lock
+        """
+        loop = asyncio.get_running_loop()
+        with cls._stores_lock:
+            entry = cls._load_locks.get(key)
+            if entry is None or entry[0] is not loop:
+                entry = cls._load_locks[key] = loop, asyncio.Lock()
+        return entry[1]
+
+    async def store(self):
+        """
+        Columns of the database, which are loaded when they are missing or the dataset version has changed.
+        :return: ColumnStore | None - None when the columns cannot be loaded and the fallback is used
+        """
+        key = self.reader.connection_string
+        store = self._stores.get(key)
+        if not self.is_stale(store):
+            return store
+
+        async with self.load_lock(key):
+            store = self._stores.get(key)
+            if not self.is_stale(store):
+                return store
+            try:
+                version = await self.fallback.read_dataset_version()
+                if store is not None and store.version == version:
+                    store.checked_at = time.monotonic()
+                else:
+                    started = time.perf_counter()
+                    tables = await self.reader.session.run_sync(ColumnStore.fetch_tables)
+                    store = await asyncio.to_thread(ColumnStore.build, version, *tables)
+                    LOGGER.info("Loaded {} receipts of dataset version {} into memory in {:.2f}s.".format(
+                        len(tables[0][0]), version, time.perf_counter() - started))
+                    with self._stores_lock:
+                        self._stores[key] = store
+            except Exception as ex:
+                if not self._use_fallback:
+                    raise
+                LOGGER.error("Can not load the columns into memory, reading with SQL: {}".format(ex))
+                await self.reader.session.rollback()
+                return None
+        return store
+
+    async def read_dataset_version(self) -> int:
+        store = await self.store()
+        if store is None:
+            return await self.fallback.read_dataset_version()
+        return store.version
+
+    async def read_birthdays(self, date: datetime.date) -> List[Birthday]:
+        store = await self.store()
+        if store is None:
+            return await self.fallback.read_birthdays(date)
+        return self.to_birthdays(store.birthdays(date))
+
+    async def read_top_selling_products(self, year: int) -> List[TopSellingProduct]:
+        store = await self.store()
+        if store is None:
+            return await self.fallback.read_top_selling_products(year)
+        return self.to_top_selling_products(store.top_selling_products(year))
+
+    async def read_top_selling_products_by_year(self, years: List[int], limit: int = 10) \
+            -> Dict[int, List[TopSellingProduct]]:
+        store = await self.store()
+        if store is None:
+            return await self.fallback.read_top_selling_products_by_year(years, limit)
+        return {year: self.to_top_selling_products(store.top_selling_products(year, limit)) for year in years}
+
+    async def read_top_products(self, limit: int, year: int, grain: str = "year", period: int = None,
+                                outlet: int = None, category: str = None) -> List[ProductSales]:
+        if self.fallback is None:
+            raise UnsupportedQuery("The sales rollup is not kept in the memory of a snapshot.")
+        return await self.fallback.read_top_products(limit, year, grain, period, outlet, category)
+
+    async def read_last_order_per_customer(self, cursor: int = None, limit: int = None) \
+            -> List[LastOrderPerCustomer]:
+        store = await self.store()
+        if store is None:
+            return await self.fallback.read_last_order_per_customer(cursor, limit)
+        return self.to_last_order_per_customer(store.last_order_per_customer(cursor, limit))
+
+    async def stream_last_order_per_customer(self, batch_size: int, cursor: int = None) \
+            -> AsyncIterator[List[LastOrderPerCustomer]]:
+        store = await self.store()
+        if store is None:
+            async for batch in self.fallback.stream_last_order_per_customer(batch_size, cursor):
+                yield batch
+            return
+        while True:
+            rows = store.last_order_per_customer(cursor, batch_size)
+            if not rows:
+                break
+            yield self.to_last_order_per_customer(rows)
+            cursor = rows[-1][0]
@@ -1,96 +1,122 @@
-import datetime
-from typing import List
+import hashlib
+import re
+from typing import Dict, List, Tuple
 
 
-from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 
 
 from .abstract import ReaderEngine
-from ..schemas import Birthday, TopSellingProduct, LastOrderPerCustomer
 
 
 class PostgreSQLEngine(ReaderEngine):
-    def read_birthdays(self, date:datetime.date) -> List[Birthday]:
-        """
-        Get list of customers, which have birthday on the given date.
-        :param date: datetime.date
-        :return: List[Birthday]
-        """
+    """
+    Engine of PostgreSQL, which can execute its queries as server-side prepared statements through psycopg2,
+    so that repeated queries are not parsed and planned again. The statements are prepared once on every
+    connection of the pool. asyncpg prepares and caches the statements of the async engine by itself.
+    """
+    PLACEHOLDER = re.compile(r"%\((\w+)\)s")
 
-        sql = """
-        SELECT customer_id, name
-        FROM customer
-        WHERE extract(month from birthdate) = :month
-            AND extract(day from birthdate) = :day  
-        ORDER BY customer_id ASC 
-        """
-        params = dict(day=date.day, month=date.month)
+    # PREPARE and EXECUTE of every statement, which are shared by the engines of all readers.
+    _prepared: Dict[TextClause, Tuple] = dict()
 
-        rows = self.reader.session.execute(text(sql), params)
+    @property
+    def prepare(self) -> bool:
+        return self._prepare
 
-        result = []
-        for row in rows:
-            result.append(Birthday(
-                customer_id=row[0],
-                customer_first_name=row[1]
-            ))
-        return result
+    def __init__(self, reader, prepare: bool = False):
+        """
+        :param reader: DataReader
+        :param prepare: bool - execute the queries as prepared statements
+        """
+        super().__init__(reader)
+        self._prepare = prepare
 
-    def read_top_selling_products(self, year:int) -> List[TopSellingProduct]:
+    def execute(self, statement: TextClause, params: dict, **options):
         """
-        The top 10 selling products for a specific year.
-        :param year: int
-        :return: List[TopSellingProduct]
+        Execute a statement in the session of the reader, as a prepared statement when it is enabled.
+        Streamed results use a named cursor, which can not be declared for EXECUTE, so they are not prepared.
+        :param statement: TextClause
+        :param params: dict
+        :param options: execution options
+        :return: sqlalchemy.engine.Result
         """
-        sql = """
-        SELECT p.product, SUM(r.quantity)
-        FROM receipt r
-        JOIN product p ON p.product_id = r.product_id
-        JOIN date d ON d.transaction_date = r.transaction_date
-        WHERE d.year_id = :year
-        GROUP BY p.product_id
-        ORDER BY SUM(quantity) DESC
-        LIMIT 10
+        if not self.prepare or options:
+            return super().execute(statement, params, **options)
+
+        connection = self.reader.session.connection()
+        if connection.dialect.driver != "psycopg2":
+            return super().execute(statement, params)
+
+        name, sql, execute, query = self.prepared_statement(statement, connection.dialect)
+        if name is None:
+            return super().execute(statement, params)
+
+        # Prepared statements belong to the DBAPI connection, and are gone when the pool replaces it.
+        # They are prepared on its cursor, so that the profiler records only the queries.
+        prepared = connection.connection.info.setdefault("prepared_statements", set())
+        if name not in prepared:
+            cursor = connection.connection.cursor()
+            try:
+                cursor.execute(sql)
+            finally:
+                cursor.close()
+            prepared.add(name)
+        # The profiler records the query by its SQL, instead of the name of the statement.
+        return connection.execute(execute, params, execution_options=dict(prepared_query=query))
+
+    @classmethod
+    def prepared_statement(cls, statement: TextClause, dialect) -> Tuple:
         """
-
-        params = dict(year=year)
-
-        rows = self.reader.session.execute(text(sql), params)
-
-        result = []
-        for row in rows:
-            result.append(TopSellingProduct(
-                product_name=row[0],
-                total_sales=row[1]
-            ))
-        return result
-
-    def read_last_order_per_customer(self) -> List[LastOrderPerCustomer]:
+        PREPARE and EXECUTE of a statement, which are compiled once for the engine.
+        The parameters of the statement are numbered in the order of their first appearance.
+        :param statement: TextClause
+        :param dialect: sqlalchemy.engine.Dialect
+        :return: Tuple[str, str, TextClause, str] - name, PREPARE, EXECUTE and the compiled query,
+            which are None for lists of IN
+        """
+        if statement not in cls._prepared:
+            compiled = statement.compile(dialect=dialect)
+            if any(bind.expanding for bind in compiled.binds.values()):
+                cls._prepared[statement] = None, None, None, None
+                return cls._prepared[statement]
+
+            names = []
+            for match in cls.PLACEHOLDER.finditer(compiled.string):
+                if match.group(1) not in names:
+                    names.append(match.group(1))
+            sql = cls.PLACEHOLDER.sub(lambda match: "${}".format(names.index(match.group(1)) + 1), compiled.string)
+            sql = sql.replace("%%", "%")
+
+            name = "reader_" + hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+            execute = "EXECUTE {}".format(name)
+            if names:
+                execute += "({})".format(", ".join(":" + param for param in names))
+            cls._prepared[statement] = \
+                name, "PREPARE {} AS {}".format(name, sql), cls.statement(execute), compiled.string
+        return cls._prepared[statement]
+
+    def top_selling_products_by_year_statement(self, years: List[int], limit: int = 10) -> Tuple:
         """
-        The last order per customer with their email.
-        :return: List[LastOrderPerCustomer]
+        Query for the top selling products of every year of a list, ranked within every year with ROW_NUMBER(),
+        so that all years are read with one query.
+        The years are bound as one array, so that the statement does not change with their number.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Tuple[TextClause, dict]
         """
         sql = """
-        SELECT c.customer_id, c.email, T.last_order_date
+        SELECT year_id, product, quantity
         FROM (
-            SELECT 
-                customer_id,
-                MAX(transaction_date) AS last_order_date
-            FROM receipt r
-            WHERE r.customer_id IS NOT NULL
-            GROUP BY customer_id
-        ) T 
-        JOIN customer c ON T.customer_id = c.customer_id
-        ORDER BY c.customer_id ASC
+            SELECT s.year_id, p.product, s.quantity,
+                ROW_NUMBER() OVER (PARTITION BY s.year_id ORDER BY s.quantity DESC, s.product_id ASC) AS position
+            FROM product_year_sales s
+            JOIN product p ON p.product_id = s.product_id
+            WHERE s.year_id = ANY(:years)
+        ) ranked
+        WHERE position <= :limit
+        ORDER BY year_id ASC, position ASC
         """
+        params = dict(years=list(years), limit=limit)
 
-        rows = self.reader.session.execute(text(sql))
-
-        result = []
-        for row in rows:
-            result.append(LastOrderPerCustomer(
-                customer_id=row[0],
-                customer_email=row[1],
-                last_order_date=row[2].strftime('%Y-%m-%d'),
-            ))
-        return result
+        return self.statement(sql), params
@@ -0,0 +1,87 @@
+import datetime
+import logging
+import time
+from typing import List, Tuple
+
+
+from snapshot import ColumnStore, Snapshot
+from .memory import MemoryEngine, AsyncMemoryEngine
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SnapshotEngine(MemoryEngine):
+    """
+    Engine, which answers the queries from a snapshot, which is written by the loader.
+    The snapshot is selected with a `snapshot:////absolute/path/to/directory` connection string.
+    Like in SQLite URLs, `snapshot:///path` with three slashes is relative to the working directory.
+    Its manifest is checked every `refresh` seconds, and a new snapshot is mapped when it has been published.
+    """
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def __init__(self, reader, directory: str, refresh: float = 60.0):
+        """
+        :param reader: DataReader
+        :param directory: str - directory of the snapshot
+        :param refresh: float - seconds between the checks of the manifest
+        """
+        super().__init__(reader, None, refresh, use_fallback=False)
+        self._directory = directory
+
+    def dataset_version_statement(self) -> Tuple:
+        raise NotImplementedError
+
+    def birthdays_statement(self, date: datetime.date) -> Tuple:
+        raise NotImplementedError
+
+    def top_selling_products_statement(self, year: int) -> Tuple:
+        raise NotImplementedError
+
+    def top_selling_products_by_year_statement(self, years: List[int], limit: int = 10) -> Tuple:
+        raise NotImplementedError
+
+    def top_products_statement(self, limit: int, year: int, grain: str = "year", period: int = None,
+                               outlet: int = None, category: str = None) -> Tuple:
+        raise NotImplementedError
+
+    def last_order_per_customer_statement(self, cursor: int = None, limit: int = None) -> Tuple:
+        raise NotImplementedError
+
+    def open_store(self) -> ColumnStore:
+        """
+        Columns of the current snapshot, which are mapped again when a new snapshot is published.
+        :return: ColumnStore
+        """
+        key = self.reader.connection_string
+        store = self._stores.get(key)
+        if not self.is_stale(store):
+            return store
+
+        with self._stores_lock:
+            store = self._stores.get(key)
+            if not self.is_stale(store):
+                return store
+            manifest = Snapshot.read_manifest(self.directory)
+            if store is not None and store.path == manifest["path"]:
+                store.checked_at = time.monotonic()
+            else:
+                store = Snapshot.open(self.directory, manifest)
+                self._stores[key] = store
+                LOGGER.info("Mapped snapshot '{}' of dataset version {}.".format(store.path, store.version))
+        return store
+
+    def store(self) -> ColumnStore:
+        return self.open_store()
+
+
+class AsyncSnapshotEngine(AsyncMemoryEngine, SnapshotEngine):
+    """
+    Snapshot engine of the AsyncDataReader. Mapping a snapshot reads only its manifest, so it does not block.
+    """
+
+    async def store(self) -> ColumnStore:
+        return self.open_store()
@@ -1,92 +1,48 @@
-import datetime
-from typing import List
-
-
-from sqlalchemy import text
+import sqlite3
+from typing import List, Tuple
 
 
 from .abstract import ReaderEngine
-from ..schemas import Birthday, TopSellingProduct, LastOrderPerCustomer
 
 
 class SqliteEngine(ReaderEngine):
-    def read_birthdays(self, date:datetime.date) -> List[Birthday]:
-        """
-        Get list of customers, which have birthday on the given date.
-        :param date: datetime.date
-        :return: List[Birthday]
-        """
-
-        sql = """
-        SELECT customer_id, name
-        FROM customer
-        WHERE strftime('%d %m', birthdate) = '{}'
-        ORDER BY customer_id ASC
-        """.format(date.strftime('%d %m'))
+    # Window functions are available since SQLite 3.25.
+    WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
 
-        rows = self.reader.session.execute(text(sql))
-
-        result = []
-        for row in rows:
-            result.append(Birthday(
-                customer_id=row[0],
-                customer_first_name=row[1]
-            ))
-        return result
-
-    def read_top_selling_products(self, year:int) -> List[TopSellingProduct]:
+    def top_selling_products_by_year_statement(self, years: List[int], limit: int = 10) -> Tuple:
         """
-        The top 10 selling products for a specific year.
-        :param year: int
-        :return: List[TopSellingProduct]
+        Query for the top selling products of every year of a list.
+        SQLite supports window functions since 3.25, older builds use a correlated count.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Tuple[TextClause, dict]
         """
-        sql = """
-        SELECT p.product, SUM(r.quantity)
-        FROM receipt r
-        JOIN product p ON p.product_id = r.product_id
-        JOIN date d ON d.transaction_date = r.transaction_date
-        WHERE d.year_id = {}
-        GROUP BY p.product_id
-        ORDER BY SUM(quantity) DESC
-        LIMIT 10
-        """.format(year)
+        if not self.WINDOW_FUNCTIONS:
+            return self.top_selling_products_by_year_fallback_statement(years, limit)
+        return super().top_selling_products_by_year_statement(years, limit)
 
-        rows = self.reader.session.execute(text(sql))
-
-        result = []
-        for row in rows:
-            result.append(TopSellingProduct(
-                product_name=row[0],
-                total_sales=row[1]
-            ))
-        return result
-
-    def read_last_order_per_customer(self) -> List[LastOrderPerCustomer]:
+    def top_selling_products_by_year_fallback_statement(self, years: List[int], limit: int = 10) -> Tuple:
         """
-        The last order per customer with their email.
-        :return: List[LastOrderPerCustomer]
+        Query for the top selling products of every year of a list for SQLite without window functions.
+        A product is kept, when less than `limit` products of its year rank before it,
+        which is counted on the (year_id, quantity) index.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Tuple[TextClause, dict]
         """
         sql = """
-        SELECT c.customer_id, c.email, T.last_order_date
-        FROM (
-            SELECT 
-                customer_id,
-                MAX(transaction_date) AS last_order_date
-            FROM receipt r
-            WHERE r.customer_id IS NOT NULL
-            GROUP BY customer_id
-        ) T 
-        JOIN customer c ON T.customer_id = c.customer_id
-        ORDER BY c.customer_id ASC
+        SELECT s.year_id, p.product, s.quantity
+        FROM product_year_sales s
+        JOIN product p ON p.product_id = s.product_id
+        WHERE s.year_id IN :years
+        AND (
+            SELECT COUNT(*)
+            FROM product_year_sales o
+            WHERE o.year_id = s.year_id
+            AND (o.quantity > s.quantity OR (o.quantity = s.quantity AND o.product_id < s.product_id))
+        ) < :limit
+        ORDER BY s.year_id ASC, s.quantity DESC, s.product_id ASC
         """
+        params = dict(years=list(years), limit=limit)
 
-        rows = self.reader.session.execute(text(sql))
-
-        result = []
-        for row in rows:
-            result.append(LastOrderPerCustomer(
-                customer_id=row[0],
-                customer_email=row[1],
-                last_order_date=row[2]
-            ))
-        return result
+        return self.statement(sql, "years"), params
@@ -1,30 +1,206 @@
-from fastapi import FastAPI
-from .reader import DataReader
-from .schemas import BirthdayResponse, TopSellingProductResponse, LastOrderPerCustomerResponse
+from contextlib import asynccontextmanager
+import secrets
+from typing import AsyncIterator, List, Literal, Optional
 
 
-app = FastAPI()
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from pydantic import BaseModel
 
 
-@app.get("/customers/birthday", response_model=BirthdayResponse)
-async def birthday() -> BirthdayResponse:
+from config import Config
+from .engine import AsyncMemoryEngine, UnsupportedQuery
+from .metrics import MetricsMiddleware, render
+from .reader import AsyncDataReader
+from .responses import TrustedJSONResponse, dumps
+from .schemas import BirthdayResponse, TopSellingProductResponse, TopSellingProductsByYearResponse, \
+    TopProductsResponse, LastOrderPerCustomerResponse, CacheStats, SlowQueryLog
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The columns of the memory engine are loaded before the first request, instead of by it.
+    async with AsyncDataReader() as reader:
+        if isinstance(reader.engine, AsyncMemoryEngine) and reader.db_type != "snapshot":
+            await reader.engine.store()
+    yield
+    await AsyncDataReader.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+
+# Number of periods of a time grain in a year.
+GRAIN_PERIODS = {
+    "quarter": 4,
+    "month": 12,
+    "week": 53,
+}
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+async def get_reader() -> AsyncIterator[AsyncDataReader]:
+    """
+    Data reader of a request, whose session is closed when the request is done.
+    """
+    async with AsyncDataReader() as reader:
+        yield reader
+
+
+async def encode_stream(batches: AsyncIterator[List[BaseModel]], stream_format: str) -> AsyncIterator[bytes]:
+    """
+    Encode batches of models as lines of NDJSON, or as chunks of one JSON array.
+    """
+    if stream_format == "json":
+        yield b"["
+    first = True
+    async for batch in batches:
+        if not batch:
+            continue
+        if stream_format == "ndjson":
+            yield b"".join(dumps(model) + b"\n" for model in batch)
+        else:
+            # The brackets of the encoded batch are dropped, so that the items continue the array.
+            yield (b"" if first else b",") + dumps(batch)[1:-1]
+        first = False
+    if stream_format == "json":
+        yield b"]"
+
+
+@app.get("/customers/birthday", response_model=BirthdayResponse, response_class=TrustedJSONResponse)
+async def birthday(reader: AsyncDataReader = Depends(get_reader)) -> TrustedJSONResponse:
     """
     Get list of customers, which have birthday today.
     """
-    return BirthdayResponse(customers=DataReader().read_birthdays())
+    return TrustedJSONResponse(dict(customers=await reader.read_birthdays()))
 
 
-@app.get("/products/top-selling-products/{year:int}", response_model=TopSellingProductResponse)
-async def top_selling_products(year: int) -> TopSellingProductResponse:
+@app.get("/products/top-selling-products/{year:int}", response_model=TopSellingProductResponse,
+         response_class=TrustedJSONResponse)
+async def top_selling_products(year: int, reader: AsyncDataReader = Depends(get_reader)) -> TrustedJSONResponse:
     """
     The top 10 selling products for a specific year.
     """
-    return TopSellingProductResponse(products=DataReader().read_top_selling_products(year))
+    return TrustedJSONResponse(dict(products=await reader.read_top_selling_products(year)))
+
+
+@app.get("/products/top-selling-products/by-year", response_model=TopSellingProductsByYearResponse,
+         response_class=TrustedJSONResponse)
+async def top_selling_products_by_year(
+        years: List[int] = Query(..., alias="year", min_length=1, max_length=100),
+        limit: int = Query(10, ge=1, le=Config.READER_MAX_PAGE_SIZE),
+        reader: AsyncDataReader = Depends(get_reader)) -> TrustedJSONResponse:
+    """
+    The top selling products of every given year, e.g. `?year=2018&year=2019`, which are read with one query.
+    """
+    result = await reader.read_top_selling_products_by_year(years, limit)
+    return TrustedJSONResponse(dict(years=[dict(year=year, products=products) for year, products in result.items()]))
+
+
+@app.get("/products/top-selling-products", response_model=TopProductsResponse, response_class=TrustedJSONResponse)
+async def top_products(
+        year: int,
+        grain: Literal["year", "quarter", "month", "week"] = "year",
+        period: Optional[int] = Query(None, ge=1),
+        limit: int = Query(10, ge=1, le=Config.READER_MAX_PAGE_SIZE),
+        outlet: Optional[int] = None,
+        category: Optional[str] = None,
+        reader: AsyncDataReader = Depends(get_reader)) -> TrustedJSONResponse:
+    """
+    The top selling products of a year, or of a quarter, month or week of it given as period,
+    optionally of one outlet or one product category. The products are read from the sales rollup,
+    which a snapshot does not keep, so it is answered with 501 by the snapshot engine.
+    """
+    if grain != "year" and (period is None or period > GRAIN_PERIODS[grain]):
+        raise HTTPException(422, "The period of a {} should be between 1 and {}.".format(grain, GRAIN_PERIODS[grain]))
+    try:
+        products = await reader.read_top_products(
+            limit, year, grain, period if grain != "year" else None, outlet, category)
+    except UnsupportedQuery as error:
+        raise HTTPException(501, str(error))
+    return TrustedJSONResponse(dict(products=products))
 
 
-@app.get("/customers/last-order-per-customer", response_model=LastOrderPerCustomerResponse)
-async def last_order_per_customer() -> LastOrderPerCustomerResponse:
+@app.get("/customers/last-order-per-customer", response_model=LastOrderPerCustomerResponse,
+         response_class=TrustedJSONResponse)
+async def last_order_per_customer(
+        cursor: Optional[int] = None,
+        limit: Optional[int] = Query(None, ge=1, le=Config.READER_MAX_PAGE_SIZE),
+        reader: AsyncDataReader = Depends(get_reader)) -> TrustedJSONResponse:
     """
     The last order per customer with their email.
+    When a limit is given, the customers are paginated and the next page is requested with `next_cursor`.
+    """
+    customers = await reader.read_last_order_per_customer(cursor, limit)
+    next_cursor = None
+    if limit is not None and len(customers) == limit:
+        next_cursor = customers[-1].customer_id
+    return TrustedJSONResponse(dict(customers=customers, next_cursor=next_cursor))
+
+
+@app.get("/customers/last-order-per-customer/stream", response_class=StreamingResponse)
+async def stream_last_order_per_customer(
+        cursor: Optional[int] = None,
+        stream_format: Literal["ndjson", "json"] = Query("ndjson", alias="format")) -> StreamingResponse:
+    """
+    Export the last order per customer with their email as NDJSON or as a JSON array,
+    which is written while the rows are fetched, so that memory does not grow with the number of customers.
+    """
+    async def batches():
+        # The reader is owned by the stream, because the response is sent after the endpoint returns.
+        async with AsyncDataReader() as reader:
+            async for batch in reader.stream_last_order_per_customer(cursor):
+                yield batch
+
+    return StreamingResponse(encode_stream(batches(), stream_format), media_type=STREAM_MEDIA_TYPES[stream_format])
+
+
+async def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Allow a request to an admin endpoint, when it has the ADMIN_TOKEN as its bearer token.
+    Without an ADMIN_TOKEN the admin endpoints are not served.
+    """
+    if Config.ADMIN_TOKEN is None:
+        raise HTTPException(404)
+    expected = "Bearer {}".format(Config.ADMIN_TOKEN).encode("utf-8")
+    if authorization is None or not secrets.compare_digest(authorization.encode("utf-8"), expected):
+        raise HTTPException(401, "Invalid admin token.", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/cache", response_model=CacheStats, dependencies=[Depends(require_admin)])
+async def cache_stats() -> CacheStats:
+    """
+    Hit and miss counters of the result cache.
+    """
+    return CacheStats(**AsyncDataReader.cache.stats())
+
+
+@app.get("/admin/slow-queries", response_model=SlowQueryLog, dependencies=[Depends(require_admin)])
+async def slow_queries() -> SlowQueryLog:
+    """
+    Statistics of every statement and the latest queries, which took more than READER_SLOW_QUERY_MS,
+    with their EXPLAIN plans. Queries are profiled only when READER_PROFILE_QUERIES is set.
+    """
+    profiler = AsyncDataReader.profiler
+    return SlowQueryLog(
+        enabled=Config.READER_PROFILE_QUERIES,
+        threshold_ms=profiler.threshold_ms,
+        statements=profiler.statements(),
+        queries=profiler.slow_queries(),
+    )
+
+
+@app.get("/metrics", response_class=Response, include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Metrics of the requests, the queries and the connection pools in the Prometheus text format.
     """
-    return LastOrderPerCustomerResponse(customers=DataReader().read_last_order_per_customer())
+    if not Config.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,106 @@
+"""
+Prometheus metrics of the api, which are collected only when METRICS_ENABLED is set.
+
+When the api runs in several worker processes, PROMETHEUS_MULTIPROC_DIR should point to an empty directory,
+which is shared by the workers, so that `/metrics` of any worker reports the histograms of all of them.
+"""
+import os
+import time
+
+
+from prometheus_client import CollectorRegistry, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+
+from config import Config
+
+
+REGISTRY = CollectorRegistry()
+
+REQUEST_SECONDS = Histogram(
+    "coffeeshop_request_seconds", "Latency of the api requests.",
+    ["method", "route", "status"], registry=REGISTRY)
+
+QUERY_SECONDS = Histogram(
+    "coffeeshop_query_seconds", "Time of the queries of the reader engines, which are not answered from the cache.",
+    ["engine", "method"], registry=REGISTRY)
+
+
+class PoolCollector:
+    """
+    Gauges of the connection pools of the engines, which are shared by the readers of the process.
+    """
+    GAUGES = (
+        ("coffeeshop_pool_size", "Connections kept by the pool.", "size"),
+        ("coffeeshop_pool_checked_out", "Connections in use.", "checkedout"),
+        ("coffeeshop_pool_checked_in", "Idle connections in the pool.", "checkedin"),
+        ("coffeeshop_pool_overflow", "Connections above the size of the pool.", "overflow"),
+    )
+
+    def collect(self):
+        from .reader import AsyncDataReader, DataReader
+
+        gauges = [GaugeMetricFamily(name, documentation, labels=["reader", "url"])
+                  for name, documentation, _ in self.GAUGES]
+        for reader, engines in (("sync", DataReader._sql_engines), ("async", AsyncDataReader._sql_engines)):
+            for engine in list(engines.values()):
+                pool = engine.pool
+                labels = [reader, engine.url.render_as_string(hide_password=True)]
+                for gauge, (_, _, method) in zip(gauges, self.GAUGES):
+                    # Pools without a queue, like the single connection of SQLite in memory, have no counters.
+                    if hasattr(pool, method):
+                        gauge.add_metric(labels, getattr(pool, method)())
+        return gauges
+
+
+REGISTRY.register(PoolCollector())
+
+
+def observe_query(engine: str, method: str, seconds: float) -> None:
+    QUERY_SECONDS.labels(engine, method).observe(seconds)
+
+
+def render() -> bytes:
+    """
+    Metrics in the Prometheus text format.
+    :return: bytes
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+
+    # The histograms are read from the files of all workers, and the pools are the ones of this worker.
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    registry.register(PoolCollector())
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, which observes the latency of every request by the path of its route,
+    so that path parameters do not create new series. It only checks the setting when metrics are disabled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not Config.METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(scope["method"], getattr(route, "path", "unmatched"), status[0]).observe(
+                time.perf_counter() - started)
+
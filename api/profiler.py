@@ -0,0 +1,161 @@
+from collections import deque
+import datetime
+import logging
+import threading
+import time
+from typing import List
+
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QueryProfiler:
+    """
+    Profiler of the queries of the reader engines, which is attached to SQLAlchemy engines with cursor events.
+    The count, total and maximum duration of every statement are kept, and the queries, which take more
+    than the threshold, are written with their EXPLAIN plan to a ring buffer of the latest slow queries.
+    """
+    EXPLAIN = {
+        "sqlite": "EXPLAIN QUERY PLAN ",
+        "mysql": "EXPLAIN ",
+        "postgresql": "EXPLAIN ",
+    }
+
+    # Value of every parameter of a slow query.
+    REDACTED = "***"
+
+    @property
+    def threshold_ms(self) -> float:
+        return self._threshold_ms
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __init__(self, threshold_ms: float, size: int):
+        """
+        :param threshold_ms: float - duration, above which a query is slow
+        :param size: int - number of slow queries, which are kept
+        """
+        self._threshold_ms = threshold_ms
+        self._size = size
+        self._slow = deque(maxlen=size)
+        self._statements = dict()
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine) -> None:
+        """
+        Listen to the cursor events of an engine. The sync engine of an AsyncEngine should be given.
+        :param engine: sqlalchemy.engine.Engine
+        :return: None
+        """
+        if not event.contains(engine, "before_cursor_execute", self.before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def detach(self, engine: Engine) -> None:
+        if event.contains(engine, "before_cursor_execute", self.before_cursor_execute):
+            event.remove(engine, "before_cursor_execute", self.before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        duration_ms = (time.perf_counter() - conn.info["profiler_started"].pop()) * 1000
+        # Prepared statements are recorded by their query, and their EXECUTE is explained.
+        query = statement
+        if context is not None:
+            query = context.execution_options.get("prepared_query", statement)
+        with self._lock:
+            stats = self._statements.get(query)
+            if stats is None:
+                stats = self._statements[query] = dict(statement=query, count=0, total_ms=0.0, max_ms=0.0)
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+        if duration_ms < self.threshold_ms:
+            return
+
+        plan = None
+        # Streamed results still hold the connection, and only single reads are explained.
+        streamed = context is not None and context.execution_options.get("stream_results", False)
+        if not executemany and not streamed and self.is_read(statement):
+            plan = self.explain(conn, statement, parameters)
+
+        LOGGER.warning("Slow query took {:.1f}ms: {}".format(duration_ms, " ".join(query.split())))
+        self._slow.append(dict(
+            statement=query,
+            parameters=self.format_parameters(parameters),
+            duration_ms=duration_ms,
+            executed_at=datetime.datetime.now().isoformat(),
+            dialect=conn.dialect.name,
+            plan=plan,
+        ))
+
+    def explain(self, conn, statement: str, parameters) -> List[str]:
+        """
+        Plan of a statement, which is read with the EXPLAIN of the dialect on the DBAPI connection,
+        so that it does not fire the events again.
+        :param conn: sqlalchemy.engine.Connection
+        :param statement: str
+        :param parameters: parameters of the statement in the paramstyle of the driver
+        :return: List[str] - rows of the plan | None, when it can not be read
+        """
+        prefix = self.EXPLAIN.get(conn.dialect.name)
+        if prefix is None:
+            return None
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [" | ".join(str(value) for value in row) for row in cursor.fetchall()]
+        except Exception as err:
+            LOGGER.warning("Could not explain the slow query: {}".format(err))
+            return None
+        finally:
+            cursor.close()
+
+    @classmethod
+    def is_read(cls, statement: str) -> bool:
+        # The readers prepare only queries, so their EXECUTE is explained like them.
+        words = statement.split(None, 1)
+        return bool(words) and words[0].upper() in ("SELECT", "WITH", "EXECUTE")
+
+    @classmethod
+    def format_parameters(cls, parameters):
+        """
+        Parameters of a slow query, whose values are redacted, since they are ids and emails of customers.
+        The names of the parameters, or their number, are kept.
+        :param parameters: parameters of the statement in the paramstyle of the driver
+        :return: Dict[str, str] | List[str] | None
+        """
+        if isinstance(parameters, dict):
+            return {key: cls.REDACTED for key in parameters}
+        if isinstance(parameters, (list, tuple)):
+            return [cls.REDACTED] * len(parameters)
+        return parameters
+
+    def slow_queries(self) -> List[dict]:
+        """
+        Latest slow queries, the newest first.
+        :return: List[dict]
+        """
+        return list(reversed(self._slow))
+
+    def statements(self) -> List[dict]:
+        """
+        Statistics of every statement, the one with the longest total duration first.
+        :return: List[dict]
+        """
+        with self._lock:
+            return sorted((dict(stats) for stats in self._statements.values()), key=lambda stats: -stats["total_ms"])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slow.clear()
+            self._statements.clear()
@@ -1,21 +1,40 @@
 import datetime
 import logging
-from typing import Union, List
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterator, Union, List
 
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
 
 
 from config import Config
-from .engine import ReaderEngine, SqliteEngine, MySQLEngine, PostgreSQLEngine
-from .schemas import Birthday, TopSellingProduct, LastOrderPerCustomer
+from .cache import ResultCache
+from .engine import ReaderEngine, SqliteEngine, MySQLEngine, PostgreSQLEngine, \
+    AsyncSqliteEngine, AsyncMySQLEngine, AsyncPostgreSQLEngine, MemoryEngine, AsyncMemoryEngine, \
+    SnapshotEngine, AsyncSnapshotEngine
+from .metrics import observe_query
+from .profiler import QueryProfiler
+from .schemas import Birthday, TopSellingProduct, ProductSales, LastOrderPerCustomer
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 class DataReader:
+    # Engines and their connection pools are shared by all readers of the process.
+    _sql_engines: Dict[str, Engine] = dict()
+    _sql_engines_lock = threading.Lock()
+
+    # Results are shared by all readers of the process, until the dataset version changes.
+    cache = ResultCache(Config.READER_CACHE_SIZE, Config.READER_CACHE_TTL)
+
+    # Slow queries of all readers of the process, when READER_PROFILE_QUERIES is set.
+    profiler = QueryProfiler(Config.READER_SLOW_QUERY_MS, Config.READER_SLOW_QUERY_LOG_SIZE)
+
     @property
     def connection_string(self) -> str:
         """
@@ -38,9 +57,20 @@ class DataReader:
             return "mysql"
         elif self.connection_string.startswith("postgresql"):
             return "postgresql"
+        elif self.connection_string.startswith("snapshot"):
+            return "snapshot"
         else:
             return None
 
+    @property
+    def snapshot_directory(self) -> str:
+        """
+        Directory of the snapshot of a `snapshot:////absolute/path` connection string.
+        Like in SQLite URLs, `snapshot:///path` with three slashes is relative to the working directory.
+        :return: str
+        """
+        return make_url(self.connection_string).database
+
     @property
     def engine(self) -> ReaderEngine:
         """
@@ -53,21 +83,39 @@ class DataReader:
             elif self.db_type == "mysql":
                 self._engine = MySQLEngine(self)
             elif self.db_type == "postgresql":
-                self._engine = PostgreSQLEngine(self)
+                self._engine = PostgreSQLEngine(self, Config.READER_PREPARED_STATEMENTS)
+            elif self.db_type == "snapshot":
+                self._engine = SnapshotEngine(self, self.snapshot_directory, Config.READER_MEMORY_REFRESH)
+                return self._engine
             else:
                 raise NotImplementedError
+            if Config.READER_ENGINE == "memory":
+                self._engine = MemoryEngine(
+                    self, self._engine, Config.READER_MEMORY_REFRESH, Config.READER_MEMORY_FALLBACK)
         return self._engine
 
     @property
-    def session(self):
-        if self._session is None:
-            if self.db_type == "sqlite":
-                connect_args = {"check_same_thread": False}
-            else:
-                connect_args = {}
-            engine = create_engine(self.connection_string, connect_args=connect_args)
-            self._session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    def sql_engine(self) -> Engine:
+        """
+        The SQLAlchemy engine of the connection string, which is shared by the process.
+        :return: sqlalchemy.engine.Engine
+        """
+        with self._sql_engines_lock:
+            if self.connection_string not in self._sql_engines:
+                self._sql_engines[self.connection_string] = create_engine(
+                    self.connection_string, **self.engine_options())
+                if Config.READER_PROFILE_QUERIES:
+                    self.profiler.attach(self._sql_engines[self.connection_string])
+            return self._sql_engines[self.connection_string]
 
+    @property
+    def session(self) -> Session:
+        """
+        Session of the reader, which uses a connection from the pool of the shared engine.
+        :return: sqlalchemy.orm.Session
+        """
+        if self._session is None:
+            self._session = Session(bind=self.sql_engine, autoflush=False)
         return self._session
 
     def __init__(self, connection_string=None):
@@ -80,6 +128,85 @@ class DataReader:
         self._engine = None
         self._session = None
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def engine_options(self) -> dict:
+        """
+        Options of the shared engine, which configure its connection pool.
+        :return: dict
+        """
+        options = dict(pool_pre_ping=Config.READER_POOL_PRE_PING)
+        if self.db_type == "sqlite":
+            options["connect_args"] = {"check_same_thread": False}
+            # In-memory databases use a single connection instead of a pool.
+            if make_url(self.connection_string).database in (None, "", ":memory:"):
+                return options
+
+        options.update(
+            pool_size=Config.READER_POOL_SIZE,
+            max_overflow=Config.READER_MAX_OVERFLOW,
+            pool_recycle=Config.READER_POOL_RECYCLE,
+        )
+        return options
+
+    def close(self) -> None:
+        """
+        Close the session and return its connection to the pool.
+        :return: None
+        """
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    @classmethod
+    def dispose(cls) -> None:
+        """
+        Close the connection pools of all shared engines.
+        :return: None
+        """
+        with cls._sql_engines_lock:
+            for engine in cls._sql_engines.values():
+                engine.dispose()
+            cls._sql_engines.clear()
+
+    def cached(self, key: tuple, read: Callable):
+        """
+        Read a result from the cache, or from the engine when it is missing or the dataset has changed.
+        :param key: tuple - method and parameters
+        :param read: Callable
+        :return: the result
+        """
+        if self.cache.maxsize <= 0:
+            return self.timed(key[0], read)
+
+        key = (self.connection_string, ) + key
+        version = self.timed("read_dataset_version", self.engine.read_dataset_version)
+        result = self.cache.get(key, version)
+        if result is ResultCache.MISSING:
+            result = self.timed(key[1], read)
+            self.cache.set(key, version, result)
+        return result
+
+    def timed(self, method: str, read: Callable):
+        """
+        Read a result from the engine, and observe the time of the query when the metrics are enabled.
+        :param method: str - name of the method of the engine
+        :param read: Callable
+        :return: the result
+        """
+        if not Config.METRICS_ENABLED:
+            return read()
+
+        started = time.perf_counter()
+        try:
+            return read()
+        finally:
+            observe_query(type(self.engine).__name__, method, time.perf_counter() - started)
+
     def read_birthdays(self, date:datetime.date = None) -> List[Birthday]:
         """
         Get list of customers, which have birthday on the given date.
@@ -89,7 +216,7 @@ class DataReader:
         if date is None:
             date = datetime.date.today()
         LOGGER.info("Reading birthdays on '{}'".format(date))
-        result = self.engine.read_birthdays(date)
+        result = self.cached(("read_birthdays", date), lambda: self.engine.read_birthdays(date))
         LOGGER.info("{} records found.".format(len(result)))
         return result
 
@@ -100,16 +227,296 @@ class DataReader:
         :return: List[TopSellingProduct]
         """
         LOGGER.info("Reading top selling products on '{}'".format(year))
-        result = self.engine.read_top_selling_products(year)
+        result = self.cached(("read_top_selling_products", year), lambda: self.engine.read_top_selling_products(year))
+        LOGGER.info("{} records found.".format(len(result)))
+        return result
+
+    def read_top_selling_products_by_year(self, years: List[int], limit: int = 10) \
+            -> Dict[int, List[TopSellingProduct]]:
+        """
+        The top selling products of every year of a list, which are read with one query.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Dict[int, List[TopSellingProduct]]
+        """
+        years = sorted(set(years))
+        LOGGER.info("Reading top {} selling products of {}".format(limit, years))
+        result = self.cached(
+            ("read_top_selling_products_by_year", tuple(years), limit),
+            lambda: self.engine.read_top_selling_products_by_year(years, limit))
+        LOGGER.info("{} records found.".format(sum(len(products) for products in result.values())))
+        return result
+
+    def read_top_products(self, limit: int, year: int, grain: str = "year", period: int = None,
+                          outlet: int = None, category: str = None) -> List[ProductSales]:
+        """
+        The top selling products of a period, of an outlet or a category, from the sales rollup.
+        :param limit: int - number of products
+        :param year: int
+        :param grain: str - year, quarter, month or week
+        :param period: int | None - quarter, month or week of the year, when the grain is not year
+        :param outlet: int | None - sales_outlet_id
+        :param category: str | None - product_category
+        :return: List[ProductSales]
+        """
+        LOGGER.info("Reading top {} products of {} {} {} for outlet '{}' and category '{}'".format(
+            limit, grain, year, period, outlet, category))
+        result = self.cached(
+            ("read_top_products", limit, year, grain, period, outlet, category),
+            lambda: self.engine.read_top_products(limit, year, grain, period, outlet, category))
+        LOGGER.info("{} records found.".format(len(result)))
+        return result
+
+    def read_last_order_per_customer(self, cursor: int = None, limit: int = None) -> List[LastOrderPerCustomer]:
+        """
+        The last order per customer with their email.
+        Customers are ordered by id, and a page starts after the customer_id, which is given as cursor.
+        :param cursor: int | None - customer_id of the last customer of the previous page
+        :param limit: int | None - maximum number of customers, all of them when None
+        :return: List[LastOrderPerCustomer]
+        """
+        LOGGER.info("Reading last order per customer after '{}' with limit '{}'.".format(cursor, limit))
+        result = self.cached(
+            ("read_last_order_per_customer", cursor, limit),
+            lambda: self.engine.read_last_order_per_customer(cursor, limit))
+        LOGGER.info("{} records found.".format(len(result)))
+        return result
+
+    def stream_last_order_per_customer(self, cursor: int = None) -> Iterator[List[LastOrderPerCustomer]]:
+        """
+        The last order per customer with their email, in batches, which are read through a server-side cursor.
+        The batches are not cached, so that the memory does not grow with the number of customers.
+        :param cursor: int | None - customer_id of the last customer, which is already read
+        :return: Iterator[List[LastOrderPerCustomer]]
+        """
+        LOGGER.info("Streaming last order per customer after '{}'.".format(cursor))
+        ctr = 0
+        for batch in self.engine.stream_last_order_per_customer(Config.READER_STREAM_BATCH_SIZE, cursor):
+            ctr += len(batch)
+            yield batch
+        LOGGER.info("{} records streamed.".format(ctr))
+
+
+class AsyncDataReader(DataReader):
+    """
+    Data reader, which uses the asyncio driver of the database, so that queries do not block the event loop.
+    """
+    ASYNC_DRIVERS = {
+        "sqlite": "sqlite+aiosqlite",
+        "mysql": "mysql+asyncmy",
+        "postgresql": "postgresql+asyncpg",
+    }
+
+    _sql_engines: Dict[str, AsyncEngine] = dict()
+    _sql_engines_lock = threading.Lock()
+
+    @property
+    def async_connection_string(self) -> str:
+        """
+        Connection string with the asyncio driver of the database.
+        :return: str
+        """
+        if self.db_type not in self.ASYNC_DRIVERS:
+            raise NotImplementedError
+        url = make_url(self.connection_string).set(drivername=self.ASYNC_DRIVERS[self.db_type])
+        return url.render_as_string(hide_password=False)
+
+    @property
+    def engine(self) -> ReaderEngine:
+        """
+        The engine that is used to make queries to the database.
+        :return: ReaderEngine
+        """
+        if self._engine is None:
+            if self.db_type == "sqlite":
+                self._engine = AsyncSqliteEngine(self)
+            elif self.db_type == "mysql":
+                self._engine = AsyncMySQLEngine(self)
+            elif self.db_type == "postgresql":
+                self._engine = AsyncPostgreSQLEngine(self)
+            elif self.db_type == "snapshot":
+                self._engine = AsyncSnapshotEngine(self, self.snapshot_directory, Config.READER_MEMORY_REFRESH)
+                return self._engine
+            else:
+                raise NotImplementedError
+            if Config.READER_ENGINE == "memory":
+                self._engine = AsyncMemoryEngine(
+                    self, self._engine, Config.READER_MEMORY_REFRESH, Config.READER_MEMORY_FALLBACK)
+        return self._engine
+
+    @property
+    def sql_engine(self) -> AsyncEngine:
+        """
+        The SQLAlchemy async engine of the connection string, which is shared by the process.
+        :return: sqlalchemy.ext.asyncio.AsyncEngine
+        """
+        with self._sql_engines_lock:
+            if self.async_connection_string not in self._sql_engines:
+                self._sql_engines[self.async_connection_string] = create_async_engine(
+                    self.async_connection_string, **self.engine_options())
+                if Config.READER_PROFILE_QUERIES:
+                    self.profiler.attach(self._sql_engines[self.async_connection_string].sync_engine)
+            return self._sql_engines[self.async_connection_string]
+
+    @property
+    def session(self) -> AsyncSession:
+        """
+        Async session of the reader, which uses a connection from the pool of the shared engine.
+        :return: sqlalchemy.ext.asyncio.AsyncSession
+        """
+        if self._session is None:
+            self._session = AsyncSession(bind=self.sql_engine, autoflush=False)
+        return self._session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close the session and return its connection to the pool.
+        :return: None
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @classmethod
+    async def dispose(cls) -> None:
+        """
+        Close the connection pools of all shared engines.
+        :return: None
+        """
+        with cls._sql_engines_lock:
+            engines = list(cls._sql_engines.values())
+            cls._sql_engines.clear()
+        for engine in engines:
+            await engine.dispose()
+
+    async def cached(self, key: tuple, read: Callable):
+        """
+        Read a result from the cache, or from the engine when it is missing or the dataset has changed.
+        :param key: tuple - method and parameters
+        :param read: Callable, which returns an awaitable
+        :return: the result
+        """
+        if self.cache.maxsize <= 0:
+            return await self.timed(key[0], read)
+
+        key = (self.connection_string, ) + key
+        version = await self.timed("read_dataset_version", self.engine.read_dataset_version)
+        result = self.cache.get(key, version)
+        if result is ResultCache.MISSING:
+            result = await self.timed(key[1], read)
+            self.cache.set(key, version, result)
+        return result
+
+    async def timed(self, method: str, read: Callable):
+        """
+        Read a result from the engine, and observe the time of the query when the metrics are enabled.
+        :param method: str - name of the method of the engine
+        :param read: Callable, which returns an awaitable
+        :return: the result
+        """
+        if not Config.METRICS_ENABLED:
+            return await read()
+
+        started = time.perf_counter()
+        try:
+            return await read()
+        finally:
+            observe_query(type(self.engine).__name__, method, time.perf_counter() - started)
+
+    async def read_birthdays(self, date: datetime.date = None) -> List[Birthday]:
+        """
+        Get list of customers, which have birthday on the given date.
+        :param date: datetime.date | None
+        :return: List[Birthday]
+        """
+        if date is None:
+            date = datetime.date.today()
+        LOGGER.info("Reading birthdays on '{}'".format(date))
+        result = await self.cached(("read_birthdays", date), lambda: self.engine.read_birthdays(date))
+        LOGGER.info("{} records found.".format(len(result)))
+        return result
+
+    async def read_top_selling_products(self, year: int) -> List[TopSellingProduct]:
+        """
+        The top 10 selling products for a specific year.
+        :param year: int
+        :return: List[TopSellingProduct]
+        """
+        LOGGER.info("Reading top selling products on '{}'".format(year))
+        result = await self.cached(
+            ("read_top_selling_products", year), lambda: self.engine.read_top_selling_products(year))
         LOGGER.info("{} records found.".format(len(result)))
         return result
 
-    def read_last_order_per_customer(self) -> List[LastOrderPerCustomer]:
+    async def read_top_selling_products_by_year(self, years: List[int], limit: int = 10) \
+            -> Dict[int, List[TopSellingProduct]]:
+        """
+        The top selling products of every year of a list, which are read with one query.
+        :param years: List[int]
+        :param limit: int - number of products per year
+        :return: Dict[int, List[TopSellingProduct]]
+        """
+        years = sorted(set(years))
+        LOGGER.info("Reading top {} selling products of {}".format(limit, years))
+        result = await self.cached(
+            ("read_top_selling_products_by_year", tuple(years), limit),
+            lambda: self.engine.read_top_selling_products_by_year(years, limit))
+        LOGGER.info("{} records found.".format(sum(len(products) for products in result.values())))
+        return result
+
+    async def read_top_products(self, limit: int, year: int, grain: str = "year", period: int = None,
+                                outlet: int = None, category: str = None) -> List[ProductSales]:
+        """
+        The top selling products of a period, of an outlet or a category, from the sales rollup.
+        :param limit: int - number of products
+        :param year: int
+        :param grain: str - year, quarter, month or week
+        :param period: int | None - quarter, month or week of the year, when the grain is not year
+        :param outlet: int | None - sales_outlet_id
+        :param category: str | None - product_category
+        :return: List[ProductSales]
+        """
+        LOGGER.info("Reading top {} products of {} {} {} for outlet '{}' and category '{}'".format(
+            limit, grain, year, period, outlet, category))
+        result = await self.cached(
+            ("read_top_products", limit, year, grain, period, outlet, category),
+            lambda: self.engine.read_top_products(limit, year, grain, period, outlet, category))
+        LOGGER.info("{} records found.".format(len(result)))
+        return result
+
+    async def read_last_order_per_customer(self, cursor: int = None, limit: int = None) \
+            -> List[LastOrderPerCustomer]:
         """
         The last order per customer with their email.
+        Customers are ordered by id, and a page starts after the customer_id, which is given as cursor.
+        :param cursor: int | None - customer_id of the last customer of the previous page
+        :param limit: int | None - maximum number of customers, all of them when None
         :return: List[LastOrderPerCustomer]
         """
-        LOGGER.info("Reading last order per customer.")
-        result = self.engine.read_last_order_per_customer()
+        LOGGER.info("Reading last order per customer after '{}' with limit '{}'.".format(cursor, limit))
+        result = await self.cached(
+            ("read_last_order_per_customer", cursor, limit),
+            lambda: self.engine.read_last_order_per_customer(cursor, limit))
         LOGGER.info("{} records found.".format(len(result)))
         return result
+
+    async def stream_last_order_per_customer(self, cursor: int = None) \
+            -> AsyncIterator[List[LastOrderPerCustomer]]:
+        """
+        The last order per customer with their email, in batches, which are read through a server-side cursor.
+        The batches are not cached, so that the memory does not grow with the number of customers.
+        :param cursor: int | None - customer_id of the last customer, which is already read
+        :return: AsyncIterator[List[LastOrderPerCustomer]]
+        """
+        LOGGER.info("Streaming last order per customer after '{}'.".format(cursor))
+        ctr = 0
+        async for batch in self.engine.stream_last_order_per_customer(Config.READER_STREAM_BATCH_SIZE, cursor):
+            ctr += len(batch)
+            yield batch
+        LOGGER.info("{} records streamed.".format(ctr))
@@ -0,0 +1,35 @@
+from typing import Any
+
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def encode_model(value: Any) -> dict:
+    """
+    Fields of a model, which is built from trusted database rows without validation.
+    :param value: BaseModel
+    :return: dict
+    """
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError("Type is not JSON serializable: {}".format(type(value).__name__))
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content, which may contain models, to JSON with orjson.
+    :param content: Any
+    :return: bytes
+    """
+    return orjson.dumps(content, default=encode_model)
+
+
+class TrustedJSONResponse(JSONResponse):
+    """
+    JSON response, whose content is not validated against the response model again.
+    The endpoints keep their `response_model`, so that the OpenAPI schema is still described by the schemas.
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional, Union
 from pydantic import BaseModel, EmailStr
 
 
@@ -12,6 +12,19 @@ class TopSellingProduct(BaseModel):
     total_sales: int
 
 
+class YearTopSellingProducts(BaseModel):
+    year: int
+    products: List[TopSellingProduct]
+
+
+class ProductSales(BaseModel):
+    product_id: int
+    product_name: str
+    product_category: str
+    quantity: int
+    revenue: float
+
+
 class LastOrderPerCustomer(BaseModel):
     customer_id: int
     customer_email: EmailStr
@@ -26,5 +39,47 @@ class TopSellingProductResponse(BaseModel):
     products: List[TopSellingProduct]
 
 
+class TopSellingProductsByYearResponse(BaseModel):
+    years: List[YearTopSellingProducts]
+
+
+class TopProductsResponse(BaseModel):
+    products: List[ProductSales]
+
+
 class LastOrderPerCustomerResponse(BaseModel):
     customers: List[LastOrderPerCustomer]
+    # Cursor of the next page, None when there are no more customers or the response is not paginated.
+    next_cursor: Optional[int] = None
+
+
+class StatementStats(BaseModel):
+    statement: str
+    count: int
+    total_ms: float
+    max_ms: float
+
+
+class SlowQuery(BaseModel):
+    statement: str
+    parameters: Union[Dict[str, str], List[str], None]
+    duration_ms: float
+    executed_at: str
+    dialect: str
+    # Rows of the EXPLAIN of the dialect, None when the query could not be explained.
+    plan: Optional[List[str]]
+
+
+class SlowQueryLog(BaseModel):
+    enabled: bool
+    threshold_ms: float
+    statements: List[StatementStats]
+    queries: List[SlowQuery]
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+    version: Optional[int]
@@ -0,0 +1,152 @@
+"""
+Benchmark of the birthday lookup on a large customer table.
+
+A scratch database is filled with random customers, and the birthday query of the reader engine,
+which is served by the `birth_month_day` index, is compared with the former query,
+which applied a function to `birthdate` and scanned the whole table.
+
+    python -m benchmarks.birthdays --customers 10000000
+    python -m benchmarks.birthdays --url postgresql+psycopg2://user@localhost/scratch
+
+The customer table of the scratch database is dropped and created again, so do not point it to the served database.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+
+from sqlalchemy import Column, Index, MetaData, Table, text
+
+
+from api.reader import DataReader
+from loader.models import Customer
+
+
+# Queries of the engines before the `birth_month_day` column was added.
+LEGACY_STATEMENTS = {
+    "sqlite": "SELECT customer_id, name FROM customer "
+              "WHERE strftime('%m%d', birthdate) = :month_day_text ORDER BY customer_id ASC",
+    "mysql": "SELECT customer_id, name FROM customer "
+             "WHERE MONTH(birthdate) = :month AND DAYOFMONTH(birthdate) = :day ORDER BY customer_id ASC",
+    "postgresql": "SELECT customer_id, name FROM customer "
+                  "WHERE extract(month from birthdate) = :month AND extract(day from birthdate) = :day "
+                  "ORDER BY customer_id ASC",
+}
+
+
+def customer_table() -> Table:
+    """
+    Copy of the customer table without the foreign keys, so that it can be created alone.
+    :return: Table
+    """
+    table = Table(
+        "customer",
+        MetaData(),
+        *[Column(c.name, c.type, primary_key=c.primary_key) for c in Customer.__table__.columns]
+    )
+    for index in Customer.__table__.indexes:
+        Index(index.name, *[table.c[c.name] for c in index.columns])
+    return table
+
+
+def fill(reader: DataReader, customers: int, batch_size: int):
+    """
+    Create the customer table and insert random customers.
+    :param reader: DataReader
+    :param customers: int
+    :param batch_size: int
+    """
+    table = customer_table()
+    rnd = random.Random(0)
+    first = datetime.date(1950, 1, 1).toordinal()
+    last = datetime.date(2005, 12, 31).toordinal()
+
+    with reader.sql_engine.begin() as connection:
+        table.drop(connection, checkfirst=True)
+        table.create(connection)
+
+    started = time.perf_counter()
+    for offset in range(0, customers, batch_size):
+        rows = []
+        for customer_id in range(offset + 1, min(offset + batch_size, customers) + 1):
+            birthdate = datetime.date.fromordinal(rnd.randint(first, last))
+            rows.append(dict(
+                customer_id=customer_id,
+                name="Customer {}".format(customer_id),
+                birthdate=birthdate,
+                birth_year=birthdate.year,
+                birth_month_day=birthdate.month * 100 + birthdate.day,
+            ))
+        with reader.sql_engine.begin() as connection:
+            connection.execute(table.insert(), rows)
+    return time.perf_counter() - started
+
+
+def measure(reader: DataReader, statement, params: dict, repeat: int) -> dict:
+    """
+    Latencies of a query in milliseconds.
+    :param reader: DataReader
+    :param statement: TextClause
+    :param params: dict
+    :param repeat: int
+    :return: dict
+    """
+    latencies = []
+    with reader.sql_engine.connect() as connection:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = connection.execute(statement, params).fetchall()
+            latencies.append((time.perf_counter() - started) * 1000)
+    return dict(
+        rows=len(rows),
+        p50_ms=round(statistics.median(latencies), 3),
+        max_ms=round(max(latencies), 3),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=10000000)
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--url", default=None, help="scratch database, a temporary SQLite file by default")
+    args = parser.parse_args()
+
+    path = None
+    url = args.url
+    if url is None:
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        url = "sqlite:///{}".format(path)
+
+    try:
+        reader = DataReader(url)
+        fill_seconds = fill(reader, args.customers, args.batch_size)
+
+        date = datetime.date(2019, 3, 10)
+        indexed, params = reader.engine.birthdays_statement(date)
+        legacy = text(LEGACY_STATEMENTS[reader.db_type])
+        legacy_params = dict(month=date.month, day=date.day, month_day_text=date.strftime("%m%d"))
+
+        print(json.dumps({
+            "customers": args.customers,
+            "dialect": reader.db_type,
+            "fill_seconds": round(fill_seconds, 1),
+            "legacy": measure(reader, legacy, legacy_params, args.repeat),
+            "indexed": measure(reader, indexed, params, args.repeat),
+        }, indent=2))
+
+        reader.close()
+        DataReader.dispose()
+    finally:
+        if path is not None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Concurrency benchmark of the readers.
+
+The same query is requested concurrently on one event loop, once through the blocking
+DataReader called from a coroutine, like the endpoints did, and once through the AsyncDataReader.
+The overlap is the sum of the request latencies divided by the wall time,
+so 1.0 means that the requests were served one at a time.
+
+    python -m benchmarks.concurrency --requests 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+
+from api.reader import AsyncDataReader, DataReader
+
+
+def in_flight(intervals) -> int:
+    """
+    Maximum number of requests, which were served at the same time.
+    :param intervals: List[Tuple[float, float]]
+    :return: int
+    """
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+async def run_blocking(requests: int) -> list:
+    async def request():
+        started = time.perf_counter()
+        with DataReader() as reader:
+            reader.read_last_order_per_customer()
+        return started, time.perf_counter()
+
+    return await asyncio.gather(*[request() for _ in range(requests)])
+
+
+async def run_async(requests: int) -> list:
+    async def request():
+        started = time.perf_counter()
+        async with AsyncDataReader() as reader:
+            await reader.read_last_order_per_customer()
+        return started, time.perf_counter()
+
+    result = await asyncio.gather(*[request() for _ in range(requests)])
+    await AsyncDataReader.dispose()
+    return result
+
+
+def measure(runner, requests: int) -> dict:
+    # Warm up the connection pool and the caches of the database.
+    asyncio.run(runner(1))
+
+    started = time.perf_counter()
+    intervals = asyncio.run(runner(requests))
+    wall = time.perf_counter() - started
+    latency = sum(end - start for start, end in intervals)
+    return dict(
+        requests=requests,
+        wall_seconds=round(wall, 4),
+        mean_latency_seconds=round(latency / requests, 4),
+        overlap=round(latency / wall, 2),
+        max_in_flight=in_flight(intervals),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "blocking": measure(run_blocking, args.requests),
+        "async": measure(run_async, args.requests),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
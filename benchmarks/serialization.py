@@ -0,0 +1,89 @@
+"""
+Serialization benchmark of the last order per customer.
+
+Synthetic rows, like the ones returned by the database, are turned into a response body:
+    * validated - a validated model per row, the response model validated again and encoded by pydantic,
+      like the endpoints did before.
+    * trusted - models constructed without validation and encoded by orjson through TrustedJSONResponse.
+
+    python -m benchmarks.serialization --rows 10000 --repeat 20
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+
+
+from api.engine import ReaderEngine
+from api.responses import TrustedJSONResponse
+from api.schemas import LastOrderPerCustomer, LastOrderPerCustomerResponse
+
+
+def make_rows(count: int) -> list:
+    """
+    Rows of the last order per customer query.
+    :param count: int
+    :return: list
+    """
+    first = datetime.date(2019, 1, 1)
+    return [
+        (customer_id, "customer{}@example.com".format(customer_id), first + datetime.timedelta(days=customer_id % 365))
+        for customer_id in range(1, count + 1)
+    ]
+
+
+def validated(rows: list) -> bytes:
+    customers = []
+    for row in rows:
+        customers.append(LastOrderPerCustomer(
+            customer_id=row[0],
+            customer_email=row[1],
+            last_order_date=ReaderEngine.format_date(row[2]),
+        ))
+    response = LastOrderPerCustomerResponse(customers=customers)
+    return LastOrderPerCustomerResponse.model_validate(response.model_dump()).model_dump_json().encode()
+
+
+def trusted(rows: list) -> bytes:
+    customers = ReaderEngine.to_last_order_per_customer(rows)
+    return TrustedJSONResponse(dict(customers=customers, next_cursor=None)).body
+
+
+def measure(serialize, rows: list, repeat: int) -> dict:
+    """
+    Milliseconds to serialize the rows.
+    :param serialize: Callable
+    :param rows: list
+    :param repeat: int
+    :return: dict
+    """
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serialize(rows)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return dict(
+        p50_ms=round(statistics.median(latencies), 2),
+        per_10k_rows_ms=round(statistics.median(latencies) * 10000 / len(rows), 2),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert json.loads(validated(rows)) == json.loads(trusted(rows))
+
+    print(json.dumps({
+        "rows": args.rows,
+        "validated": measure(validated, rows, args.repeat),
+        "trusted": measure(trusted, rows, args.repeat),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
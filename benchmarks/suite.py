@@ -0,0 +1,284 @@
+"""
+Benchmark suite of the loader throughput and the reader latency.
+
+For every scale, the sample archive is scaled up, loaded into a scratch database with DataLoadEngine.run,
+and the DataReader.read_* methods are timed with the result cache disabled.
+At scale N the customers and the receipts are repeated N times with shifted ids, and the other files are kept.
+
+    python -m benchmarks.suite --scales 1 4 --output before.json
+    python -m benchmarks.suite --url postgresql+psycopg2://user@localhost/scratch --fast --output pg.json
+    python -m benchmarks.suite --compare before.json after.json
+
+The tables of the scratch database are dropped and created again, so do not point it to the served database.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+
+from flask import Flask
+
+
+from api.cache import ResultCache
+from api.engine import MemoryEngine
+from api.reader import DataReader
+from config import Config
+
+
+# Columns, which are shifted in every copy of a scaled file, and the ids, by which they are shifted.
+SCALED_FILES = {
+    "customer.csv": [("customer_id", "customer_id")],
+    "sales_reciepts.csv": [("transaction_id", "transaction_id"), ("customer_id", "customer_id")],
+}
+
+
+def shift(value: str, offset: int) -> str:
+    # Missing and zero customer ids are loaded as NULL, so they are kept.
+    if value in ("", "0"):
+        return value
+    return str(int(value) + offset)
+
+
+def read_csv(archive: zipfile.ZipFile, file: str) -> list:
+    with archive.open(file) as fp:
+        return list(csv.reader(io.TextIOWrapper(fp, encoding="utf-8", newline="")))
+
+
+def scale_archive(source: str, target: str, scale: int) -> None:
+    """
+    Write an archive, in which the customers and the receipts of the source are repeated `scale` times.
+    :param source: str
+    :param target: str
+    :param scale: int
+    :return: None
+    """
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as zout:
+        # Offsets are powers of ten above the ids of the file, which owns them, so that the copies do not overlap.
+        offsets = dict()
+        for file, columns in SCALED_FILES.items():
+            rows = read_csv(zin, file)
+            column = columns[0][0]
+            position = rows[0].index(column)
+            offsets[column] = 10 ** len(str(max(int(row[position]) for row in rows[1:])))
+
+        for info in zin.infolist():
+            if info.filename not in SCALED_FILES:
+                zout.writestr(info, zin.read(info.filename))
+                continue
+
+            rows = read_csv(zin, info.filename)
+            header, rows = rows[0], rows[1:]
+            shifts = [(header.index(column), offsets[key]) for column, key in SCALED_FILES[info.filename]]
+            with zout.open(info.filename, "w") as out:
+                text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+                writer = csv.writer(text)
+                writer.writerow(header)
+                for copy in range(scale):
+                    for row in rows:
+                        row = list(row)
+                        for position, offset in shifts:
+                            row[position] = shift(row[position], copy * offset)
+                        writer.writerow(row)
+                text.flush()
+                text.detach()
+
+
+def percentiles(latencies: list) -> dict:
+    """
+    Latency percentiles in milliseconds.
+    :param latencies: list - seconds
+    :return: dict
+    """
+    values = sorted(latency * 1000 for latency in latencies)
+    quantiles = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+    return dict(
+        count=len(values),
+        mean_ms=round(statistics.fmean(values), 3),
+        p50_ms=round(quantiles[49], 3),
+        p95_ms=round(quantiles[94], 3),
+        p99_ms=round(quantiles[98], 3),
+    )
+
+
+def bench_loader(url: str, archive: str, fast: bool) -> dict:
+    """
+    Load an archive into an empty scratch database.
+    :param url: str
+    :param archive: str
+    :param fast: bool
+    :return: dict - statistics of every file
+    """
+    from loader.engine import DataLoadEngine
+    from loader.models import db
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = \
+        {"connect_args": {"local_infile": True}} if url.startswith("mysql") else {}
+    db.init_app(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        loader = DataLoadEngine(db=db, fast=fast)
+        started = time.perf_counter()
+        loader.run(archive)
+        elapsed = time.perf_counter() - started
+        db.engine.dispose()
+
+    result = {
+        file: dict(
+            rows=stats["rows"],
+            seconds=round(stats["seconds"], 3),
+            rows_per_second=round(stats["rows_per_second"], 1),
+        )
+        for file, stats in loader.stats.items()
+    }
+    result["total"] = dict(
+        rows=sum(stats["rows"] for stats in loader.stats.values()),
+        seconds=round(elapsed, 3),
+        rows_per_second=round(sum(stats["rows"] for stats in loader.stats.values()) / elapsed, 1),
+    )
+    return result
+
+
+def bench_reader(url: str, repeat: int) -> dict:
+    """
+    Latency of the read methods of the DataReader, without the result cache.
+    :param url: str
+    :param repeat: int
+    :return: dict
+    """
+    cache = DataReader.cache
+    DataReader.cache = ResultCache(0, 0)
+    methods = {
+        "read_birthdays": lambda reader: reader.read_birthdays(datetime.date(2019, 3, 10)),
+        "read_top_selling_products": lambda reader: reader.read_top_selling_products(2019),
+        "read_top_selling_products_by_year":
+            lambda reader: reader.read_top_selling_products_by_year([2018, 2019, 2020]),
+        "read_top_products_month": lambda reader: reader.read_top_products(10, 2019, "month", 4),
+        "read_last_order_per_customer": lambda reader: reader.read_last_order_per_customer(),
+        "read_last_order_per_customer_page": lambda reader: reader.read_last_order_per_customer(1000, 100),
+    }
+    result = dict()
+    MemoryEngine.clear()
+    try:
+        with DataReader(url) as reader:
+            for name, method in methods.items():
+                method(reader)
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    method(reader)
+                    latencies.append(time.perf_counter() - started)
+                result[name] = percentiles(latencies)
+    finally:
+        DataReader.cache = cache
+        DataReader.dispose()
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    path = None
+    url = args.url
+    if url is None:
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        url = "sqlite:///{}".format(path)
+
+    results = dict(
+        meta=dict(
+            commit=git_commit(),
+            created_at=datetime.datetime.now().isoformat(),
+            python=platform.python_version(),
+            dialect=url.split(":")[0].split("+")[0],
+            fast=args.fast,
+            repeat=args.repeat,
+            reader_engine=Config.READER_ENGINE,
+        ),
+        scales=[],
+    )
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for scale in args.scales:
+                archive = os.path.join(directory, "dataset-{}.zip".format(scale))
+                scale_archive(args.archive, archive, scale)
+                print("Scale {}: loading ...".format(scale), file=sys.stderr)
+                loader = bench_loader(url, archive, args.fast)
+                print("Scale {}: reading ...".format(scale), file=sys.stderr)
+                reader = bench_reader(url, args.repeat)
+                results["scales"].append(dict(scale=scale, loader=loader, reader=reader))
+    finally:
+        if path is not None:
+            os.remove(path)
+    return results
+
+
+def compare(before: dict, after: dict) -> list:
+    """
+    Ratios of the measures of two results, after / before.
+    :param before: dict
+    :param after: dict
+    :return: list - lines of the report
+    """
+    lines = ["{:<6} {:<45} {:>12} {:>12} {:>8}".format("scale", "measure", "before", "after", "ratio")]
+    scales = {item["scale"]: item for item in before["scales"]}
+    for item in after["scales"]:
+        if item["scale"] not in scales:
+            continue
+        previous = scales[item["scale"]]
+        measures = [("loader", name, "rows_per_second") for name in item["loader"]] + \
+                   [("reader", name, key) for name in item["reader"] for key in ("p50_ms", "p95_ms", "p99_ms")]
+        for section, name, key in measures:
+            if name not in previous[section]:
+                continue
+            old, new = previous[section][name][key], item[section][name][key]
+            lines.append("{:<6} {:<45} {:>12} {:>12} {:>8}".format(
+                item["scale"], "{}.{}.{}".format(section, name, key), old, new,
+                "{:.2f}".format(new / old) if old else "-"))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=50, help="calls of every read method")
+    parser.add_argument("--fast", action="store_true", help="use the native bulk load path")
+    parser.add_argument("--url", default=None, help="scratch database, a temporary SQLite file by default")
+    parser.add_argument("--archive", default=Config.DATASET_ARCHIVE)
+    parser.add_argument("--output", default=None, help="JSON file of the results, printed when missing")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two JSON results")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as before, open(args.compare[1]) as after:
+            print("\n".join(compare(json.load(before), json.load(after))))
+        return
+
+    results = run(args)
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
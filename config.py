@@ -8,8 +8,37 @@ class Config(object):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
                               'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # LOAD DATA LOCAL INFILE of the fast loader has to be enabled by the client.
+    SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"local_infile": True}} \
+        if SQLALCHEMY_DATABASE_URI.startswith("mysql") else {}
     DATASET_ARCHIVE = os.environ.get('DATASET_ARCHIVE') \
                       or os.path.join(basedir, "assets", "dataset.zip")
+    LOADER_BATCH_SIZE = int(os.environ.get('LOADER_BATCH_SIZE') or 1000)
+    LOADER_FAST_BATCH_SIZE = int(os.environ.get('LOADER_FAST_BATCH_SIZE') or 10000)
+    LOADER_WORKERS = int(os.environ.get('LOADER_WORKERS') or 1)
+    LOADER_QUARANTINE_DIR = os.environ.get('LOADER_QUARANTINE_DIR') or None
+    LOADER_KEY_CACHE_SIZE = int(os.environ.get('LOADER_KEY_CACHE_SIZE') or 0)
+
+    READER_POOL_SIZE = int(os.environ.get('READER_POOL_SIZE') or 5)
+    READER_MAX_OVERFLOW = int(os.environ.get('READER_MAX_OVERFLOW') or 10)
+    READER_POOL_RECYCLE = int(os.environ.get('READER_POOL_RECYCLE') or 3600)
+    READER_POOL_PRE_PING = (os.environ.get('READER_POOL_PRE_PING') or '1') == '1'
+    READER_CACHE_SIZE = int(os.environ.get('READER_CACHE_SIZE') or 256)
+    READER_CACHE_TTL = float(os.environ.get('READER_CACHE_TTL') or 300)
+    READER_MAX_PAGE_SIZE = int(os.environ.get('READER_MAX_PAGE_SIZE') or 10000)
+    READER_STREAM_BATCH_SIZE = int(os.environ.get('READER_STREAM_BATCH_SIZE') or 1000)
+    READER_ENGINE = os.environ.get('READER_ENGINE') or 'sql'
+    READER_MEMORY_REFRESH = float(os.environ.get('READER_MEMORY_REFRESH') or 60)
+    READER_MEMORY_FALLBACK = (os.environ.get('READER_MEMORY_FALLBACK') or '1') == '1'
+    READER_PREPARED_STATEMENTS = (os.environ.get('READER_PREPARED_STATEMENTS') or '1') == '1'
+    READER_PROFILE_QUERIES = (os.environ.get('READER_PROFILE_QUERIES') or '0') == '1'
+    READER_SLOW_QUERY_MS = float(os.environ.get('READER_SLOW_QUERY_MS') or 100)
+    READER_SLOW_QUERY_LOG_SIZE = int(os.environ.get('READER_SLOW_QUERY_LOG_SIZE') or 100)
+    # Bearer token of the admin endpoints, which are not served without it.
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN') or None
+
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or '0') == '1'
+    METRICS_PUSHGATEWAY = os.environ.get('METRICS_PUSHGATEWAY') or None
 
     LOGGING = {
         "version": 1,
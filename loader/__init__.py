@@ -23,17 +23,56 @@ from . import models
 
 
 @click.command(name='load_data')
+@click.option('--batch-size', type=int, default=None,
+              help='Number of rows inserted with a single statement.')
+@click.option('--workers', type=int, default=None,
+              help='Number of files loaded concurrently.')
+@click.option('--fast', is_flag=True, default=False,
+              help='Use the native bulk load path of the database.')
+@click.option('--snapshot', type=click.Path(file_okay=False), default=None,
+              help='Directory, to which a columnar snapshot of the loaded tables is written.')
+@click.option('--quarantine', type=click.Path(file_okay=False), default=None,
+              help='Directory, to which the rows with invalid keys are written.')
 @with_appcontext
-def load_data() -> None:
+def load_data(batch_size, workers, fast, snapshot, quarantine) -> None:
     """
     Run the data loading engine.
+    :param batch_size: int | None
+    :param workers: int | None
+    :param fast: bool
+    :param snapshot: str | None
+    :param quarantine: str | None
     :return: None
     """
     from .engine import DataLoadEngine
-    loader = DataLoadEngine(db=db)
+    loader = DataLoadEngine(db=db, batch_size=batch_size, workers=workers, fast=fast, snapshot=snapshot,
+                            quarantine=quarantine)
     loader.run(Config.DATASET_ARCHIVE)
 
 
+@click.command(name='generate_dataset')
+@click.option('--scale', type=float, default=1,
+              help='Multiplier of the customers and the daily receipts of the sample dataset.')
+@click.option('--years', type=int, default=1,
+              help='Number of years of receipts.')
+@click.option('--seed', type=int, default=0,
+              help='Seed of the generator, the same seed produces the same archive.')
+@click.option('--output', type=click.Path(dir_okay=False), default='generated.zip',
+              help='Path of the generated archive.')
+def generate_dataset(scale, years, seed, output) -> None:
+    """
+    Generate a synthetic dataset archive from the sample dataset.
+    :param scale: float
+    :param years: int
+    :param seed: int
+    :param output: str
+    :return: None
+    """
+    from .generator import DatasetGenerator
+    with DatasetGenerator(Config.DATASET_ARCHIVE, scale=scale, years=years, seed=seed) as generator:
+        generator.run(output)
+
+
 @click.command(name='tests')
 @with_appcontext
 def run_tests() -> None:
@@ -50,4 +89,5 @@ def run_tests() -> None:
 
 
 app.cli.add_command(load_data)
+app.cli.add_command(generate_dataset)
 app.cli.add_command(run_tests)
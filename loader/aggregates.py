@@ -0,0 +1,72 @@
+from sqlalchemy import func, select
+
+
+from .models import Customer, Receipt, Date, Product, ProductYearSales, CustomerLastOrder, SalesRollup
+
+"""
+Summary tables, which are built after the data is loaded. One aggregate should have:
+    * model - the database model of the summary table.
+    * sources - models, whose tables are summarized. The aggregate is rebuilt when one of them is loaded.
+    * query - select statement, which returns the columns of the model in the order of the table.
+"""
+
+customer = Customer.__table__
+receipt = Receipt.__table__
+date = Date.__table__
+product = Product.__table__
+
+AGGREGATES = [
+    {
+        "model": ProductYearSales,
+        "sources": [Receipt, Date],
+        "query": select(
+            date.c.year_id,
+            receipt.c.product_id,
+            func.sum(receipt.c.quantity),
+        ).select_from(
+            receipt.join(date, date.c.transaction_date == receipt.c.transaction_date)
+        ).where(
+            receipt.c.product_id.isnot(None)
+        ).group_by(
+            date.c.year_id,
+            receipt.c.product_id,
+        ),
+    },
+    {
+        # Quantity and revenue at (date, outlet, product) grain, which is joined to the date and product tables
+        # for any time grain, outlet or category.
+        "model": SalesRollup,
+        "sources": [Receipt, Date, Product],
+        "query": select(
+            receipt.c.transaction_date,
+            receipt.c.sales_outlet_id,
+            receipt.c.product_id,
+            func.sum(receipt.c.quantity),
+            func.sum(receipt.c.line_item_amount),
+        ).select_from(
+            receipt.join(
+                date, date.c.transaction_date == receipt.c.transaction_date
+            ).join(
+                product, product.c.product_id == receipt.c.product_id
+            )
+        ).where(
+            receipt.c.sales_outlet_id.isnot(None)
+        ).group_by(
+            receipt.c.transaction_date,
+            receipt.c.sales_outlet_id,
+            receipt.c.product_id,
+        ),
+    },
+    {
+        "model": CustomerLastOrder,
+        "sources": [Receipt, Customer],
+        "query": select(
+            receipt.c.customer_id,
+            func.max(receipt.c.transaction_date),
+        ).select_from(
+            receipt.join(customer, customer.c.customer_id == receipt.c.customer_id)
+        ).group_by(
+            receipt.c.customer_id,
+        ),
+    },
+]
@@ -1,13 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import csv
-from io import StringIO
+import datetime
+import hashlib
+from io import TextIOWrapper
+import itertools
 import logging
+import threading
+import time
+from typing import Dict, List, Set, Union
 import zipfile
 
 
 from flask_sqlalchemy import SQLAlchemy
+from prometheus_client import push_to_gateway
+from sqlalchemy import literal, select, update
 
 
+from config import Config
+from .aggregates import AGGREGATES
 from .mapping import MAPPING
+from .metrics import loader_registry
+from .models import DatasetVersion, LoadState
+from .transform import BatchTransformer
+from .validate import KeyValidator, Quarantine
+from .writer import LoadWriter, InsertWriter, SqliteWriter, MySQLWriter, PostgreSQLWriter
 
 
 LOGGER = logging.getLogger(__name__)
@@ -24,6 +40,16 @@ class DataLoadEngine:
             self._mapping = MAPPING
         return self._mapping
 
+    @property
+    def aggregates(self) -> list:
+        """
+        The summary tables, which are built after the data is loaded.
+        :return: list
+        """
+        if self._aggregates is None:
+            self._aggregates = AGGREGATES
+        return self._aggregates
+
     @property
     def db(self) -> SQLAlchemy:
         """
@@ -35,9 +61,129 @@ class DataLoadEngine:
             self._db = db
         return self._db
 
-    def __init__(self, db=None, mapping=None):
+    @property
+    def batch_size(self) -> int:
+        """
+        How many rows are inserted with a single statement.
+        :return: int
+        """
+        if self._batch_size is None:
+            if self.fast:
+                self._batch_size = Config.LOADER_FAST_BATCH_SIZE
+            else:
+                self._batch_size = Config.LOADER_BATCH_SIZE
+        return self._batch_size
+
+    @property
+    def workers(self) -> int:
+        """
+        How many mapping rules are loaded concurrently.
+        :return: int
+        """
+        if self._workers is None:
+            self._workers = Config.LOADER_WORKERS
+        return self._workers
+
+    @property
+    def fast(self) -> bool:
+        """
+        Should the native bulk load path of the database be used.
+        :return: bool
+        """
+        return self._fast
+
+    @property
+    def snapshot(self) -> Union[str, None]:
+        """
+        Directory, to which a snapshot of the loaded tables is written for the snapshot reader engine.
+        :return: str | None
+        """
+        return self._snapshot
+
+    @property
+    def pushgateway(self) -> Union[str, None]:
+        """
+        Address of the Prometheus Pushgateway, to which the metrics of a run are pushed.
+        :return: str | None
+        """
+        if self._pushgateway is None:
+            self._pushgateway = Config.METRICS_PUSHGATEWAY
+        return self._pushgateway
+
+    @property
+    def quarantine(self) -> Union[str, None]:
+        """
+        Directory, to which the rows with invalid keys are written, instead of the log.
+        :return: str | None
+        """
+        if self._quarantine is None:
+            self._quarantine = Config.LOADER_QUARANTINE_DIR
+        return self._quarantine
+
+    @property
+    def key_cache_size(self) -> int:
+        """
+        Number of primary keys of a file, which are remembered to reject the duplicates, 0 for no limit.
+        :return: int
+        """
+        if self._key_cache_size is None:
+            self._key_cache_size = Config.LOADER_KEY_CACHE_SIZE
+        return self._key_cache_size
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """
+        Number of rows, rejected rows, rows with invalid keys, seconds, rows per second and seconds of every stage
+        (read, transform, write and indexes) of every file, which is loaded by the engine.
+        :return: Dict[str, dict]
+        """
+        return self._stats
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """
+        Seconds of the stages of the last run: files, aggregates and snapshot.
+        :return: Dict[str, float]
+        """
+        return self._timings
+
+    @property
+    def writer(self) -> LoadWriter:
+        """
+        The writer that is used to insert rows in the database.
+        :return: LoadWriter
+        """
+        if self._writer is None:
+            db_type = self.db.engine.dialect.name
+            if not self.fast:
+                self._writer = InsertWriter(self)
+            elif db_type == "sqlite":
+                self._writer = SqliteWriter(self)
+            elif db_type == "mysql":
+                self._writer = MySQLWriter(self)
+            elif db_type == "postgresql":
+                self._writer = PostgreSQLWriter(self)
+            else:
+                raise NotImplementedError
+        return self._writer
+
+    def __init__(self, db=None, mapping=None, batch_size=None, workers=None, fast=False, aggregates=None,
+                 snapshot=None, pushgateway=None, quarantine=None, key_cache_size=None):
         self._mapping = mapping
+        self._aggregates = aggregates
         self._db = db
+        self._batch_size = batch_size
+        self._workers = workers
+        self._fast = fast
+        self._snapshot = snapshot
+        self._pushgateway = pushgateway
+        self._quarantine = quarantine
+        self._key_cache_size = key_cache_size
+        self._writer = None
+        self._references = dict()
+        self._references_lock = threading.Lock()
+        self._stats = dict()
+        self._timings = dict()
 
     @classmethod
     def prepare_mapping_rule(cls, rule: dict) -> bool:
@@ -47,6 +193,8 @@ class DataLoadEngine:
             * model - the database model, which is loaded from the file.
             * rename_columns - pairs of (name in file, model field name)
             * transform_columns - pairs of (model field name, transformation function)
+            * memoize_columns - model field names, whose transformation results are cached
+            * derive_columns - triples of (model field name, source model field name, function of the source value)
         :param rule: dict
         :return: bool - is the rule valid
         """
@@ -58,60 +206,383 @@ class DataLoadEngine:
             LOGGER.error("Missing `model` in mapping rule.")
             return False
 
-        if "rename_columns" not in rule:
-            rule["rename_columns"] = []
+        for key in ("rename_columns", "transform_columns"):
+            if key not in rule:
+                rule[key] = []
 
-        for pair in rule["rename_columns"]:
-            if len(pair) != 2:
-                LOGGER.error("Pair in 'rename_columns' should have two elements.")
-                return False
+            # The rule is already prepared by a previous run.
+            if isinstance(rule[key], dict):
+                continue
 
-        if "transform_columns" not in rule:
-            rule["transform_columns"] = []
+            for pair in rule[key]:
+                if len(pair) != 2:
+                    LOGGER.error("Pair in '{}' should have two elements.".format(key))
+                    return False
 
-        for pair in rule["transform_columns"]:
-            if len(pair) != 2:
-                LOGGER.error("Pair in 'transform_columns' should have two elements.")
-                return False
+            rule[key] = {c[0]: c[1] for c in rule[key]}
+
+        if "memoize_columns" not in rule:
+            rule["memoize_columns"] = []
 
-        rule["rename_columns"] = {c[0]: c[1] for c in rule["rename_columns"]}
-        rule["transform_columns"] = {c[0]: c[1] for c in rule["transform_columns"]}
+        if "derive_columns" not in rule:
+            rule["derive_columns"] = []
+
+        for triple in rule["derive_columns"]:
+            if len(triple) != 3:
+                LOGGER.error("Triple in 'derive_columns' should have three elements.")
+                return False
 
         return True
 
     @classmethod
-    def fp_to_reader(cls, fp: zipfile.ZipExtFile) -> csv.DictReader:
+    def fp_to_rows(cls, fp: zipfile.ZipExtFile) -> csv.reader:
         """
-        Prepare a file descriptor from zip archive to csv.DictReader
+        Prepare a file descriptor from zip archive to csv.reader, which yields the rows as lists.
+        The content is decoded incrementally, so rows are read lazily and
+        the memory usage does not depend on the size of the file.
         :param fp: zipfile.ZipExtFile
-        :return: csv.DictReader
+        :return: csv.reader
         """
-        content = fp.read().decode()
-        data = StringIO(content)
-        return csv.DictReader(data)
+        data = TextIOWrapper(fp, encoding="utf-8", newline="")
+        return csv.reader(data)
 
     @classmethod
-    def read_row(cls, row: dict, rule: dict):
+    def dependencies(cls, rules: List[dict]) -> Dict[int, Set[int]]:
         """
-        Run a mapping rule over a single row from the CSV file and receive a SQLAlchemy.Model object.
-        :param row: dict
-        :param rule: dict
-        :return:
+        Build the dependency graph of the mapping rules from the foreign keys of their models.
+        A rule depends on the rules, which load the tables referenced by its model.
+        :param rules: List[dict]
+        :return: Dict[int, Set[int]] - indexes of the rules, on which each rule depends
+        """
+        producers = dict()
+        for idx, rule in enumerate(rules):
+            producers.setdefault(rule["model"].__table__.name, set()).add(idx)
+
+        graph = dict()
+        for idx, rule in enumerate(rules):
+            graph[idx] = set()
+            for fk in rule["model"].__table__.foreign_keys:
+                graph[idx] |= producers.get(fk.column.table.name, set())
+            graph[idx].discard(idx)
+        return graph
+
+    @classmethod
+    def fingerprint(cls, table) -> str:
+        """
+        Fingerprint of the columns of a table, so that a file is reloaded when its model changes.
+        :param table: sqlalchemy.Table
+        :return: str
+        """
+        return hashlib.md5(",".join(column.name for column in table.columns).encode()).hexdigest()
+
+    @classmethod
+    def read_state(cls, connection, file: str):
+        """
+        Read the load state of a file from the archive.
+        :param connection: sqlalchemy.engine.Connection
+        :param file: str
+        :return: Row | None
+        """
+        table = LoadState.__table__
+        state = connection.execute(select(table).where(table.c.file == file)).first()
+        connection.commit()
+        return state
+
+    @classmethod
+    def save_state(cls, connection, file: str, info: zipfile.ZipInfo, fingerprint: str,
+                   row_offset: int, completed: bool) -> None:
         """
-        kwargs = dict()
-        for key, value in row.items():
-            if not key:
+        Save how many rows of a file from the archive are loaded.
+        :param connection: sqlalchemy.engine.Connection
+        :param file: str
+        :param info: zipfile.ZipInfo
+        :param fingerprint: str
+        :param row_offset: int
+        :param completed: bool
+        :return: None
+        """
+        table = LoadState.__table__
+        values = dict(
+            file=file,
+            crc=info.CRC,
+            size=info.file_size,
+            fingerprint=fingerprint,
+            row_offset=row_offset,
+            completed=completed,
+        )
+        connection.execute(LoadWriter.upsert_statement(connection, table, list(values.keys())), values)
+        connection.commit()
+
+    @classmethod
+    def has_rows(cls, connection, table) -> bool:
+        """
+        Check if a table already has rows.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :return: bool
+        """
+        result = connection.execute(select(literal(1)).select_from(table).limit(1)).first() is not None
+        connection.commit()
+        return result
+
+    @classmethod
+    def drop_indexes(cls, connection, table) -> None:
+        """
+        Drop the secondary indexes of a table, so that they are not maintained during a bulk load.
+        Unique indexes are kept, because they reject duplicated rows.
+        On MySQL, the indexes, which back a foreign key, are kept too. InnoDB removes its own index of
+        a foreign key, when another index starts with its columns, and refuses to drop that index then.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :return: None
+        """
+        for index in table.indexes:
+            if index.unique:
+                continue
+            if connection.dialect.name == "mysql" and cls.backs_foreign_key(table, index):
                 continue
+            index.drop(connection, checkfirst=True)
+        connection.commit()
+
+    @classmethod
+    def backs_foreign_key(cls, table, index) -> bool:
+        """
+        Check if the leading columns of an index are the columns of a foreign key of the table.
+        :param table: sqlalchemy.Table
+        :param index: sqlalchemy.Index
+        :return: bool
+        """
+        columns = [column.name for column in index.columns]
+        return any(columns[:len(constraint.column_keys)] == list(constraint.column_keys)
+                   for constraint in table.foreign_key_constraints)
 
-            if key in rule["rename_columns"]:
-                key = rule["rename_columns"][key]
+    @classmethod
+    def create_indexes(cls, connection, table) -> None:
+        """
+        Create the indexes of a table, which are missing.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :return: None
+        """
+        for index in table.indexes:
+            started = time.perf_counter()
+            index.create(connection, checkfirst=True)
+            connection.commit()
+            LOGGER.info("Index '{}' is ready in {:.2f}s.".format(index.name, time.perf_counter() - started))
+
+    def build_aggregates(self, connection, loaded: Set[str]) -> None:
+        """
+        Rebuild the summary tables, whose sources were loaded or which are still empty.
+        :param connection: sqlalchemy.engine.Connection
+        :param loaded: Set[str] - names of the tables, in which rows were loaded
+        :return: None
+        """
+        for aggregate in self.aggregates:
+            table = aggregate["model"].__table__
+            sources = {model.__table__.name for model in aggregate["sources"]}
+            if not sources & loaded and self.has_rows(connection, table):
+                continue
 
-            if key in rule["transform_columns"]:
-                value = rule["transform_columns"][key](value)
+            LOGGER.info("Building '{}' ...".format(table.name))
+            started = time.perf_counter()
+            connection.execute(table.delete())
+            result = connection.execute(
+                table.insert().from_select([column.name for column in table.columns], aggregate["query"]))
+            connection.commit()
+            LOGGER.info("Built '{}' with {} records in {:.2f}s.".format(
+                table.name, result.rowcount, time.perf_counter() - started))
 
-            kwargs[key] = value
+    @classmethod
+    def bump_dataset_version(cls, connection) -> None:
+        """
+        Increase the version of the dataset, so that readers drop the results of the previous load.
+        :param connection: sqlalchemy.engine.Connection
+        :return: None
+        """
+        table = DatasetVersion.__table__
+        loaded_at = datetime.datetime.now()
+        result = connection.execute(
+            update(table).where(table.c.id == 1).values(version=table.c.version + 1, loaded_at=loaded_at))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(id=1, version=1, loaded_at=loaded_at))
+        connection.commit()
 
-        return rule["model"](**kwargs)
+    @classmethod
+    def read_dataset_version(cls, connection) -> int:
+        """
+        Version of the loaded dataset.
+        :param connection: sqlalchemy.engine.Connection
+        :return: int
+        """
+        table = DatasetVersion.__table__
+        version = connection.execute(select(table.c.version).where(table.c.id == 1)).scalar()
+        connection.commit()
+        return version or 0
+
+    @classmethod
+    def write_snapshot(cls, connection, directory: str) -> str:
+        """
+        Write a snapshot of the loaded tables, which is memory-mapped by the snapshot reader engine.
+        :param connection: sqlalchemy.engine.Connection
+        :param directory: str
+        :return: str - path of the snapshot
+        """
+        # NumPy is imported only by the loads, which write a snapshot.
+        from snapshot import ColumnStore, Snapshot
+        store = ColumnStore.load(connection, cls.read_dataset_version(connection))
+        return Snapshot.write(store, directory)
+
+    def reference_keys(self, connection, constraint) -> Set[tuple]:
+        """
+        Keys of the table, which is referenced by a foreign key. They are read once per run,
+        after the files of the referenced tables are loaded, and shared by the files, which reference it.
+        :param connection: sqlalchemy.engine.Connection
+        :param constraint: sqlalchemy.ForeignKeyConstraint
+        :return: Set[tuple]
+        """
+        key = (constraint.referred_table.name, ) + tuple(element.column.name for element in constraint.elements)
+        with self._references_lock:
+            if key not in self._references:
+                self._references[key] = KeyValidator.read_keys(connection, constraint)
+            return self._references[key]
+
+    def load_rule(self, engine, archive_file: str, rule: dict) -> int:
+        """
+        Load the file of a mapping rule using an own connection to the database.
+        Unchanged files, which are loaded, are skipped and partially loaded files are resumed.
+        :param engine: sqlalchemy.engine.Engine
+        :param archive_file: str
+        :param rule: dict
+        :return: int - number of inserted rows
+        """
+        with zipfile.ZipFile(archive_file) as zf, engine.connect() as connection:
+            table = rule["model"].__table__
+            info = zf.getinfo(rule["file"])
+            fingerprint = self.fingerprint(table)
+
+            state = self.read_state(connection, rule["file"])
+            offset = 0
+            if state is not None and (state.crc, state.size, state.fingerprint) == \
+                    (info.CRC, info.file_size, fingerprint):
+                if state.completed:
+                    LOGGER.info("Skipping unchanged '{}'.".format(rule["file"]))
+                    return 0
+                offset = state.row_offset
+                LOGGER.info("Resuming '{}' from row {}.".format(rule["file"], offset))
+            else:
+                self.save_state(connection, rule["file"], info, fingerprint, 0, False)
+
+            # Rows, which may already be in the table, are updated instead of rejected.
+            upsert = state is not None or self.has_rows(connection, table)
+
+            # Indexes of an empty table are created after the bulk load, which is faster than updating them.
+            stages = dict(read=0.0, transform=0.0, write=0.0, indexes=0.0)
+            if not upsert:
+                started = time.perf_counter()
+                self.drop_indexes(connection, table)
+                stages["indexes"] += time.perf_counter() - started
+
+            with zf.open(rule["file"]) as fp:
+                LOGGER.info("Reading from '{}' ...".format(rule["file"]))
+                started = time.perf_counter()
+                reader = self.fp_to_rows(fp)
+                header = next(reader, [])
+                transformer = BatchTransformer(rule, header)
+                validator = KeyValidator(
+                    table, transformer.columns, lambda constraint: self.reference_keys(connection, constraint),
+                    self.key_cache_size)
+                quarantine = None
+                if self.quarantine is not None:
+                    quarantine = Quarantine(self.quarantine, rule["file"], header, resume=offset > 0)
+                ctr = 0
+                total = 0
+                batch = []
+                writer_state = self.writer.prepare(connection)
+                try:
+                    for row in itertools.islice(reader, offset, None):
+                        batch.append(row)
+                        if len(batch) >= self.batch_size:
+                            ctr += self.write_batch(
+                                connection, table, transformer, batch, upsert, stages, validator, quarantine)
+                            total += len(batch)
+                            batch = []
+                            self.save_state(connection, rule["file"], info, fingerprint, offset + total, False)
+                    ctr += self.write_batch(
+                        connection, table, transformer, batch, upsert, stages, validator, quarantine)
+                    total += len(batch)
+                    self.save_state(connection, rule["file"], info, fingerprint, offset + total, True)
+                finally:
+                    if quarantine is not None:
+                        quarantine.close()
+                    self.writer.restore(connection, writer_state)
+                    indexed = time.perf_counter()
+                    self.create_indexes(connection, table)
+                    stages["indexes"] += time.perf_counter() - indexed
+                elapsed = time.perf_counter() - started
+                # Reading the CSV rows and saving the state take the time, which is not spent in the other stages.
+                stages["read"] = max(0.0, elapsed - stages["transform"] - stages["write"] - stages["indexes"])
+
+        LOGGER.info("{} records found in '{}'.".format(ctr, rule["file"]))
+        if total > ctr:
+            LOGGER.warning("{} records rejected in '{}'.".format(total - ctr, rule["file"]))
+        if quarantine is not None and quarantine.rows:
+            LOGGER.warning("{} records with invalid keys written to '{}'.".format(quarantine.rows, quarantine.path))
+        LOGGER.info("Loaded '{}' in {:.2f}s ({:.0f} rows/sec).".format(
+            rule["file"], elapsed, ctr / elapsed if elapsed else 0))
+        self.stats[rule["file"]] = dict(
+            rows=ctr,
+            rejected=total - ctr,
+            invalid=validator.rejected,
+            seconds=elapsed,
+            rows_per_second=ctr / elapsed if elapsed else 0,
+            stages=stages,
+        )
+        return ctr
+
+    def write_batch(self, connection, table, transformer: BatchTransformer, batch: List[list], upsert: bool,
+                    stages: Dict[str, float], validator: KeyValidator = None, quarantine: Quarantine = None) -> int:
+        """
+        Transform, validate and write a batch of CSV rows, and add their time to the stages of the file.
+        Rows with invalid keys are not written, so that the batch does not fail on a constraint and is not split.
+        They are written to the quarantine, or logged without one.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param transformer: BatchTransformer
+        :param batch: List[list]
+        :param upsert: bool
+        :param stages: Dict[str, float]
+        :param validator: KeyValidator | None
+        :param quarantine: Quarantine | None
+        :return: int - number of written rows
+        """
+        started = time.perf_counter()
+        rows = transformer.transform(batch)
+        if validator is not None:
+            reasons = validator.validate(rows)
+            rejected = [idx for idx, reason in enumerate(reasons) if reason is not None]
+            for idx in rejected:
+                if quarantine is not None:
+                    quarantine.write(batch[idx], reasons[idx])
+                else:
+                    LOGGER.error("Rejected row {}: {}".format(dict(zip(transformer.columns, rows[idx])), reasons[idx]))
+            if rejected:
+                rows = [row for row, reason in zip(rows, reasons) if reason is None]
+        transformed = time.perf_counter()
+        ctr = self.writer.write(connection, table, transformer.columns, rows, upsert)
+        stages["transform"] += transformed - started
+        stages["write"] += time.perf_counter() - transformed
+        return ctr
+
+    def push_metrics(self) -> None:
+        """
+        Push the statistics of the last run to the Pushgateway.
+        A failed push is logged, and does not fail the load.
+        :return: None
+        """
+        try:
+            push_to_gateway(self.pushgateway, job="coffeeshop_loader", registry=loader_registry(self))
+        except OSError as err:
+            LOGGER.warning("Could not push metrics to '{}': {}".format(self.pushgateway, err))
 
     def run(self, archive_file: str) -> None:
         """
@@ -121,22 +592,51 @@ class DataLoadEngine:
         """
 
         LOGGER.info("Reading archive file: {}".format(archive_file))
-        with zipfile.ZipFile(archive_file) as zf:
-            for rule in self.mapping:
-                if not self.prepare_mapping_rule(rule):
-                    continue
-
-                with zf.open(rule["file"]) as fp:
-                    LOGGER.info("Reading from '{}' ...".format(rule["file"]))
-                    ctr = 0
-                    for row in self.fp_to_reader(fp):
-                        entry = self.read_row(row, rule)
-                        self.db.session.add(entry)
-                        try:
-                            self.db.session.commit()
-                        except Exception as err:
-                            self.db.session.rollback()
-                            LOGGER.error("Error: {}".format(err))
-                        else:
-                            ctr += 1
-                    LOGGER.info("{} records found.".format(ctr))
+        rules = [rule for rule in self.mapping if self.prepare_mapping_rule(rule)]
+        graph = self.dependencies(rules)
+
+        engine = self.db.engine
+        LOGGER.info("Writing with {}.".format(type(self.writer).__name__))
+        workers = max(1, self.workers)
+        if workers > 1 and engine.dialect.name == "sqlite":
+            LOGGER.info("SQLite allows a single writer, loading with one worker.")
+            workers = 1
+
+        self._timings = dict()
+        self._references = dict()
+        started = time.perf_counter()
+        pending = list(range(len(rules)))
+        running = dict()
+        done = set()
+        loaded = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for idx in [idx for idx in pending if graph[idx] <= done]:
+                    pending.remove(idx)
+                    running[executor.submit(self.load_rule, engine, archive_file, rules[idx])] = idx
+
+                if not running:
+                    raise ValueError("Circular dependency between mapping rules.")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    idx = running.pop(future)
+                    done.add(idx)
+                    if future.result() > 0:
+                        loaded.add(rules[idx]["model"].__table__.name)
+
+        self.timings["files"] = time.perf_counter() - started
+
+        with engine.connect() as connection:
+            started = time.perf_counter()
+            self.build_aggregates(connection, loaded)
+            if loaded:
+                self.bump_dataset_version(connection)
+            self.timings["aggregates"] = time.perf_counter() - started
+            if self.snapshot is not None:
+                started = time.perf_counter()
+                self.write_snapshot(connection, self.snapshot)
+                self.timings["snapshot"] = time.perf_counter() - started
+
+        if self.pushgateway is not None:
+            self.push_metrics()
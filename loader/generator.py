@@ -0,0 +1,372 @@
+import calendar
+import collections
+import csv
+import datetime
+from io import TextIOWrapper
+import logging
+import random
+import time
+from typing import Dict, Iterator, List, Tuple
+import zipfile
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DatasetGenerator:
+    """
+    Generator of synthetic archives with the members and the headers of the sample dataset, at any size.
+
+    The reference files (staff, outlets, products and generations) are copied from the sample archive.
+    The customers and the receipts are scaled `scale` times and the dates cover `years` years from the first
+    sample date. Their distributions are taken from the sample: products, quantities and outlets are drawn
+    with the sample frequencies, so the hot products stay hot, and the customers of every store
+    repeat their orders with the skew of the sample.
+
+    The generator is seeded, so the same arguments produce the same archive, byte for byte.
+    The rows are written as they are generated, so the size of the archive does not affect the memory usage.
+    """
+    # Members, which are copied from the source archive.
+    REFERENCE_FILES = ("staff.csv", "sales_outlet.csv", "product.csv", "generations.csv")
+    # Timestamp of the members, so that the archive does not depend on the time it is written.
+    DATE_TIME = (2019, 1, 1, 0, 0, 0)
+    # Skew of the customers: the customers are drawn at `u ** CUSTOMER_SKEW` of a shuffled pool for a uniform `u`,
+    # so the top fraction `f` of them places `f ** (1 / CUSTOMER_SKEW)` of the orders, like 20% -> 33% in the sample.
+    CUSTOMER_SKEW = 1.5
+
+    @property
+    def source(self) -> zipfile.ZipFile:
+        return self._source
+
+    @property
+    def scale(self) -> float:
+        return self._scale
+
+    @property
+    def years(self) -> int:
+        return self._years
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @property
+    def random(self) -> random.Random:
+        return self._random
+
+    @property
+    def headers(self) -> Dict[str, List[str]]:
+        """
+        Headers of the members of the source archive.
+        :return: Dict[str, List[str]]
+        """
+        if self._headers is None:
+            self._headers = {info.filename: next(self.read(info.filename)) for info in self.source.infolist()}
+        return self._headers
+
+    @property
+    def dates(self) -> List[datetime.date]:
+        """
+        Dates of the generated dataset, `years` years from the first date of the sample.
+        :return: List[datetime.date]
+        """
+        if self._dates is None:
+            rows = self.read_dicts("Dates.csv")
+            start = min(datetime.datetime.strptime(row["transaction_date"], "%m/%d/%Y").date() for row in rows)
+            end = self.add_years(start, self.years)
+            self._dates = [start + datetime.timedelta(days=day) for day in range((end - start).days)]
+        return self._dates
+
+    @property
+    def receipts(self) -> dict:
+        """
+        Distributions of the sample receipts.
+        :return: dict
+        """
+        if self._receipts is None:
+            self._receipts = self.describe_receipts(self.read_dicts("sales_reciepts.csv"))
+        return self._receipts
+
+    def __init__(self, source: str, scale: float = 1, years: int = 1, seed: int = 0):
+        """
+        :param source: str - path of the sample archive
+        :param scale: float - multiplier of the customers and the daily receipts of the sample
+        :param years: int - years of receipts
+        :param seed: int
+        """
+        if scale <= 0:
+            raise ValueError("Scale should be positive.")
+        if years < 1:
+            raise ValueError("Years should be at least one.")
+
+        self._source = zipfile.ZipFile(source)
+        self._scale = scale
+        self._years = years
+        self._seed = seed
+        self._random = random.Random(seed)
+        self._headers = None
+        self._dates = None
+        self._receipts = None
+
+    def close(self) -> None:
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @classmethod
+    def add_years(cls, date: datetime.date, years: int) -> datetime.date:
+        try:
+            return date.replace(year=date.year + years)
+        except ValueError:
+            # February 29th
+            return date.replace(year=date.year + years, day=28)
+
+    @classmethod
+    def cumulative(cls, counter: collections.Counter) -> Tuple[list, list]:
+        """
+        Values and cumulative weights of a counter, in a deterministic order, for `random.choices`.
+        :param counter: collections.Counter
+        :return: Tuple[list, list]
+        """
+        values = sorted(counter)
+        weights = []
+        total = 0
+        for value in values:
+            total += counter[value]
+            weights.append(total)
+        return values, weights
+
+    def read(self, file: str) -> Iterator[List[str]]:
+        with self.source.open(file) as fp:
+            yield from csv.reader(TextIOWrapper(fp, encoding="utf-8", newline=""))
+
+    def read_dicts(self, file: str) -> List[dict]:
+        with self.source.open(file) as fp:
+            return list(csv.DictReader(TextIOWrapper(fp, encoding="utf-8", newline="")))
+
+    def describe_receipts(self, rows: List[dict]) -> dict:
+        """
+        Frequencies of the values of the sample receipts, which are drawn by the generator.
+        :param rows: List[dict]
+        :return: dict
+        """
+        transactions = collections.Counter()
+        outlets = collections.Counter()
+        staff = collections.defaultdict(set)
+        for row in rows:
+            key = (row["transaction_id"], row["transaction_date"], row["sales_outlet_id"])
+            if key not in transactions:
+                outlets[int(row["sales_outlet_id"])] += 1
+            transactions[key] += 1
+            staff[int(row["sales_outlet_id"])].add(int(row["staff_id"]))
+
+        prices = collections.defaultdict(collections.Counter)
+        for row in rows:
+            prices[int(row["product_id"])][row["unit_price"]] += 1
+
+        times = sorted(row["transaction_time"] for row in rows)
+        opens = datetime.datetime.strptime(times[0], "%H:%M:%S")
+        closes = datetime.datetime.strptime(times[-1], "%H:%M:%S")
+        return dict(
+            per_day=len(transactions) / len(set(row["transaction_date"] for row in rows)),
+            outlets=self.cumulative(outlets),
+            staff={outlet: sorted(ids) for outlet, ids in staff.items()},
+            lines=self.cumulative(collections.Counter(transactions.values())),
+            products=self.cumulative(collections.Counter(int(row["product_id"]) for row in rows)),
+            quantities=self.cumulative(collections.Counter(int(row["quantity"]) for row in rows)),
+            # The most frequent price of every product
+            prices={product: counter.most_common(1)[0][0] for product, counter in prices.items()},
+            orders=self.cumulative(collections.Counter(row["order"] for row in rows)),
+            instore=self.cumulative(collections.Counter(row["instore_yn"] for row in rows)),
+            promo=self.cumulative(collections.Counter(row["promo_item_yn"] for row in rows)),
+            anonymous=sum(row["customer_id"] in ("", "0") for row in rows) / len(rows),
+            opens=opens.hour * 3600 + opens.minute * 60 + opens.second,
+            closes=closes.hour * 3600 + closes.minute * 60 + closes.second,
+        )
+
+    def choice(self, distribution: Tuple[list, list]):
+        values, weights = distribution
+        return self.random.choices(values, cum_weights=weights)[0]
+
+    def choices(self, distribution: Tuple[list, list], k: int) -> list:
+        values, weights = distribution
+        return self.random.choices(values, cum_weights=weights, k=k)
+
+    def write_member(self, archive: zipfile.ZipFile, file: str, rows: Iterator[list]) -> int:
+        """
+        Stream rows to a CSV member of an archive, under the header of the sample member.
+        :param archive: zipfile.ZipFile
+        :param file: str
+        :param rows: Iterator[list]
+        :return: int - number of rows
+        """
+        started = time.perf_counter()
+        info = zipfile.ZipInfo(file, date_time=self.DATE_TIME)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        ctr = 0
+        with archive.open(info, "w", force_zip64=True) as fp:
+            data = TextIOWrapper(fp, encoding="utf-8", newline="")
+            writer = csv.writer(data)
+            writer.writerow(self.headers[file])
+            for row in rows:
+                writer.writerow(row)
+                ctr += 1
+            data.flush()
+            data.detach()
+        LOGGER.info("Generated {} rows of '{}' in {:.2f}s.".format(ctr, file, time.perf_counter() - started))
+        return ctr
+
+    def copy_member(self, archive: zipfile.ZipFile, file: str) -> None:
+        info = zipfile.ZipInfo(file, date_time=self.DATE_TIME)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        archive.writestr(info, self.source.read(file))
+
+    def generate_dates(self) -> Iterator[list]:
+        for date in self.dates:
+            quarter = (date.month - 1) // 3 + 1
+            yield [
+                "{}/{}/{}".format(date.month, date.day, date.year), date.strftime("%Y%m%d"),
+                date.isocalendar()[1], "Week {}".format(date.isocalendar()[1]),
+                date.month, calendar.month_name[date.month], quarter, "Q{}".format(quarter), date.year,
+            ]
+
+    def generate_sales_targets(self) -> Iterator[list]:
+        targets = dict()
+        for row in self.read("sales targets.csv"):
+            if row[0].isdigit():
+                targets.setdefault(int(row[0]), row[2:])
+
+        months = sorted(set((date.year, date.month) for date in self.dates))
+        for year, month in months:
+            for outlet, goals in sorted(targets.items()):
+                yield [outlet, datetime.date(year, month, 1).strftime("%b-%y")] + goals
+
+    def generate_pastry_inventory(self) -> Iterator[list]:
+        stock = collections.defaultdict(collections.Counter)
+        for row in self.read_dicts("pastry inventory.csv"):
+            stock[(int(row["sales_outlet_id"]), int(row["product_id"]))][int(row["start_of_day"])] += 1
+        stock = {key: self.cumulative(counter) for key, counter in sorted(stock.items())}
+
+        for date in self.dates:
+            for (outlet, product), distribution in stock.items():
+                start = self.choice(distribution)
+                sold = self.random.randint(0, start)
+                yield [
+                    outlet, "{}/{}/{}".format(date.month, date.day, date.year), product, start, sold, start - sold,
+                    "{}%".format(round((start - sold) * 100 / start) if start else 0),
+                ]
+
+    def generate_customers(self, pools: Dict[int, List[int]]) -> Iterator[list]:
+        """
+        Customers of the scaled dataset, with the frequencies of the sample.
+        Their ids are collected by home store in `pools`, from which the customers of the receipts are drawn.
+        :param pools: Dict[int, List[int]]
+        :return: Iterator[list]
+        """
+        rows = self.read_dicts("customer.csv")
+        names = sorted(set(row["customer_first-name"] for row in rows))
+        users = sorted(set(row["customer_email"].split("@")[0] for row in rows))
+        domains = sorted(set(row["customer_email"].split("@")[1] for row in rows))
+        stores = self.cumulative(collections.Counter(int(row["home_store"]) for row in rows))
+        genders = self.cumulative(collections.Counter(row["gender"] for row in rows))
+        birth_years = self.cumulative(collections.Counter(int(row["birth_year"]) for row in rows))
+        since = sorted(datetime.datetime.strptime(row["customer_since"], "%Y-%m-%d").date() for row in rows)
+        since_days = (since[-1] - since[0]).days
+
+        for customer_id in range(1, max(1, round(len(rows) * self.scale)) + 1):
+            store = self.choice(stores)
+            pools[store].append(customer_id)
+            birth_year = self.choice(birth_years)
+            birthdate = datetime.date(birth_year, 1, 1) + datetime.timedelta(days=self.random.randrange(365))
+            yield [
+                customer_id, store, self.random.choice(names),
+                "{}@{}".format(self.random.choice(users), self.random.choice(domains)),
+                since[0] + datetime.timedelta(days=self.random.randint(0, since_days)),
+                "{:03d}-{:03d}-{:04d}".format(
+                    self.random.randrange(1000), self.random.randrange(1000), self.random.randrange(10000)),
+                birthdate, self.choice(genders), birth_year,
+            ]
+
+    def draw_customer(self, pool: List[int]) -> int:
+        """
+        Draw a customer of a shuffled pool with the skew of `CUSTOMER_SKEW`.
+        :param pool: List[int]
+        :return: int
+        """
+        return pool[int(len(pool) * self.random.random() ** self.CUSTOMER_SKEW)]
+
+    def generate_receipts(self, pools: Dict[int, List[int]]) -> Iterator[list]:
+        """
+        Receipts of every date, whose number per day is scaled, with the frequencies of the sample.
+        :param pools: Dict[int, List[int]] - ids of the customers by home store
+        :return: Iterator[list]
+        """
+        stats = self.receipts
+        everyone = sorted(customer_id for pool in pools.values() for customer_id in pool)
+        pools = {outlet: list(pool) for outlet, pool in sorted(pools.items())}
+        for pool in pools.values():
+            self.random.shuffle(pool)
+        self.random.shuffle(everyone)
+
+        per_day = max(1, round(stats["per_day"] * self.scale))
+        transaction_id = 0
+        for date in self.dates:
+            day = date.isoformat()
+            # The values of a day are drawn together, and its transactions are written in the order of their time.
+            seconds = sorted(self.random.randint(stats["opens"], stats["closes"]) for _ in range(per_day))
+            outlets = self.choices(stats["outlets"], per_day)
+            lines = self.choices(stats["lines"], per_day)
+            instore = self.choices(stats["instore"], per_day)
+            orders = self.choices(stats["orders"], per_day)
+            products = iter(self.choices(stats["products"], sum(lines)))
+            quantities = iter(self.choices(stats["quantities"], sum(lines)))
+            promo = iter(self.choices(stats["promo"], sum(lines)))
+            for position, second in enumerate(seconds):
+                transaction_id += 1
+                outlet = outlets[position]
+                staff_id = self.random.choice(stats["staff"][outlet])
+                if self.random.random() < stats["anonymous"]:
+                    customer_id = 0
+                else:
+                    customer_id = self.draw_customer(pools.get(outlet) or everyone)
+                clock = "{:02d}:{:02d}:{:02d}".format(second // 3600, second // 60 % 60, second % 60)
+                for line_item_id in range(1, lines[position] + 1):
+                    product_id = next(products)
+                    quantity = next(quantities)
+                    price = stats["prices"][product_id]
+                    yield [
+                        transaction_id, day, clock, outlet, staff_id, customer_id, instore[position],
+                        orders[position], line_item_id, product_id, quantity,
+                        "{:.2f}".format(quantity * float(price)), price, next(promo),
+                    ]
+
+    def run(self, target: str) -> Dict[str, int]:
+        """
+        Write the generated archive.
+        :param target: str - path of the archive
+        :return: Dict[str, int] - number of rows of every generated member
+        """
+        started = time.perf_counter()
+        result = dict()
+        pools = collections.defaultdict(list)
+        generators = {
+            "Dates.csv": self.generate_dates,
+            "sales targets.csv": self.generate_sales_targets,
+            "pastry inventory.csv": self.generate_pastry_inventory,
+            "customer.csv": lambda: self.generate_customers(pools),
+            # The customers are written first, so that their pools are complete.
+            "sales_reciepts.csv": lambda: self.generate_receipts(pools),
+        }
+        with zipfile.ZipFile(target, "w", allowZip64=True) as archive:
+            for file in self.REFERENCE_FILES:
+                self.copy_member(archive, file)
+            for file, generator in generators.items():
+                result[file] = self.write_member(archive, file, generator())
+
+        LOGGER.info("Generated dataset '{}' at scale {} for {} years in {:.2f}s.".format(
+            target, self.scale, self.years, time.perf_counter() - started))
+        return result
@@ -8,6 +8,8 @@ One mapping rule should have:
     * model - the database model, which is loaded from the file.
     * rename_columns - pairs of (name in file, model field name)
     * transform_columns - pairs of (model field name, transformation function)
+    * memoize_columns - model field names with few distinct values, whose transformation results are cached
+    * derive_columns - triples of (model field name, source model field name, function of the source value)
 """
 
 MAPPING = [
@@ -70,6 +72,7 @@ MAPPING = [
             ("transaction_date", lambda x: datetime.datetime.strptime(x, "%m/%d/%Y").date()),
             ("waste_percent", lambda x: x.rstrip("%")),
         ],
+        "memoize_columns": ["transaction_date"],
     },
 
     {
@@ -92,6 +95,10 @@ MAPPING = [
             ("customer_since", lambda x: datetime.datetime.strptime(x, "%Y-%m-%d").date()),
             ("birthdate", lambda x: datetime.datetime.strptime(x, "%Y-%m-%d").date()),
         ],
+        "memoize_columns": ["customer_since", "birthdate", "birth_month_day"],
+        "derive_columns": [
+            ("birth_month_day", "birthdate", lambda x: None if x is None else x.month * 100 + x.day),
+        ],
     },
     {
         "file": "sales_reciepts.csv",
@@ -102,5 +109,6 @@ MAPPING = [
             ("transaction_time", lambda x: datetime.datetime.strptime(x, "%H:%M:%S").time()),
             ("customer_id", lambda x: None if not int(x) else int(x)),
         ],
+        "memoize_columns": ["transaction_date", "transaction_time"],
     },
 ]
@@ -0,0 +1,34 @@
+import time
+
+
+from prometheus_client import CollectorRegistry, Gauge
+
+
+def loader_registry(loader) -> CollectorRegistry:
+    """
+    Registry with the statistics of the last run of a loader, which is pushed to the Pushgateway.
+    :param loader: DataLoadEngine
+    :return: CollectorRegistry
+    """
+    registry = CollectorRegistry()
+    rows = Gauge("coffeeshop_loader_rows", "Rows loaded from the file.", ["file"], registry=registry)
+    rejected = Gauge("coffeeshop_loader_rejected_rows", "Rows of the file, which were rejected.", ["file"],
+                     registry=registry)
+    throughput = Gauge("coffeeshop_loader_rows_per_second", "Rows per second loaded from the file.", ["file"],
+                       registry=registry)
+    stages = Gauge("coffeeshop_loader_stage_seconds", "Seconds of every stage of loading the file.",
+                   ["file", "stage"], registry=registry)
+    for file, stats in loader.stats.items():
+        rows.labels(file).set(stats["rows"])
+        rejected.labels(file).set(stats["rejected"])
+        throughput.labels(file).set(stats["rows_per_second"])
+        for stage, seconds in stats["stages"].items():
+            stages.labels(file, stage).set(seconds)
+
+    run = Gauge("coffeeshop_loader_run_seconds", "Seconds of every stage of the run.", ["stage"], registry=registry)
+    for stage, seconds in loader.timings.items():
+        run.labels(stage).set(seconds)
+
+    Gauge("coffeeshop_loader_last_success_timestamp_seconds", "Time, when the last run finished.",
+          registry=registry).set(time.time())
+    return registry
@@ -32,6 +32,10 @@ class SalesOutlet(db.Model):
 
 
 class Customer(db.Model):
+    __table_args__ = (
+        db.Index('ix_customer_birth_month_day', 'birth_month_day', 'customer_id'),
+    )
+
     customer_id = db.Column(db.Integer, primary_key=True)
     home_store = db.Column(db.Integer, db.ForeignKey('sales_outlet.sales_outlet_id'))
     name = db.Column(db.String(120))
@@ -41,6 +45,8 @@ class Customer(db.Model):
     birthdate = db.Column(db.Date)
     gender = db.Column(db.String(1))
     birth_year = db.Column(db.Integer, db.ForeignKey('generation.birth_year'))
+    # month * 100 + day of the birthdate, so that birthdays are found with an index.
+    birth_month_day = db.Column(db.SmallInteger)
 
     def __repr__(self):
         return '<Customer {}>'.format(self.name)
@@ -120,6 +126,10 @@ class Receipt(db.Model):
     __table_args__ = (
         db.PrimaryKeyConstraint('transaction_id', 'transaction_date',
                                 'transaction_time', 'sales_outlet_id', 'order', "line_item_id"),
+        # Covers the last order of every customer.
+        db.Index('ix_receipt_customer_date', 'customer_id', 'transaction_date'),
+        # Covers the quantities of the products sold in a range of dates.
+        db.Index('ix_receipt_date_product_quantity', 'transaction_date', 'product_id', 'quantity'),
     )
 
     transaction_id = db.Column(db.Integer)
@@ -141,6 +151,64 @@ class Receipt(db.Model):
         return '<Receipt {} {} {}>'.format(self.transaction_id, self.transaction_date, self.transaction_time)
 
 
+class ProductYearSales(db.Model):
+    __table_args__ = (
+        db.PrimaryKeyConstraint('year_id', 'product_id'),
+        db.Index('ix_product_year_sales_year_quantity', 'year_id', 'quantity'),
+    )
+
+    year_id = db.Column(db.SmallInteger)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'))
+    quantity = db.Column(db.BigInteger)
+
+    def __repr__(self):
+        return '<ProductYearSales {} {}>'.format(self.year_id, self.product_id)
+
+
+class SalesRollup(db.Model):
+    __table_args__ = (
+        db.PrimaryKeyConstraint('transaction_date', 'sales_outlet_id', 'product_id'),
+    )
+
+    transaction_date = db.Column(db.Date, db.ForeignKey('date.transaction_date'))
+    sales_outlet_id = db.Column(db.Integer, db.ForeignKey('sales_outlet.sales_outlet_id'))
+    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'))
+    quantity = db.Column(db.BigInteger)
+    revenue = db.Column(db.Float(decimal_return_scale=2))
+
+    def __repr__(self):
+        return '<SalesRollup {} {} {}>'.format(self.transaction_date, self.sales_outlet_id, self.product_id)
+
+
+class CustomerLastOrder(db.Model):
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.customer_id'), primary_key=True)
+    last_order_date = db.Column(db.Date)
+
+    def __repr__(self):
+        return '<CustomerLastOrder {} {}>'.format(self.customer_id, self.last_order_date)
+
+
+class LoadState(db.Model):
+    file = db.Column(db.String(255), primary_key=True)
+    crc = db.Column(db.BigInteger)
+    size = db.Column(db.BigInteger)
+    fingerprint = db.Column(db.String(32))
+    row_offset = db.Column(db.BigInteger, default=0)
+    completed = db.Column(db.Boolean, default=False)
+
+    def __repr__(self):
+        return '<LoadState {} {}>'.format(self.file, self.row_offset)
+
+
+class DatasetVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    loaded_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<DatasetVersion {}>'.format(self.version)
+
+
 class Test(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     square = db.Column(db.Integer)
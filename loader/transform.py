@@ -0,0 +1,71 @@
+import functools
+from typing import Callable, List
+
+
+class BatchTransformer:
+    MEMOIZE_SIZE = 65536
+
+    @property
+    def columns(self) -> List[str]:
+        """
+        Names of the model fields in the order of the output tuples.
+        :return: List[str]
+        """
+        return self._columns
+
+    def __init__(self, rule: dict, header: List[str]):
+        """
+        Compile a prepared mapping rule for the header of a CSV file.
+        The positions and the transformations of the columns are resolved once,
+        and the transformations of `memoize_columns` are cached.
+        The columns of `derive_columns` are computed from the transformed columns.
+        :param rule: dict
+        :param header: List[str]
+        """
+        self._columns = []
+        self._positions = []
+        self._transforms = []
+        for position, key in enumerate(header):
+            if not key:
+                continue
+
+            name = rule["rename_columns"].get(key, key)
+            transform = rule["transform_columns"].get(name)
+            if transform is not None and name in rule["memoize_columns"]:
+                transform = self.memoize(transform)
+
+            self._columns.append(name)
+            self._positions.append(position)
+            self._transforms.append(transform)
+
+        self._derived = []
+        for name, source, derive in rule["derive_columns"]:
+            if name in rule["memoize_columns"]:
+                derive = self.memoize(derive)
+            self._columns.append(name)
+            self._derived.append((self._columns.index(source), derive))
+
+    @classmethod
+    def memoize(cls, transform: Callable) -> Callable:
+        """
+        Cache a transformation, which is applied to a column with few distinct values.
+        :param transform: Callable
+        :return: Callable
+        """
+        return functools.lru_cache(maxsize=cls.MEMOIZE_SIZE)(transform)
+
+    def transform(self, rows: List[List[str]]) -> List[tuple]:
+        """
+        Transform a batch of CSV rows column by column.
+        :param rows: List[List[str]]
+        :return: List[tuple] - values in the order of `columns`
+        """
+        columns = []
+        for position, transform in zip(self._positions, self._transforms):
+            values = [row[position] if position < len(row) else None for row in rows]
+            if transform is not None:
+                values = list(map(transform, values))
+            columns.append(values)
+        for source, derive in self._derived:
+            columns.append(list(map(derive, columns[source])))
+        return list(zip(*columns))
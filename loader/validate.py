@@ -0,0 +1,259 @@
+import csv
+import datetime
+import itertools
+import logging
+import os
+from typing import Callable, List, Set, Union
+
+
+from sqlalchemy import select
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class KeyValidator:
+    """
+    Validator of the primary and the foreign keys of the batches of a file, which are checked against sets of keys
+    in memory, so that the bad rows are rejected before they are written, instead of by a failed insert.
+    """
+    # Value of a key, which can not be parsed.
+    INVALID = object()
+
+    # Parsers of the key values, which are not transformed by the mapping rule and are still strings.
+    PARSERS = {
+        int: int,
+        float: float,
+        datetime.date: datetime.date.fromisoformat,
+        datetime.time: datetime.time.fromisoformat,
+    }
+
+    @property
+    def keys(self) -> Set[int]:
+        """
+        Hashes of the primary keys of the accepted rows of the file, which are remembered up to the capacity.
+        :return: Set[int]
+        """
+        return self._keys
+
+    @property
+    def rejected(self) -> int:
+        """
+        Number of the rows of the file, which are rejected.
+        :return: int
+        """
+        return self._rejected
+
+    def __init__(self, table, columns: List[str], references: Callable, capacity: int = 0):
+        """
+        Resolve the positions of the key columns in the rows of a BatchTransformer.
+        Keys, whose columns are not all in the rows, like generated ids, are not checked.
+        :param table: sqlalchemy.Table
+        :param columns: List[str] - names of the columns of the rows
+        :param references: Callable - keys of the referenced table of a ForeignKeyConstraint
+        :param capacity: int - number of primary keys, which are remembered, 0 for no limit
+        """
+        positions = {name: position for position, name in enumerate(columns)}
+
+        self._table = table.name
+        self._primary_key = None
+        self._keys = set()
+        self._capacity = capacity
+        self._rejected = 0
+        names = [column.name for column in table.primary_key.columns]
+        if names and all(name in positions for name in names):
+            self._primary_key = ", ".join(names), self.key_columns(table, names, positions)
+
+        self._foreign_keys = []
+        for constraint in sorted(table.foreign_key_constraints, key=lambda constraint: constraint.column_keys):
+            names = constraint.column_keys
+            if all(name in positions for name in names):
+                self._foreign_keys.append((
+                    ", ".join(names),
+                    self.key_columns(table, names, positions),
+                    references(constraint),
+                ))
+
+    @classmethod
+    def key_columns(cls, table, names: List[str], positions: dict) -> List[tuple]:
+        """
+        Positions and parsers of the columns of a key.
+        :param table: sqlalchemy.Table
+        :param names: List[str]
+        :param positions: dict - position of every column in the rows
+        :return: List[tuple]
+        """
+        return [(positions[name], cls.parser(table.c[name])) for name in names]
+
+    @classmethod
+    def parser(cls, column) -> Union[Callable, None]:
+        try:
+            return cls.PARSERS.get(column.type.python_type)
+        except NotImplementedError:
+            return None
+
+    @classmethod
+    def read_keys(cls, connection, constraint) -> Set[tuple]:
+        """
+        Keys of the table, which is referenced by a foreign key.
+        :param connection: sqlalchemy.engine.Connection
+        :param constraint: sqlalchemy.ForeignKeyConstraint
+        :return: Set[tuple]
+        """
+        columns = [element.column for element in constraint.elements]
+        return set(tuple(row) for row in connection.execute(select(*columns)))
+
+    @classmethod
+    def extract(cls, rows: List[tuple], columns: List[tuple]) -> List[tuple]:
+        """
+        Values of a key in every row, which are parsed to the types of the database.
+        Values, which can not be parsed, are returned as INVALID.
+        :param rows: List[tuple]
+        :param columns: List[tuple] - positions and parsers of the columns of the key
+        :return: List[tuple]
+        """
+        values = []
+        for position, parse in columns:
+            column = [row[position] for row in rows]
+            # Columns, which are transformed by the mapping rule, are already parsed.
+            types = set(map(type, column))
+            if parse is not None and str in types:
+                column = cls.parse_column(parse, column, types == {str})
+            values.append(column)
+        return list(zip(*values))
+
+    @classmethod
+    def parse_column(cls, parse: Callable, column: list, strings: bool) -> list:
+        """
+        Parse the values of a column, which are strings. A column of only valid strings is parsed at once.
+        :param parse: Callable
+        :param column: list
+        :param strings: bool - are all values strings
+        :return: list
+        """
+        if strings:
+            try:
+                return list(map(parse, column))
+            except ValueError:
+                pass
+        return [cls.parse(parse, value) for value in column]
+
+    @classmethod
+    def parse(cls, parse: Callable, value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return parse(value)
+        except ValueError:
+            return cls.INVALID
+
+    def validate(self, rows: List[tuple]) -> List[Union[str, None]]:
+        """
+        Check the keys of a batch of rows. Rows, which repeat the primary key of a previous row of the file,
+        are rejected. The primary keys are remembered as their 64-bit hashes, which take about 70 bytes
+        instead of more than 200 bytes of a key of a receipt. A collision rejects a row as a duplicate
+        with a probability of about 1 in 4000 for 100 million keys, and the row is kept in the quarantine.
+        Rows of the table from a previous load are not checked, since the writer upserts them.
+        :param rows: List[tuple]
+        :return: List[str | None] - reason for the rejection of every row, None for the accepted rows
+        """
+        reasons = [None] * len(rows)
+
+        for name, columns, keys in self._foreign_keys:
+            for idx, key in enumerate(self.extract(rows, columns)):
+                if reasons[idx] is not None or None in key:
+                    continue
+                if self.INVALID in key:
+                    reasons[idx] = "invalid value of ({})".format(name)
+                elif key not in keys:
+                    reasons[idx] = "unknown ({}) {}".format(name, self.format_key(key))
+
+        if self._primary_key is not None:
+            name, columns = self._primary_key
+            keys = set()
+            for idx, key in enumerate(self.extract(rows, columns)):
+                if reasons[idx] is not None:
+                    continue
+                if None in key:
+                    reasons[idx] = "missing primary key ({})".format(name)
+                elif self.INVALID in key:
+                    reasons[idx] = "invalid primary key ({})".format(name)
+                else:
+                    digest = hash(key)
+                    if digest in keys or digest in self._keys:
+                        reasons[idx] = "duplicate primary key ({}) {}".format(name, self.format_key(key))
+                    else:
+                        keys.add(digest)
+            self.remember(keys)
+
+        self._rejected += sum(reason is not None for reason in reasons)
+        return reasons
+
+    def remember(self, keys: Set[int]) -> None:
+        """
+        Add the hashes of the primary keys of a batch to the ones of the previous batches, up to the capacity.
+        The keys beyond it are not remembered, so their duplicates in the following batches are rejected
+        by the insert, and a warning is logged for every batch, whose keys are not all remembered.
+        :param keys: Set[int]
+        :return: None
+        """
+        if self._capacity and len(self._keys) + len(keys) > self._capacity:
+            free = max(0, self._capacity - len(self._keys))
+            LOGGER.warning("{} primary keys of '{}' are not remembered beyond the capacity of {} keys, "
+                           "their duplicates in the next batches are left to the database.".format(
+                               len(keys) - free, self._table, self._capacity))
+            keys = set(itertools.islice(keys, free))
+        self._keys.update(keys)
+
+    @classmethod
+    def format_key(cls, key: tuple) -> str:
+        return "({})".format(", ".join(str(value) for value in key))
+
+
+class Quarantine:
+    """
+    CSV file of the rejected rows of a file, which keeps the rows as they were read, with the reason in the last column.
+    The file is created with the first rejected row, so that clean files leave no quarantine.
+    """
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    def __init__(self, directory: str, file: str, header: List[str], resume: bool = False):
+        """
+        :param directory: str
+        :param file: str - name of the file in the archive
+        :param header: List[str] - header of the file
+        :param resume: bool - append to the quarantine of a partial load
+        """
+        name, _ = os.path.splitext(os.path.basename(file))
+        self._path = os.path.join(directory, "{}.rejected.csv".format(name))
+        self._header = list(header) + ["reason"]
+        self._resume = resume
+        self._fp = None
+        self._writer = None
+        self._rows = 0
+        if not resume and os.path.exists(self._path):
+            os.remove(self._path)
+
+    def write(self, row: List[str], reason: str) -> None:
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            exists = self._resume and os.path.exists(self._path)
+            self._fp = open(self._path, "a" if exists else "w", encoding="utf-8", newline="")
+            self._writer = csv.writer(self._fp)
+            if not exists:
+                self._writer.writerow(self._header)
+        self._writer.writerow(list(row) + [reason])
+        self._rows += 1
+
+    def close(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+            self._writer = None
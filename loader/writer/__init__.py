@@ -0,0 +1,5 @@
+from .abstract import LoadWriter
+from .insert import InsertWriter
+from .sqlite import SqliteWriter
+from .mysql import MySQLWriter
+from .postgre import PostgreSQLWriter
@@ -0,0 +1,141 @@
+import datetime
+import logging
+from typing import List
+
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LoadWriter:
+    @property
+    def loader(self):
+        return self._loader
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def prepare(self, connection):
+        """
+        Prepare a connection for loading and return the settings, which should be restored afterwards.
+        :param connection: sqlalchemy.engine.Connection
+        :return: the state passed to restore
+        """
+        return None
+
+    def restore(self, connection, state) -> None:
+        """
+        Restore the settings of a connection after loading.
+        :param connection: sqlalchemy.engine.Connection
+        :param state: the state returned by prepare
+        :return: None
+        """
+
+    def bulk_write(self, connection, table, columns: List[str], rows: List[tuple], upsert: bool = False) -> int:
+        """
+        Write a batch of rows in the current transaction.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param columns: List[str]
+        :param rows: List[tuple] - values in the order of `columns`
+        :param upsert: bool - update the rows, which already exist
+        :return: int - number of written rows
+        """
+        raise NotImplementedError
+
+    def write(self, connection, table, columns: List[str], rows: List[tuple], upsert: bool = False) -> int:
+        """
+        Write and commit a batch of rows.
+        When the batch fails, it is split in halves, so that only the bad rows are rejected.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param columns: List[str]
+        :param rows: List[tuple] - values in the order of `columns`
+        :param upsert: bool - update the rows, which already exist
+        :return: int - number of written rows
+        """
+        if not rows:
+            return 0
+
+        try:
+            # Writers using the cursor of the driver bypass the autobegin of SQLAlchemy.
+            if not connection.in_transaction():
+                connection.begin()
+            ctr = self.bulk_write(connection, table, columns, rows, upsert)
+            connection.commit()
+        except Exception as err:
+            connection.rollback()
+            if len(rows) == 1:
+                LOGGER.error("Rejected row {}: {}".format(dict(zip(columns, rows[0])), err))
+                return 0
+            middle = len(rows) // 2
+            return self.write(connection, table, columns, rows[:middle], upsert) + \
+                self.write(connection, table, columns, rows[middle:], upsert)
+
+        return ctr
+
+    @classmethod
+    def upsert_statement(cls, connection, table, columns: List[str]):
+        """
+        INSERT statement, which updates the rows with the same primary key instead of failing.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param columns: List[str]
+        :return: sqlalchemy.sql.expression.Insert
+        """
+        keys = [column.name for column in table.primary_key.columns]
+        db_type = connection.dialect.name
+        if db_type == "mysql":
+            statement = mysql.insert(table)
+            update = {column: statement.inserted[column] for column in columns if column not in keys}
+            return statement.on_duplicate_key_update(update or {keys[0]: statement.inserted[keys[0]]})
+        elif db_type in ("sqlite", "postgresql"):
+            statement = (sqlite if db_type == "sqlite" else postgresql).insert(table)
+            update = {column: statement.excluded[column] for column in columns if column not in keys}
+            if not update:
+                return statement.on_conflict_do_nothing(index_elements=keys)
+            return statement.on_conflict_do_update(index_elements=keys, set_=update)
+        else:
+            raise NotImplementedError
+
+    @classmethod
+    def format_value(cls, value) -> str:
+        """
+        Format a value for a tab separated text stream, where NULL is written as \\N.
+        :param value: any
+        :return: str
+        """
+        if value is None:
+            return "\\N"
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, float):
+            return repr(value)
+        return str(value).replace("\\", "\\\\").replace("\t", "\\t") \
+            .replace("\n", "\\n").replace("\r", "\\r")
+
+    @classmethod
+    def format_rows(cls, rows: List[tuple]) -> str:
+        """
+        Format rows as a tab separated text stream.
+        :param rows: List[tuple]
+        :return: str
+        """
+        lines = []
+        for row in rows:
+            lines.append("\t".join(cls.format_value(value) for value in row))
+        lines.append("")
+        return "\n".join(lines)
+
+    @classmethod
+    def column_list(cls, connection, columns: List[str]) -> str:
+        """
+        Quoted list of columns, which can be used in a statement.
+        :param connection: sqlalchemy.engine.Connection
+        :param columns: List[str]
+        :return: str
+        """
+        quote = connection.dialect.identifier_preparer.quote
+        return ", ".join(quote(column) for column in columns)
@@ -0,0 +1,23 @@
+from typing import List
+
+
+from .abstract import LoadWriter
+
+
+class InsertWriter(LoadWriter):
+    def bulk_write(self, connection, table, columns: List[str], rows: List[tuple], upsert: bool = False) -> int:
+        """
+        Insert a batch of rows with a single multi-row INSERT statement.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param columns: List[str]
+        :param rows: List[tuple] - values in the order of `columns`
+        :param upsert: bool - update the rows, which already exist
+        :return: int - number of written rows
+        """
+        if upsert:
+            statement = self.upsert_statement(connection, table, columns)
+        else:
+            statement = table.insert()
+        connection.execute(statement, [dict(zip(columns, row)) for row in rows])
+        return len(rows)
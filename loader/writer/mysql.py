@@ -0,0 +1,72 @@
+import logging
+import os
+import tempfile
+from typing import List
+
+
+from .abstract import LoadWriter
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MySQLWriter(LoadWriter):
+    def bulk_write(self, connection, table, columns: List[str], rows: List[tuple], upsert: bool = False) -> int:
+        """
+        Write a batch of rows to a temporary file and load it with LOAD DATA LOCAL INFILE.
+        When the rows should be upserted, they are loaded to a temporary table and merged from there
+        with ON DUPLICATE KEY UPDATE, since REPLACE deletes the rows, which are referenced by foreign keys.
+        The connection should be opened with `local_infile` enabled.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param columns: List[str]
+        :param rows: List[tuple] - values in the order of `columns`
+        :param upsert: bool - update the rows, which already exist
+        :return: int - number of written rows
+        """
+        preparer = connection.dialect.identifier_preparer
+        target = preparer.format_table(table)
+        if upsert:
+            # Temporary tables outlive the transaction, so the one of a failed batch is dropped first.
+            target = preparer.quote("load_" + table.name)
+            connection.exec_driver_sql("DROP TEMPORARY TABLE IF EXISTS {}".format(target))
+            connection.exec_driver_sql("CREATE TEMPORARY TABLE {} LIKE {}".format(
+                target, preparer.format_table(table)))
+
+        sql = """
+        LOAD DATA LOCAL INFILE %s
+        INTO TABLE {}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+        LINES TERMINATED BY '\\n'
+        ({})
+        """.format(target, self.column_list(connection, columns))
+
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".tsv", delete=False) as fp:
+            fp.write(self.format_rows(rows))
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(sql, (fp.name, ))
+            ctr = cursor.rowcount
+        finally:
+            cursor.close()
+            os.unlink(fp.name)
+
+        if upsert:
+            keys = [column.name for column in table.primary_key.columns]
+            update = [column for column in columns if column not in keys] or keys[:1]
+            connection.exec_driver_sql(
+                "INSERT INTO {} ({}) SELECT {} FROM {} ON DUPLICATE KEY UPDATE {}".format(
+                    preparer.format_table(table),
+                    self.column_list(connection, columns),
+                    self.column_list(connection, columns),
+                    target,
+                    ", ".join("{0} = VALUES({0})".format(preparer.quote(column)) for column in update),
+                ))
+            connection.exec_driver_sql("DROP TEMPORARY TABLE {}".format(target))
+
+        # LOAD DATA LOCAL skips the rows, which violate constraints, with a warning.
+        if ctr < len(rows):
+            LOGGER.error("Rejected {} rows of '{}'.".format(len(rows) - ctr, table.name))
+        return ctr
@@ -0,0 +1,54 @@
+from io import StringIO
+from typing import List
+
+
+from .abstract import LoadWriter
+
+
+class PostgreSQLWriter(LoadWriter):
+    def bulk_write(self, connection, table, columns: List[str], rows: List[tuple], upsert: bool = False) -> int:
+        """
+        Stream a batch of rows through COPY ... FROM STDIN.
+        When the rows should be upserted, they are copied to a temporary table and merged from there.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param columns: List[str]
+        :param rows: List[tuple] - values in the order of `columns`
+        :param upsert: bool - update the rows, which already exist
+        :return: int - number of written rows
+        """
+        preparer = connection.dialect.identifier_preparer
+        target = preparer.format_table(table)
+        if upsert:
+            target = preparer.quote("load_" + table.name)
+            connection.exec_driver_sql("CREATE TEMPORARY TABLE {} (LIKE {}) ON COMMIT DROP".format(
+                target, preparer.format_table(table)))
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY {} ({}) FROM STDIN".format(target, self.column_list(connection, columns)),
+                StringIO(self.format_rows(rows)),
+            )
+            ctr = cursor.rowcount
+        finally:
+            cursor.close()
+
+        if upsert:
+            keys = [column.name for column in table.primary_key.columns]
+            update = [column for column in columns if column not in keys]
+            sql = "INSERT INTO {} ({}) SELECT {} FROM {} ON CONFLICT ({}) ".format(
+                preparer.format_table(table),
+                self.column_list(connection, columns),
+                self.column_list(connection, columns),
+                target,
+                self.column_list(connection, keys),
+            )
+            if update:
+                sql += "DO UPDATE SET " + ", ".join(
+                    "{0} = EXCLUDED.{0}".format(preparer.quote(column)) for column in update)
+            else:
+                sql += "DO NOTHING"
+            ctr = connection.exec_driver_sql(sql).rowcount
+
+        return ctr
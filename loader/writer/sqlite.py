@@ -0,0 +1,65 @@
+from typing import List
+
+
+from .abstract import LoadWriter
+
+
+class SqliteWriter(LoadWriter):
+    PRAGMAS = (
+        ("journal_mode", "MEMORY"),
+        ("synchronous", "OFF"),
+        ("cache_size", "-65536"),
+    )
+
+    def prepare(self, connection):
+        """
+        Switch to load-time pragmas and return the previous values.
+        :param connection: sqlalchemy.engine.Connection
+        :return: List[tuple]
+        """
+        state = []
+        for name, value in self.PRAGMAS:
+            state.append((name, connection.exec_driver_sql("PRAGMA {}".format(name)).scalar()))
+            connection.exec_driver_sql("PRAGMA {} = {}".format(name, value))
+        connection.commit()
+        return state
+
+    def restore(self, connection, state) -> None:
+        """
+        Restore the pragmas, which were changed for the load.
+        :param connection: sqlalchemy.engine.Connection
+        :param state: List[tuple]
+        :return: None
+        """
+        for name, value in state:
+            connection.exec_driver_sql("PRAGMA {} = {}".format(name, value))
+        connection.commit()
+
+    def bulk_write(self, connection, table, columns: List[str], rows: List[tuple], upsert: bool = False) -> int:
+        """
+        Insert a batch of rows with executemany of the driver, skipping the statement construction of SQLAlchemy.
+        :param connection: sqlalchemy.engine.Connection
+        :param table: sqlalchemy.Table
+        :param columns: List[str]
+        :param rows: List[tuple] - values in the order of `columns`
+        :param upsert: bool - update the rows, which already exist
+        :return: int - number of written rows
+        """
+        processors = [
+            table.c[column].type.dialect_impl(connection.dialect).bind_processor(connection.dialect)
+            for column in columns
+        ]
+        if upsert:
+            statement = self.upsert_statement(connection, table, columns)
+        else:
+            statement = table.insert()
+        sql = str(statement.compile(dialect=connection.dialect, column_keys=columns))
+
+        if any(processor is not None for processor in processors):
+            rows = [
+                tuple(value if processor is None else processor(value) for value, processor in zip(row, processors))
+                for row in rows
+            ]
+
+        connection.exec_driver_sql(sql, rows)
+        return len(rows)
@@ -0,0 +1,2 @@
+from .store import ColumnStore
+from .files import DictionaryColumn, Snapshot
@@ -0,0 +1,192 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+
+import numpy as np
+
+
+from .store import ColumnStore
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DictionaryColumn:
+    """
+    Column of strings, which is stored as int32 codes into a dictionary of distinct values.
+    The dictionary is the UTF-8 bytes of the values and the offsets of every value in them.
+    Missing values have code -1.
+    """
+
+    def __init__(self, codes: np.ndarray, offsets: np.ndarray, data: np.ndarray):
+        self.codes = codes
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, key) -> np.ndarray:
+        """
+        Decode the values of a slice or an array of positions.
+        :param key: slice | np.ndarray
+        :return: np.ndarray - array of str | None
+        """
+        codes = np.asarray(self.codes[key])
+        present = codes >= 0
+        starts = self.offsets[codes[present]].tolist()
+        ends = self.offsets[codes[present] + 1].tolist()
+        result = np.empty(len(codes), dtype=object)
+        result[present] = np.array(
+            [bytes(self.data[start:end]).decode("utf-8") for start, end in zip(starts, ends)], dtype=object)
+        return result
+
+    @classmethod
+    def encode(cls, values: np.ndarray) -> "DictionaryColumn":
+        """
+        Encode an array of strings.
+        :param values: np.ndarray - array of str | None
+        :return: DictionaryColumn
+        """
+        present = np.array([value is not None for value in values], dtype=bool)
+        dictionary, inverse = np.unique(values[present].astype(str), return_inverse=True)
+        codes = np.full(len(values), -1, dtype=np.int32)
+        codes[present] = inverse
+        encoded = [value.encode("utf-8") for value in dictionary.tolist()]
+        offsets = np.cumsum([0] + [len(value) for value in encoded]).astype(np.int64)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(codes, offsets, data)
+
+
+class Snapshot:
+    """
+    Snapshot of a ColumnStore in a directory, which is shared by processes through memory-mapped files.
+
+    Every column is written as fixed-width binary file, and the string columns are dictionary-encoded.
+    The files of a snapshot are in their own subdirectory, and `manifest.json` in the directory points to the
+    current one, so that a new snapshot is published by replacing the manifest, while readers of the
+    previous one keep their mapped files.
+    """
+    FORMAT = 1
+    MANIFEST = "manifest.json"
+
+    @classmethod
+    def write_array(cls, directory: str, name: str, values: np.ndarray) -> dict:
+        """
+        Write an array to a binary file.
+        :param directory: str
+        :param name: str
+        :param values: np.ndarray
+        :return: dict - description of the file in the manifest
+        """
+        values = np.ascontiguousarray(values)
+        values.tofile(os.path.join(directory, name + ".bin"))
+        return dict(file=name + ".bin", dtype=values.dtype.str, length=len(values))
+
+    @classmethod
+    def read_array(cls, directory: str, description: dict) -> np.ndarray:
+        """
+        Memory-map an array of a binary file read-only.
+        :param directory: str
+        :param description: dict - description of the file in the manifest
+        :return: np.ndarray
+        """
+        if description["length"] == 0:
+            return np.empty(0, dtype=description["dtype"])
+        return np.memmap(os.path.join(directory, description["file"]), dtype=description["dtype"], mode="r",
+                         shape=(description["length"], ))
+
+    @classmethod
+    def write(cls, store: ColumnStore, directory: str) -> str:
+        """
+        Write a store as the current snapshot of a directory, and remove the previous snapshots.
+        :param store: ColumnStore
+        :param directory: str
+        :return: str - path of the subdirectory of the snapshot
+        """
+        started = time.perf_counter()
+        os.makedirs(directory, exist_ok=True)
+        name = "v{}-{}".format(store.version, datetime.datetime.now().strftime("%Y%m%d%H%M%S%f"))
+        path = os.path.join(directory, name)
+        os.makedirs(path)
+
+        columns = dict()
+        for column in store.COLUMNS:
+            values = store.columns[column]
+            if column in store.STRINGS:
+                encoded = values if isinstance(values, DictionaryColumn) else DictionaryColumn.encode(values)
+                columns[column] = dict(
+                    codes=cls.write_array(path, column + ".codes", encoded.codes),
+                    offsets=cls.write_array(path, column + ".offsets", encoded.offsets),
+                    data=cls.write_array(path, column + ".data", encoded.data),
+                )
+            else:
+                columns[column] = cls.write_array(path, column, values)
+
+        manifest = dict(
+            format=cls.FORMAT,
+            version=store.version,
+            created_at=datetime.datetime.now().isoformat(),
+            path=name,
+            columns=columns,
+        )
+        keep = {name}
+        if os.path.exists(os.path.join(directory, cls.MANIFEST)):
+            keep.add(cls.read_manifest(directory)["path"])
+
+        handle, temp = tempfile.mkstemp(dir=directory, suffix=".json")
+        with os.fdopen(handle, "w") as fp:
+            json.dump(manifest, fp, indent=2)
+        os.chmod(temp, 0o644)
+        os.replace(temp, os.path.join(directory, cls.MANIFEST))
+
+        # The previous snapshot is kept for readers, which have just read its manifest.
+        # Processes, which have mapped the files of a removed snapshot, keep reading them until they are unmapped.
+        for entry in os.listdir(directory):
+            if entry not in keep and os.path.isdir(os.path.join(directory, entry)):
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+        LOGGER.info("Wrote snapshot of dataset version {} to '{}' in {:.2f}s.".format(
+            store.version, path, time.perf_counter() - started))
+        return path
+
+    @classmethod
+    def read_manifest(cls, directory: str) -> dict:
+        """
+        Read the manifest of the current snapshot of a directory.
+        :param directory: str
+        :return: dict
+        """
+        with open(os.path.join(directory, cls.MANIFEST)) as fp:
+            manifest = json.load(fp)
+        if manifest["format"] != cls.FORMAT:
+            raise ValueError("Unknown snapshot format {}.".format(manifest["format"]))
+        return manifest
+
+    @classmethod
+    def open(cls, directory: str, manifest: dict = None) -> ColumnStore:
+        """
+        Memory-map the current snapshot of a directory.
+        :param directory: str
+        :param manifest: dict | None - manifest, which is already read
+        :return: ColumnStore
+        """
+        if manifest is None:
+            manifest = cls.read_manifest(directory)
+        path = os.path.join(directory, manifest["path"])
+        columns = dict()
+        for column, description in manifest["columns"].items():
+            if column in ColumnStore.STRINGS:
+                columns[column] = DictionaryColumn(
+                    cls.read_array(path, description["codes"]),
+                    cls.read_array(path, description["offsets"]),
+                    cls.read_array(path, description["data"]),
+                )
+            else:
+                columns[column] = cls.read_array(path, description)
+        return ColumnStore(manifest["version"], columns, manifest["path"])
@@ -0,0 +1,190 @@
+import datetime
+import logging
+import time
+from typing import Dict, List, Tuple
+
+
+import numpy as np
+from sqlalchemy import text
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ColumnStore:
+    """
+    Columns of the receipt, product and customer tables in NumPy arrays, arranged for the queries.
+    Ids are int32, dates are int32 day numbers since 1970-01-01 and missing ids are -1.
+    """
+    CHUNK_SIZE = 100000
+
+    RECEIPT_SQL = """
+    SELECT COALESCE(r.customer_id, -1), COALESCE(r.product_id, -1), COALESCE(r.quantity, 0),
+        r.transaction_date, d.year_id
+    FROM receipt r
+    JOIN date d ON d.transaction_date = r.transaction_date
+    """
+    PRODUCT_SQL = "SELECT product_id, product FROM product"
+    CUSTOMER_SQL = """
+    SELECT customer_id, name, email, COALESCE(birth_month_day, 0)
+    FROM customer
+    ORDER BY customer_id ASC
+    """
+
+    # Names of the columns of a store, and the ones among them, which contain strings.
+    COLUMNS = (
+        "product_names",
+        "sales_years", "sales_offsets", "sales_products", "sales_totals",
+        "birthday_keys", "birthday_ids", "birthday_names",
+        "last_order_ids", "last_order_emails", "last_order_days",
+    )
+    STRINGS = ("product_names", "birthday_names", "last_order_emails")
+
+    def __init__(self, version: int, columns: Dict[str, np.ndarray], path: str = None):
+        """
+        :param version: int - version of the loaded dataset
+        :param columns: Dict[str, np.ndarray] - arrays of `COLUMNS`
+        :param path: str | None - name of the snapshot, from which the columns are mapped
+        """
+        self.version = version
+        self.path = path
+        self.checked_at = time.monotonic()
+        self.columns = columns
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def build(cls, version: int, receipt: List[np.ndarray], product: List[np.ndarray],
+              customer: List[np.ndarray]) -> "ColumnStore":
+        """
+        Arrange the columns of the tables for the queries.
+        :param version: int - version of the loaded dataset
+        :param receipt: List[np.ndarray] - customer_id, product_id, quantity, transaction_date, year_id
+        :param product: List[np.ndarray] - product_id, product
+        :param customer: List[np.ndarray] - customer_id, name, email, birth_month_day
+        :return: ColumnStore
+        """
+        receipt_customer, receipt_product, quantity, day, year = receipt
+        product_id, product_name = product
+        customer_id, customer_name, customer_email, month_day = customer
+        columns = dict()
+
+        size = int(max(product_id.max(initial=-1), receipt_product.max(initial=-1))) + 1
+        columns["product_names"] = np.empty(size, dtype=object)
+        columns["product_names"][product_id] = product_name
+        product_known = np.zeros(size, dtype=bool)
+        product_known[product_id] = True
+
+        # Quantities of the products, which are sold in a year, summed with one pass over the receipts of the year.
+        # The products of the year at index i are between sales_offsets[i] and sales_offsets[i + 1].
+        sold = receipt_product >= 0
+        years = np.unique(year[sold])
+        products, totals = [], []
+        for y in years.tolist():
+            mask = sold & (year == y)
+            year_totals = np.bincount(receipt_product[mask], weights=quantity[mask], minlength=size)
+            year_products = np.flatnonzero((np.bincount(receipt_product[mask], minlength=size) > 0) & product_known)
+            products.append(year_products.astype(np.int32))
+            totals.append(year_totals[year_products].astype(np.int64))
+        columns["sales_years"] = years.astype(np.int32)
+        columns["sales_offsets"] = np.cumsum([0] + [len(p) for p in products]).astype(np.int64)
+        columns["sales_products"] = np.concatenate(products) if products else np.array([], dtype=np.int32)
+        columns["sales_totals"] = np.concatenate(totals) if totals else np.array([], dtype=np.int64)
+
+        # Customers ordered by the month-day of their birthdate, and by id within one day.
+        order = np.lexsort((customer_id, month_day))
+        columns["birthday_keys"] = month_day[order]
+        columns["birthday_ids"] = customer_id[order]
+        columns["birthday_names"] = customer_name[order]
+
+        # The last order is the maximum day of the receipts of every customer.
+        size = int(max(customer_id.max(initial=-1), receipt_customer.max(initial=-1))) + 1
+        last = np.full(size, -1, dtype=np.int32)
+        known = receipt_customer >= 0
+        np.maximum.at(last, receipt_customer[known], day[known])
+        last = last[customer_id]
+        ordered = last >= 0
+        columns["last_order_ids"] = customer_id[ordered]
+        columns["last_order_emails"] = customer_email[ordered]
+        columns["last_order_days"] = last[ordered]
+
+        return cls(version, columns)
+
+    @classmethod
+    def fetch(cls, session, sql: str, dtypes: Tuple) -> List[np.ndarray]:
+        """
+        Fetch the columns of a query in chunks, so that the rows are not kept as Python objects.
+        :param session: sqlalchemy.orm.Session | sqlalchemy.engine.Connection
+        :param sql: str
+        :param dtypes: Tuple - NumPy type of every column
+        :return: List[np.ndarray]
+        """
+        chunks = [[] for _ in dtypes]
+        result = session.execute(text(sql), execution_options=dict(stream_results=True))
+        for rows in result.partitions(cls.CHUNK_SIZE):
+            for idx, (values, dtype) in enumerate(zip(zip(*rows), dtypes)):
+                if dtype == "day":
+                    chunks[idx].append(np.array(values, dtype="datetime64[D]").astype(np.int32))
+                else:
+                    chunks[idx].append(np.array(values, dtype=dtype))
+        return [
+            np.concatenate(chunk) if chunk else np.array([], dtype=np.int32 if dtype == "day" else dtype)
+            for chunk, dtype in zip(chunks, dtypes)
+        ]
+
+    @classmethod
+    def fetch_tables(cls, session) -> Tuple:
+        """
+        Fetch the columns of the receipt, product and customer tables through a session or a connection.
+        :param session: sqlalchemy.orm.Session | sqlalchemy.engine.Connection
+        :return: Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray]] - arguments of `build`
+        """
+        receipt = cls.fetch(session, cls.RECEIPT_SQL, (np.int32, np.int32, np.int32, "day", np.int32))
+        product = cls.fetch(session, cls.PRODUCT_SQL, (np.int32, object))
+        customer = cls.fetch(session, cls.CUSTOMER_SQL, (np.int32, object, object, np.int32))
+        session.commit()
+        return receipt, product, customer
+
+    @classmethod
+    def load(cls, session, version: int) -> "ColumnStore":
+        """
+        Load the tables of the database through a session or a connection.
+        :param session: sqlalchemy.orm.Session | sqlalchemy.engine.Connection
+        :param version: int - version of the loaded dataset
+        :return: ColumnStore
+        """
+        started = time.perf_counter()
+        tables = cls.fetch_tables(session)
+        store = cls.build(version, *tables)
+        LOGGER.info("Loaded {} receipts of dataset version {} into memory in {:.2f}s.".format(
+            len(tables[0][0]), version, time.perf_counter() - started))
+        return store
+
+    def birthdays(self, date: datetime.date) -> List[tuple]:
+        key = date.month * 100 + date.day
+        start, end = np.searchsorted(self.birthday_keys, [key, key + 1])
+        return list(zip(self.birthday_ids[start:end].tolist(), self.birthday_names[start:end].tolist()))
+
+    def top_selling_products(self, year: int, limit: int = 10) -> List[tuple]:
+        idx = int(np.searchsorted(self.sales_years, year))
+        if idx == len(self.sales_years) or self.sales_years[idx] != year:
+            return []
+        part = slice(self.sales_offsets[idx], self.sales_offsets[idx + 1])
+        products, totals = self.sales_products[part], self.sales_totals[part]
+        if len(products) > limit:
+            # Products, which are tied with the last one, are kept, so that ties are broken by id.
+            threshold = np.partition(totals, len(totals) - limit)[len(totals) - limit]
+            keep = totals >= threshold
+            products, totals = products[keep], totals[keep]
+        order = np.lexsort((products, -totals))[:limit]
+        return list(zip(self.product_names[products[order]].tolist(), totals[order].tolist()))
+
+    def last_order_per_customer(self, cursor: int = None, limit: int = None) -> List[tuple]:
+        start = 0 if cursor is None else int(np.searchsorted(self.last_order_ids, cursor, side="right"))
+        end = len(self.last_order_ids) if limit is None else start + limit
+        days = np.asarray(self.last_order_days[start:end])
+        return list(zip(
+            self.last_order_ids[start:end].tolist(),
+            self.last_order_emails[start:end].tolist(),
+            np.datetime_as_string(days.astype("datetime64[D]"), unit="D").tolist(),
+        ))
@@ -0,0 +1,105 @@
+import unittest
+
+
+from sqlalchemy import text
+
+
+from api.reader import DataReader
+
+
+class AggregatesTest(unittest.TestCase):
+    def test_product_year_sales(self):
+        reader = DataReader()
+        live = reader.session.execute(text("""
+        SELECT d.year_id, r.product_id, SUM(r.quantity)
+        FROM receipt r
+        JOIN date d ON d.transaction_date = r.transaction_date
+        WHERE r.product_id IS NOT NULL
+        GROUP BY d.year_id, r.product_id
+        """)).all()
+        aggregate = reader.session.execute(text("""
+        SELECT year_id, product_id, quantity
+        FROM product_year_sales
+        """)).all()
+        self.assertGreater(len(live), 0)
+        self.assertEqual(sorted(tuple(row) for row in aggregate), sorted(tuple(row) for row in live))
+
+    def test_sales_rollup(self):
+        reader = DataReader()
+        live = reader.session.execute(text("""
+        SELECT r.transaction_date, r.sales_outlet_id, r.product_id, SUM(r.quantity), SUM(r.line_item_amount)
+        FROM receipt r
+        JOIN date d ON d.transaction_date = r.transaction_date
+        JOIN product p ON p.product_id = r.product_id
+        WHERE r.sales_outlet_id IS NOT NULL
+        GROUP BY r.transaction_date, r.sales_outlet_id, r.product_id
+        """)).all()
+        aggregate = reader.session.execute(text("""
+        SELECT transaction_date, sales_outlet_id, product_id, quantity, revenue
+        FROM sales_rollup
+        """)).all()
+        self.assertGreater(len(live), 0)
+        self.assertEqual(
+            sorted((row[0], row[1], row[2], row[3], round(row[4], 2)) for row in aggregate),
+            sorted((row[0], row[1], row[2], row[3], round(row[4], 2)) for row in live))
+
+    def test_top_products(self):
+        reader = DataReader()
+        live = reader.session.execute(text("""
+        SELECT p.product, SUM(r.quantity), SUM(r.line_item_amount)
+        FROM receipt r
+        JOIN product p ON p.product_id = r.product_id
+        JOIN date d ON d.transaction_date = r.transaction_date
+        WHERE d.year_id = :year AND d.month_id = :month AND r.sales_outlet_id = :outlet
+            AND p.product_category = :category
+        GROUP BY p.product_id, p.product
+        ORDER BY SUM(r.quantity) DESC, p.product_id ASC
+        LIMIT 5
+        """), dict(year=2019, month=4, outlet=3, category="Coffee")).all()
+        products = reader.engine.read_top_products(5, 2019, "month", 4, 3, "Coffee")
+        self.assertEqual(len(products), 5)
+        self.assertEqual([(product.product_name, product.quantity, product.revenue) for product in products],
+                         [(row[0], row[1], round(row[2], 2)) for row in live])
+        self.assertEqual({product.product_category for product in products}, {"Coffee"})
+
+        # The products of a year are the same as the ones of the yearly summary.
+        self.assertEqual(
+            [(product.product_name, product.quantity) for product in reader.engine.read_top_products(10, 2019)],
+            [(product.product_name, product.total_sales) for product in reader.engine.read_top_selling_products(2019)])
+        self.assertEqual(reader.engine.read_top_products(10, 2019, "quarter", 1), [])
+        with self.assertRaises(ValueError):
+            reader.engine.top_products_statement(10, 2019, "month")
+
+    def test_customer_last_order(self):
+        reader = DataReader()
+        live = reader.session.execute(text("""
+        SELECT r.customer_id, MAX(r.transaction_date)
+        FROM receipt r
+        JOIN customer c ON c.customer_id = r.customer_id
+        GROUP BY r.customer_id
+        """)).all()
+        aggregate = reader.session.execute(text("""
+        SELECT customer_id, last_order_date
+        FROM customer_last_order
+        """)).all()
+        self.assertGreater(len(live), 0)
+        self.assertEqual(sorted(tuple(row) for row in aggregate), sorted(tuple(row) for row in live))
+
+    def test_top_selling_products(self):
+        reader = DataReader()
+        live = reader.session.execute(text("""
+        SELECT p.product, SUM(r.quantity)
+        FROM receipt r
+        JOIN product p ON p.product_id = r.product_id
+        JOIN date d ON d.transaction_date = r.transaction_date
+        WHERE d.year_id = :year
+        GROUP BY p.product_id, p.product
+        ORDER BY SUM(r.quantity) DESC
+        LIMIT 10
+        """), dict(year=2019)).all()
+        products = reader.engine.read_top_selling_products(2019)
+        self.assertEqual([product.total_sales for product in products], [row[1] for row in live])
+
+
+if __name__ == "__main__":
+    unittest.main()
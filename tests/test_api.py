@@ -0,0 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+
+from api.engine import AsyncMemoryEngine, MemoryEngine
+from api.main import app, get_reader
+from api.reader import AsyncDataReader
+from config import Config
+from loader.engine import DataLoadEngine
+from loader.models import db
+
+
+class ApiTest(unittest.TestCase):
+    def test_connection_reuse(self):
+        engine = AsyncDataReader().sql_engine.sync_engine
+        connections = []
+        checked_out = []
+        event.listen(engine, "connect", lambda *args: connections.append(args))
+        event.listen(engine, "checkout", lambda *args: checked_out.append(engine.pool.checkedout()))
+
+        urls = [
+            "/customers/birthday",
+            "/products/top-selling-products/2019",
+            "/customers/last-order-per-customer",
+        ] * 10
+
+        with TestClient(app) as client:
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                statuses = list(executor.map(lambda url: client.get(url).status_code, urls))
+
+            self.assertEqual(engine.pool.checkedout(), 0)
+
+        self.assertEqual(statuses, [200] * len(urls))
+        self.assertGreater(len(connections), 0)
+        self.assertLess(len(connections), len(urls))
+        self.assertLessEqual(max(checked_out), Config.READER_POOL_SIZE + Config.READER_MAX_OVERFLOW)
+
+    def test_memory_startup(self):
+        with mock.patch.object(Config, "READER_ENGINE", "memory"), \
+                mock.patch.object(AsyncMemoryEngine, "store") as store:
+            with TestClient(app):
+                store.assert_awaited_once()
+
+    def test_last_order_pagination(self):
+        url = "/customers/last-order-per-customer"
+        with TestClient(app) as client:
+            everyone = client.get(url).json()
+            self.assertIsNone(everyone["next_cursor"])
+
+            customers = []
+            params = {"limit": 1000}
+            while True:
+                page = client.get(url, params=params).json()
+                self.assertLessEqual(len(page["customers"]), 1000)
+                customers += page["customers"]
+                if page["next_cursor"] is None:
+                    break
+                params["cursor"] = page["next_cursor"]
+
+            self.assertEqual(client.get(url, params={"limit": 0}).status_code, 422)
+
+        self.assertEqual(customers, everyone["customers"])
+
+    def test_top_products(self):
+        url = "/products/top-selling-products"
+        with TestClient(app) as client:
+            yearly = client.get(url + "/2019").json()["products"]
+            products = client.get(url, params={"year": 2019}).json()["products"]
+            self.assertEqual([(product["product_name"], product["quantity"]) for product in products],
+                             [(product["product_name"], product["total_sales"]) for product in yearly])
+
+            products = client.get(url, params={"year": 2019, "grain": "week", "period": 15, "limit": 3,
+                                               "outlet": 5, "category": "Tea"}).json()["products"]
+            self.assertEqual(len(products), 3)
+            self.assertEqual({product["product_category"] for product in products}, {"Tea"})
+
+            by_year = client.get(url + "/by-year", params={"year": [2019, 2018]}).json()["years"]
+            self.assertEqual(by_year, [dict(year=2018, products=[]), dict(year=2019, products=yearly)])
+            self.assertEqual(client.get(url + "/by-year").status_code, 422)
+
+            self.assertEqual(client.get(url, params={"year": 2019, "grain": "month"}).status_code, 422)
+            self.assertEqual(client.get(url, params={"year": 2019, "grain": "month", "period": 13}).status_code, 422)
+            self.assertEqual(client.get(url, params={"year": 2019, "grain": "day"}).status_code, 422)
+
+    def test_top_products_snapshot(self):
+        async def get_snapshot_reader():
+            async with AsyncDataReader("snapshot:///" + directory) as reader:
+                yield reader
+
+        url = "/products/top-selling-products"
+        MemoryEngine.clear()
+        AsyncDataReader.cache.clear()
+        app.dependency_overrides[get_reader] = get_snapshot_reader
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                with db.engine.connect() as connection:
+                    DataLoadEngine.write_snapshot(connection, directory)
+                with TestClient(app) as client:
+                    self.assertEqual(client.get(url + "/2019").status_code, 200)
+                    response = client.get(url, params={"year": 2019})
+        finally:
+            app.dependency_overrides.clear()
+            MemoryEngine.clear()
+
+        self.assertEqual(response.status_code, 501)
+        self.assertIn("sales rollup", response.json()["detail"])
+
+    def test_cache_endpoint(self):
+        with TestClient(app) as client:
+            self.assertEqual(client.get("/cache").status_code, 404)
+            with mock.patch.object(Config, "ADMIN_TOKEN", "secret"):
+                self.assertEqual(client.get("/cache").status_code, 401)
+                response = client.get("/cache", headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"hits", "misses", "size", "maxsize", "version"})
+
+    def test_openapi_schemas(self):
+        with TestClient(app) as client:
+            paths = client.get("/openapi.json").json()["paths"]
+
+        schemas = {
+            "/customers/birthday": "BirthdayResponse",
+            "/products/top-selling-products/{year}": "TopSellingProductResponse",
+            "/customers/last-order-per-customer": "LastOrderPerCustomerResponse",
+        }
+        for path, schema in schemas.items():
+            content = paths[path]["get"]["responses"]["200"]["content"]["application/json"]
+            self.assertEqual(content["schema"]["$ref"], "#/components/schemas/" + schema)
+
+    def test_last_order_stream(self):
+        url = "/customers/last-order-per-customer"
+        with TestClient(app) as client:
+            everyone = client.get(url).json()["customers"]
+
+            response = client.get(url + "/stream")
+            self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+            self.assertEqual([json.loads(line) for line in response.text.splitlines()], everyone)
+
+            response = client.get(url + "/stream", params={"format": "json"})
+            self.assertEqual(response.headers["content-type"], "application/json")
+            self.assertEqual(response.json(), everyone)
+
+            response = client.get(url + "/stream", params={"format": "json", "cursor": everyone[-1]["customer_id"]})
+            self.assertEqual(response.json(), [])
+
+    def test_metrics(self):
+        with TestClient(app) as client:
+            self.assertEqual(client.get("/metrics").status_code, 404)
+
+            with mock.patch.object(Config, "METRICS_ENABLED", True):
+                AsyncDataReader.cache.clear()
+                self.assertEqual(client.get("/products/top-selling-products/2019").status_code, 200)
+                response = client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('route="/products/top-selling-products/{year:int}"', response.text)
+        self.assertIn('method="read_top_selling_products"', response.text)
+        self.assertIn('coffeeshop_pool_checked_out{reader="async"', response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,40 @@
+import csv
+import datetime
 import os
+import tempfile
+import tracemalloc
 import unittest
+from unittest import mock
+import zipfile
+from prometheus_client import generate_latest
+from sqlalchemy import Index, create_engine, inspect
+from sqlalchemy.dialects import mysql
 from loader.engine import DataLoadEngine
-from loader.models import Test, db
+from loader.mapping import MAPPING
+from loader.metrics import loader_registry
+from loader.models import Customer, LoadState, ProductYearSales, Receipt, Test, db
+from loader.transform import BatchTransformer
+from loader.validate import KeyValidator
+from loader.writer import MySQLWriter
 
 
 class LoaderTest(unittest.TestCase):
-    def test_simple(self):
+    ARCHIVE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "test.zip")
+
+    def setUp(self):
+        LoadState.query.filter_by(file="test.csv").delete()
+        db.session.commit()
+
+    def tearDown(self):
+        LoadState.query.filter_by(file="test.csv").delete()
+        db.session.commit()
+
+    @classmethod
+    def loader(cls, duplicate: bool = True, **options) -> DataLoadEngine:
+        # With `duplicate`, the row with id 3 is mapped to id 2, and is rejected.
+        transform_columns = [("square", lambda x: int(x) * int(x))]
+        if duplicate:
+            transform_columns.insert(0, ("id", lambda x: 2 if x == "3" else int(x)))
         mapping = [
             {
                 "file": "test.csv",
@@ -13,25 +42,253 @@ class LoaderTest(unittest.TestCase):
                 "rename_columns": [
                     ("id_2", "square"),
                 ],
-                "transform_columns": [
-                    ("square", lambda x: int(x) * int(x)),
-                ],
+                "transform_columns": transform_columns,
             },
         ]
-        loader = DataLoadEngine(mapping=mapping, db=db)
+        return DataLoadEngine(mapping=mapping, db=db, **options)
+
+    @classmethod
+    def pop_rows(cls) -> list:
+        # Ids and squares of the loaded rows, which are deleted.
+        rows = sorted((item.id, item.square) for item in Test.query.all())
+        Test.query.delete()
+        db.session.commit()
+        return rows
+
+    def test_simple(self):
+        self.loader(duplicate=False).run(self.ARCHIVE)
+        self.assertEqual(self.pop_rows(), [(1, 1), (2, 4), (3, 9), (4, 16), (5, 25)])
+
+    def test_rejected_rows(self):
+        self.loader(batch_size=2).run(self.ARCHIVE)
+        self.assertEqual([row[0] for row in self.pop_rows()], [1, 2, 4, 5])
+
+    def test_fast(self):
+        self.loader(fast=True).run(self.ARCHIVE)
+        self.assertEqual(self.pop_rows(), [(1, 1), (2, 4), (4, 16), (5, 25)])
+
+    def test_metrics(self):
+        loader = self.loader(batch_size=2)
+        loader.run(self.ARCHIVE)
+        self.pop_rows()
+
+        stats = loader.stats["test.csv"]
+        self.assertEqual((stats["rows"], stats["rejected"]), (4, 1))
+        self.assertEqual(set(stats["stages"]), {"read", "transform", "write", "indexes"})
+        self.assertEqual(set(loader.timings), {"files", "aggregates"})
+
+        metrics = generate_latest(loader_registry(loader)).decode()
+        self.assertIn('coffeeshop_loader_rows{file="test.csv"} 4.0', metrics)
+        self.assertIn('coffeeshop_loader_rejected_rows{file="test.csv"} 1.0', metrics)
+        self.assertIn('coffeeshop_loader_stage_seconds{file="test.csv",stage="write"}', metrics)
+
+    def test_quarantine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            loader = self.loader(batch_size=2, quarantine=tmp)
+            with mock.patch.object(loader.writer, "write", wraps=loader.writer.write) as write:
+                loader.run(self.ARCHIVE)
+            with open(os.path.join(tmp, "test.rejected.csv"), newline="") as fp:
+                rejected = list(csv.reader(fp))
+        self.pop_rows()
+
+        # The duplicate of the previous batch is rejected before the insert, so it is never written.
+        self.assertEqual(write.call_count, 3)
+        self.assertNotIn((2, 9), [row for args in write.call_args_list for row in args[0][3]])
+        self.assertEqual(rejected, [["id", "id_2", "reason"], ["3", "3", "duplicate primary key (id) (2)"]])
+        stats = loader.stats["test.csv"]
+        self.assertEqual((stats["rows"], stats["rejected"], stats["invalid"]), (4, 1, 1))
+
+    def test_drop_indexes(self):
+        # The indexes are dropped in a scratch database, so that the one of the other tests is not changed.
+        table = Receipt.__table__
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        engine = create_engine("sqlite:///{}".format(path))
+        try:
+            db.metadata.create_all(engine, tables=[table])
+            with engine.connect() as connection:
+                DataLoadEngine.drop_indexes(connection, table)
+                dropped = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+                DataLoadEngine.create_indexes(connection, table)
+                restored = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+        finally:
+            engine.dispose()
+            os.remove(path)
 
-        archive = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "test.zip")
+        names = {index.name for index in table.indexes}
+        self.assertFalse(names & dropped)
+        self.assertLessEqual(names, restored)
 
-        loader.run(archive)
+        # InnoDB refuses to drop the indexes, which back the foreign keys of customer_id and transaction_date.
+        connection = mock.Mock()
+        connection.dialect.name = "mysql"
+        with mock.patch.object(Index, "drop") as drop:
+            DataLoadEngine.drop_indexes(connection, table)
+        drop.assert_not_called()
+        self.assertTrue(all(DataLoadEngine.backs_foreign_key(table, index) for index in table.indexes))
+        self.assertFalse(any(DataLoadEngine.backs_foreign_key(ProductYearSales.__table__, index)
+                             for index in ProductYearSales.__table__.indexes))
 
-        ctr = 0
-        for item in Test.query.all():
-            ctr += 1
-            self.assertEqual(item.id * item.id, item.square)
-            db.session.delete(item)
+    def test_mysql_upsert(self):
+        # Rows referenced by foreign keys are merged with ON DUPLICATE KEY UPDATE instead of replaced.
+        connection = mock.Mock()
+        connection.dialect = mysql.dialect()
+        cursor = connection.connection.cursor.return_value
+        cursor.rowcount = 2
+        rows = [(1, "a"), (2, "b")]
+        self.assertEqual(MySQLWriter(None).bulk_write(connection, Customer.__table__, ["customer_id", "name"], rows,
+                                                      upsert=True), 2)
 
+        load = cursor.execute.call_args[0][0]
+        self.assertIn("INTO TABLE load_customer", load)
+        self.assertNotIn("REPLACE", load)
+        self.assertEqual([args[0][0] for args in connection.exec_driver_sql.call_args_list], [
+            "DROP TEMPORARY TABLE IF EXISTS load_customer",
+            "CREATE TEMPORARY TABLE load_customer LIKE customer",
+            "INSERT INTO customer (customer_id, name) SELECT customer_id, name FROM load_customer "
+            "ON DUPLICATE KEY UPDATE name = VALUES(name)",
+            "DROP TEMPORARY TABLE load_customer",
+        ])
+
+    def test_key_validator(self):
+        columns = ["transaction_id", "transaction_date", "transaction_time", "sales_outlet_id", "staff_id",
+                   "customer_id", "order", "line_item_id", "product_id"]
+        references = {
+            "date": {(datetime.date(2019, 4, 1), )},
+            "sales_outlet": {(3, )},
+            "staff": {(15, )},
+            "customer": {(5, )},
+            "product": {(87, )},
+        }
+        validator = KeyValidator(
+            Receipt.__table__, columns, lambda constraint: references[constraint.referred_table.name])
+
+        date, time = datetime.date(2019, 4, 1), datetime.time(7, 6, 11)
+        rows = [
+            ("1", date, time, "3", "15", 5, "1", "1", "87"),
+            ("2", date, time, "3", "15", None, "1", "1", "87"),
+            ("1", date, time, "3", "15", 5, "1", "1", "87"),
+            ("3", date, time, "3", "15", 5, "1", "1", "99"),
+            ("4", date, time, "x", "15", 5, "1", "1", "87"),
+            ("", date, time, "3", "15", 5, "1", "1", "87"),
+        ]
+        self.assertEqual(validator.validate(rows), [
+            None,
+            None,
+            "duplicate primary key (transaction_id, transaction_date, transaction_time, sales_outlet_id, "
+            "order, line_item_id) (1, 2019-04-01, 07:06:11, 3, 1, 1)",
+            "unknown (product_id) (99)",
+            "invalid value of (sales_outlet_id)",
+            "invalid primary key (transaction_id, transaction_date, transaction_time, sales_outlet_id, "
+            "order, line_item_id)",
+        ])
+        self.assertEqual(validator.rejected, 4)
+        self.assertEqual(len(validator.keys), 2)
+
+        # The keys are remembered across the batches up to the capacity, beyond which a warning is logged.
+        validator = KeyValidator(
+            Receipt.__table__, columns, lambda constraint: references[constraint.referred_table.name], 2)
+        self.assertEqual(validator.validate(rows[:2]), [None, None])
+        self.assertTrue(validator.validate(rows[2:3])[0].startswith("duplicate primary key"))
+        with self.assertLogs("loader.validate", "WARNING"):
+            self.assertEqual(validator.validate([("5", date, time, "3", "15", 5, "1", "1", "87")]), [None])
+        self.assertEqual(len(validator.keys), 2)
+        self.assertTrue(validator.validate(rows[:1])[0].startswith("duplicate primary key"))
+
+    def test_resume(self):
+        self.loader(duplicate=False, batch_size=2).run(self.ARCHIVE)
+        state = LoadState.query.get("test.csv")
+        self.assertTrue(state.completed)
+        self.assertEqual(state.row_offset, 5)
+
+        # Unchanged files are skipped.
+        Test.query.filter(Test.id >= 4).delete()
+        db.session.commit()
+        self.loader(duplicate=False, batch_size=2).run(self.ARCHIVE)
+        self.assertEqual(Test.query.count(), 3)
+
+        # Partially loaded files are resumed from the last committed row.
+        Test.query.filter(Test.id == 3).update({"square": 0})
+        state.row_offset = 2
+        state.completed = False
         db.session.commit()
-        self.assertEqual(ctr, 5)
+        self.loader(duplicate=False, batch_size=2).run(self.ARCHIVE)
+        self.assertEqual(self.pop_rows(), [(1, 1), (2, 4), (3, 9), (4, 16), (5, 25)])
+
+    def test_transformer(self):
+        calls = []
+
+        def parse(x):
+            calls.append(x)
+            return int(x) * 10
+
+        rule = {
+            "file": "test.csv",
+            "model": Test,
+            "rename_columns": [
+                ("id_2", "square"),
+            ],
+            "transform_columns": [
+                ("square", parse),
+            ],
+            "memoize_columns": ["square"],
+            "derive_columns": [
+                ("plus_one", "square", lambda x: x + 1),
+            ],
+        }
+        self.assertTrue(DataLoadEngine.prepare_mapping_rule(rule))
+
+        transformer = BatchTransformer(rule, ["id", "", "id_2"])
+        self.assertEqual(transformer.columns, ["id", "square", "plus_one"])
+        self.assertEqual(
+            transformer.transform([["1", "x", "2"], ["2", "y", "2"], ["3", "z", "3"]]),
+            [("1", 20, 21), ("2", 20, 21), ("3", 30, 31)],
+        )
+        self.assertEqual(calls, ["2", "3"])
+
+    def test_dependencies(self):
+        graph = DataLoadEngine.dependencies(MAPPING)
+        files = [rule["file"] for rule in MAPPING]
+
+        def depends_on(file):
+            return {files[idx] for idx in graph[files.index(file)]}
+
+        self.assertEqual(depends_on("staff.csv"), set())
+        self.assertEqual(depends_on("product.csv"), set())
+        self.assertEqual(depends_on("Dates.csv"), set())
+        self.assertEqual(depends_on("generations.csv"), set())
+        self.assertEqual(depends_on("sales_outlet.csv"), {"staff.csv"})
+        self.assertEqual(depends_on("customer.csv"), {"sales_outlet.csv", "generations.csv"})
+        self.assertEqual(depends_on("sales_reciepts.csv"), {
+            "Dates.csv", "sales_outlet.csv", "staff.csv", "customer.csv", "product.csv",
+        })
+
+    def test_streaming_reader(self):
+        rows = 200000
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, "large.zip")
+            with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                with zf.open("large.csv", "w") as fp:
+                    fp.write(b"id,name,description\n")
+                    for i in range(rows):
+                        fp.write("{},name {},{}\n".format(i, i, "x" * 80).encode())
+
+            with zipfile.ZipFile(archive) as zf:
+                size = zf.getinfo("large.csv").file_size
+                with zf.open("large.csv") as fp:
+                    tracemalloc.start()
+                    ctr = 0
+                    reader = DataLoadEngine.fp_to_rows(fp)
+                    header = next(reader)
+                    for row in reader:
+                        ctr += 1
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+
+        self.assertEqual(header, ["id", "name", "description"])
+        self.assertEqual(ctr, rows)
+        self.assertGreater(size, 16 * 1024 * 1024)
+        self.assertLess(peak, 1024 * 1024)
 
 
 if __name__ == "__main__":
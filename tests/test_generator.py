@@ -0,0 +1,76 @@
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+
+from config import Config
+from loader.engine import DataLoadEngine
+from loader.generator import DatasetGenerator
+from loader.mapping import MAPPING
+from loader.transform import BatchTransformer
+
+
+class GeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def generate(self, name: str, **kwargs) -> str:
+        path = os.path.join(self.directory.name, name)
+        with DatasetGenerator(Config.DATASET_ARCHIVE, **kwargs) as generator:
+            generator.run(path)
+        return path
+
+    @classmethod
+    def read(cls, archive: zipfile.ZipFile, file: str) -> list:
+        with archive.open(file) as fp:
+            return list(csv.reader(io.TextIOWrapper(fp, encoding="utf-8", newline="")))
+
+    def test_deterministic(self):
+        digests = []
+        for name, seed in (("a.zip", 1), ("b.zip", 1), ("c.zip", 2)):
+            with open(self.generate(name, scale=0.05, seed=seed), "rb") as fp:
+                digests.append(hashlib.sha256(fp.read()).hexdigest())
+        self.assertEqual(digests[0], digests[1])
+        self.assertNotEqual(digests[0], digests[2])
+
+    def test_archive(self):
+        path = self.generate("dataset.zip", scale=0.05, years=2)
+        with zipfile.ZipFile(Config.DATASET_ARCHIVE) as sample, zipfile.ZipFile(path) as archive:
+            self.assertEqual(sorted(archive.namelist()), sorted(sample.namelist()))
+
+            tables = dict()
+            for rule in MAPPING:
+                rule = dict(rule)
+                self.assertTrue(DataLoadEngine.prepare_mapping_rule(rule))
+                rows = self.read(archive, rule["file"])
+                self.assertEqual(rows[0], self.read(sample, rule["file"])[0])
+                transformer = BatchTransformer(rule, rows[0])
+                tables[rule["file"]] = [dict(zip(transformer.columns, row)) for row in transformer.transform(rows[1:])]
+
+        dates = {row["transaction_date"] for row in tables["Dates.csv"]}
+        self.assertEqual(len(dates), 731)
+        customers = {int(row["customer_id"]) for row in tables["customer.csv"]}
+        self.assertEqual(len(customers), round(2246 * 0.05))
+        products = {int(row["product_id"]) for row in tables["product.csv"]}
+        generations = {row["birth_year"] for row in tables["generations.csv"]}
+        self.assertTrue({row["birth_year"] for row in tables["customer.csv"]} <= generations)
+
+        receipts = tables["sales_reciepts.csv"]
+        self.assertTrue({row["transaction_date"] for row in receipts} <= dates)
+        self.assertEqual({row["transaction_date"].year for row in receipts}, {2019, 2020, 2021})
+        self.assertTrue({row["customer_id"] for row in receipts} - {None} <= customers)
+        self.assertTrue({int(row["product_id"]) for row in receipts} <= products)
+        keys = {(row["transaction_id"], row["transaction_date"], row["transaction_time"], row["sales_outlet_id"],
+                 row["order"], row["line_item_id"]) for row in receipts}
+        self.assertEqual(len(keys), len(receipts))
+
+
+if __name__ == "__main__":
+    unittest.main()
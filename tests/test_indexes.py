@@ -0,0 +1,65 @@
+import unittest
+
+
+from sqlalchemy import func, select, text
+
+
+from loader.aggregates import AGGREGATES
+from loader.models import CustomerLastOrder, ProductYearSales, Receipt, db
+
+
+def explain(statement) -> str:
+    """
+    Query plan of a statement in the dialect of the database.
+    Sequential scans are disabled in PostgreSQL, because the tables of the tests are small.
+    :param statement: sqlalchemy.sql.Select
+    :return: str
+    """
+    with db.engine.connect() as connection:
+        dialect = connection.dialect.name
+        sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        if dialect == "sqlite":
+            rows = connection.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+        elif dialect == "postgresql":
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+            rows = connection.execute(text("EXPLAIN " + sql)).all()
+        elif dialect == "mysql":
+            rows = connection.execute(text("EXPLAIN " + sql)).all()
+        else:
+            raise NotImplementedError
+        connection.rollback()
+    return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+
+class IndexesTest(unittest.TestCase):
+    def aggregate(self, model):
+        return next(aggregate["query"] for aggregate in AGGREGATES if aggregate["model"] is model)
+
+    def test_customer_last_order(self):
+        plan = explain(self.aggregate(CustomerLastOrder))
+        self.assertIn("ix_receipt_customer_date", plan)
+        if db.engine.dialect.name == "sqlite":
+            self.assertIn("COVERING INDEX ix_receipt_customer_date", plan)
+
+    def test_product_year_sales(self):
+        plan = explain(self.aggregate(ProductYearSales))
+        self.assertIn("ix_receipt_date_product_quantity", plan)
+
+    def test_products_in_date_range(self):
+        receipt = Receipt.__table__
+        statement = select(
+            receipt.c.product_id,
+            func.sum(receipt.c.quantity),
+        ).where(
+            receipt.c.transaction_date.between("2019-04-01", "2019-04-07")
+        ).group_by(
+            receipt.c.product_id,
+        )
+        plan = explain(statement)
+        self.assertIn("ix_receipt_date_product_quantity", plan)
+        if db.engine.dialect.name == "sqlite":
+            self.assertIn("COVERING INDEX ix_receipt_date_product_quantity", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
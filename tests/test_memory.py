@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+import threading
+import unittest
+from unittest import mock
+
+
+from api.engine import AsyncMemoryEngine, MemoryEngine
+from api.reader import AsyncDataReader, DataReader
+from snapshot import ColumnStore
+
+
+class MemoryEngineTest(unittest.TestCase):
+    def setUp(self):
+        MemoryEngine.clear()
+        self.reader = DataReader()
+        self.sql = self.reader.engine
+        if isinstance(self.sql, MemoryEngine):
+            self.sql = self.sql.fallback
+        self.memory = MemoryEngine(self.reader, self.sql)
+
+    def tearDown(self):
+        self.reader.close()
+        MemoryEngine.clear()
+
+    def test_birthdays(self):
+        date = datetime.date(2019, 1, 1)
+        found = 0
+        while date.year == 2019:
+            birthdays = self.memory.read_birthdays(date)
+            self.assertEqual(birthdays, self.sql.read_birthdays(date))
+            found += len(birthdays)
+            date += datetime.timedelta(days=1)
+        self.assertGreater(found, 0)
+
+    def test_top_selling_products(self):
+        for year in (2018, 2019, 2020):
+            self.assertEqual(self.memory.read_top_selling_products(year), self.sql.read_top_selling_products(year))
+        self.assertEqual(len(self.memory.read_top_selling_products(2019)), 10)
+        self.assertEqual(self.memory.read_top_selling_products_by_year([2018, 2019], 5),
+                         self.sql.read_top_selling_products_by_year([2018, 2019], 5))
+
+    def test_last_order_per_customer(self):
+        users = self.sql.read_last_order_per_customer()
+        self.assertEqual(self.memory.read_last_order_per_customer(), users)
+        self.assertEqual(self.memory.read_last_order_per_customer(users[99].customer_id, 50), users[100:150])
+        batches = list(self.memory.stream_last_order_per_customer(1000))
+        self.assertEqual([user for batch in batches for user in batch], users)
+
+    def test_version(self):
+        self.assertEqual(self.memory.read_dataset_version(), self.sql.read_dataset_version())
+
+    def test_fallback(self):
+        with mock.patch.object(ColumnStore, "load", side_effect=RuntimeError("no memory")):
+            self.assertEqual(self.memory.read_top_selling_products(2019), self.sql.read_top_selling_products(2019))
+
+            memory = MemoryEngine(self.reader, self.sql, use_fallback=False)
+            with self.assertRaises(RuntimeError):
+                memory.read_top_selling_products(2019)
+
+    def test_async(self):
+        async def read():
+            async with AsyncDataReader() as async_reader:
+                sql = async_reader.engine
+                if isinstance(sql, AsyncMemoryEngine):
+                    sql = sql.fallback
+                memory = AsyncMemoryEngine(async_reader, sql)
+                result = (
+                    await memory.read_birthdays(datetime.date(2019, 3, 10)),
+                    await memory.read_top_selling_products(2019),
+                    await memory.read_last_order_per_customer(),
+                )
+            await AsyncDataReader.dispose()
+            return result
+
+        birthdays, products, users = asyncio.run(read())
+        self.assertEqual(birthdays, self.sql.read_birthdays(datetime.date(2019, 3, 10)))
+        self.assertEqual(products, self.sql.read_top_selling_products(2019))
+        self.assertEqual(users, self.sql.read_last_order_per_customer())
+
+    def test_async_load(self):
+        threads = []
+        build = ColumnStore.build
+
+        def build_in_thread(*args):
+            threads.append(threading.get_ident())
+            return build(*args)
+
+        async def load():
+            readers = [AsyncDataReader() for _ in range(5)]
+            engines = []
+            for reader in readers:
+                sql = reader.engine
+                if isinstance(sql, AsyncMemoryEngine):
+                    sql = sql.fallback
+                engines.append(AsyncMemoryEngine(reader, sql))
+            try:
+                return await asyncio.gather(*(engine.store() for engine in engines))
+            finally:
+                for reader in readers:
+                    await reader.close()
+                await AsyncDataReader.dispose()
+
+        # Concurrent requests wait for one load, whose columns are arranged outside of the event loop.
+        with mock.patch.object(ColumnStore, "build", side_effect=build_in_thread):
+            stores = asyncio.run(load())
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+        self.assertTrue(all(store is stores[0] for store in stores))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+import unittest
+from unittest import mock
+
+
+from fastapi.testclient import TestClient
+
+
+from api.main import app
+from api.profiler import QueryProfiler
+from api.reader import AsyncDataReader, DataReader
+from config import Config
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.profiler = QueryProfiler(0, 2)
+        self.reader = DataReader()
+        self.profiler.attach(self.reader.sql_engine)
+
+    def tearDown(self):
+        self.profiler.detach(self.reader.sql_engine)
+        self.reader.close()
+
+    def test_slow_queries(self):
+        sql = self.reader.engine
+        sql = getattr(sql, "fallback", None) or sql
+        sql.read_top_selling_products(2019)
+        sql.read_last_order_per_customer(None, 10)
+        sql.read_dataset_version()
+
+        queries = self.profiler.slow_queries()
+        self.assertEqual(len(queries), 2)
+        self.assertIn("dataset_version", queries[0]["statement"])
+        self.assertIn("customer_last_order", queries[1]["statement"])
+        parameters = queries[1]["parameters"]
+        self.assertEqual(set(parameters.values() if isinstance(parameters, dict) else parameters), {"***"})
+        for query in queries:
+            self.assertGreaterEqual(query["duration_ms"], 0)
+            self.assertTrue(query["plan"])
+
+        statements = self.profiler.statements()
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(sum(stats["count"] for stats in statements), 3)
+
+        # Streamed results are recorded without a plan.
+        list(sql.stream_last_order_per_customer(100))
+        self.assertIsNone(self.profiler.slow_queries()[0]["plan"])
+
+    def test_async(self):
+        async def read():
+            async with AsyncDataReader() as reader:
+                engine = reader.sql_engine.sync_engine
+                self.profiler.attach(engine)
+                try:
+                    sql = reader.engine
+                    sql = getattr(sql, "fallback", None) or sql
+                    await sql.read_birthdays(datetime.date(2019, 3, 10))
+                finally:
+                    self.profiler.detach(engine)
+            await AsyncDataReader.dispose()
+
+        asyncio.run(read())
+        queries = self.profiler.slow_queries()
+        self.assertIn("birth_month_day", queries[0]["statement"])
+        self.assertTrue(queries[0]["plan"])
+
+    def test_endpoint(self):
+        url = "/admin/slow-queries"
+        with TestClient(app) as client:
+            self.assertEqual(client.get(url).status_code, 404)
+            with mock.patch.object(Config, "ADMIN_TOKEN", "secret"):
+                self.assertEqual(client.get(url).status_code, 401)
+                self.assertEqual(client.get(url, headers={"Authorization": "Bearer wrong"}).status_code, 401)
+                response = client.get(url, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"enabled", "threshold_ms", "statements", "queries"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,16 @@
+import asyncio
 import datetime
+import os
+import tempfile
 import unittest
-from api.reader import DataReader
+from unittest import mock
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine.default import CACHE_HIT
+from api.engine import PostgreSQLEngine, SqliteEngine
+from api.reader import AsyncDataReader, DataReader
+from config import Config
+from loader.engine import DataLoadEngine
+from loader.models import db
 
 
 class ReaderTest(unittest.TestCase):
@@ -15,6 +25,24 @@ class ReaderTest(unittest.TestCase):
         self.assertEqual(birthdays[5].customer_id, 8418)
         self.assertEqual(len(birthdays), 6)
 
+    def test_birthdays_index(self):
+        reader = DataReader()
+        statement, params = reader.engine.birthdays_statement(datetime.date(2020, 2, 29))
+        self.assertEqual(params, dict(month_day=229))
+        self.assertNotIn('birthdate', str(statement))
+
+        # Sequential scans are disabled in PostgreSQL, because the tables of the tests are small.
+        dialect = reader.sql_engine.dialect.name
+        if dialect == "sqlite":
+            rows = reader.session.execute(text("EXPLAIN QUERY PLAN " + statement.text), params).all()
+        else:
+            if dialect == "postgresql":
+                reader.session.execute(text("SET LOCAL enable_seqscan = off"))
+            rows = reader.session.execute(text("EXPLAIN " + statement.text), params).all()
+        reader.session.rollback()
+        plan = "\n".join(" ".join(str(value) for value in row) for row in rows)
+        self.assertIn("ix_customer_birth_month_day", plan)
+
     def test_top_selling_products(self):
         reader = DataReader()
         products = reader.read_top_selling_products(2019)
@@ -24,6 +52,46 @@ class ReaderTest(unittest.TestCase):
         self.assertEqual(products[3].product_name, 'Morning Sunrise Chai Rg')
         self.assertEqual(len(products), 10)
 
+    def test_top_selling_products_by_year(self):
+        reader = DataReader()
+        result = reader.read_top_selling_products_by_year([2020, 2019, 2018, 2019])
+        self.assertEqual(list(result), [2018, 2019, 2020])
+        for year, products in result.items():
+            self.assertEqual(products, reader.read_top_selling_products(year))
+        self.assertEqual(len(result[2019]), 10)
+
+        engine = reader.engine
+        engine = getattr(engine, "fallback", None) or engine
+        top = engine.read_top_selling_products_by_year([2019], 3)
+        self.assertEqual(top[2019], result[2019][:3])
+
+        # SQLite builds without window functions use a correlated count instead.
+        if isinstance(engine, SqliteEngine):
+            with mock.patch.object(SqliteEngine, "WINDOW_FUNCTIONS", False):
+                statement, params = engine.top_selling_products_by_year_statement([2019], 3)
+                self.assertNotIn("ROW_NUMBER", str(statement))
+                self.assertEqual(engine.read_top_selling_products_by_year([2019], 3), top)
+
+    def test_statement_cache(self):
+        reader = DataReader()
+        engine = reader.engine
+        engine = getattr(engine, "fallback", None) or engine
+        statement, params = engine.top_products_statement(10, 2019, "month", 4)
+        self.assertIs(DataReader().engine.top_products_statement(5, 2019, "month", 3)[0], statement)
+        self.assertIsNot(engine.top_products_statement(10, 2019, "week", 14)[0], statement)
+
+        products = engine.read_top_products(10, 2019, "month", 4)
+        result = engine.execute(statement, params)
+        self.assertEqual(engine.to_product_sales(result), products)
+        self.assertEqual(result.context.cache_hit, CACHE_HIT)
+
+        # PostgreSQL executes the statement, which is prepared once on the connection.
+        if isinstance(engine, PostgreSQLEngine) and engine.prepare:
+            name = engine.prepared_statement(statement, reader.sql_engine.dialect)[0]
+            names = reader.session.execute(text("SELECT name FROM pg_prepared_statements")).scalars().all()
+            self.assertIn(name, names)
+            self.assertEqual(PostgreSQLEngine(reader).read_top_products(10, 2019, "month", 4), products)
+
     def test_last_order_per_customer(self):
         reader = DataReader()
         users = reader.read_last_order_per_customer()
@@ -32,6 +100,69 @@ class ReaderTest(unittest.TestCase):
         self.assertEqual(users[0].customer_email, "Venus@adipiscing.edu")
         self.assertEqual(users[0].last_order_date, "2019-04-29")
 
+    def test_last_order_per_customer_page(self):
+        reader = DataReader()
+        users = reader.read_last_order_per_customer()
+        page = reader.read_last_order_per_customer(cursor=users[99].customer_id, limit=50)
+        self.assertEqual(page, users[100:150])
+        self.assertEqual(reader.read_last_order_per_customer(cursor=users[-1].customer_id, limit=50), [])
+
+        statement, params = reader.engine.last_order_per_customer_statement(cursor=10, limit=50)
+        self.assertEqual(params, dict(cursor=10, limit=50))
+
+    def test_last_order_per_customer_stream(self):
+        reader = DataReader()
+        batches = list(reader.stream_last_order_per_customer())
+        self.assertTrue(all(len(batch) <= Config.READER_STREAM_BATCH_SIZE for batch in batches))
+        self.assertEqual([user for batch in batches for user in batch], reader.read_last_order_per_customer())
+
+    def test_async_reader(self):
+        date = datetime.date.fromtimestamp(1678468782)
+        reader = DataReader()
+
+        async def read():
+            async with AsyncDataReader() as async_reader:
+                result = (
+                    await async_reader.read_birthdays(date),
+                    await async_reader.read_top_selling_products(2019),
+                    await async_reader.read_last_order_per_customer(),
+                )
+            await AsyncDataReader.dispose()
+            return result
+
+        birthdays, products, users = asyncio.run(read())
+        self.assertEqual(birthdays, reader.read_birthdays(date))
+        self.assertEqual(products, reader.read_top_selling_products(2019))
+        self.assertEqual(users, reader.read_last_order_per_customer())
+
+    def test_cache(self):
+        # The dataset version is bumped in a scratch database, so that the one of the other tests is not changed.
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        url = "sqlite:///{}".format(path)
+        engine = create_engine(url)
+        db.metadata.create_all(engine)
+        engine.dispose()
+
+        reader = DataReader(url)
+        DataReader.cache.clear()
+        try:
+            products = reader.read_top_selling_products(2019)
+            self.assertEqual(reader.read_top_selling_products(2019), products)
+            self.assertEqual(DataReader.cache.stats()["misses"], 1)
+            self.assertEqual(DataReader.cache.stats()["hits"], 1)
+
+            # A new load invalidates the cached results.
+            with reader.sql_engine.connect() as connection:
+                DataLoadEngine.bump_dataset_version(connection)
+            self.assertEqual(reader.read_top_selling_products(2019), products)
+            self.assertEqual(DataReader.cache.stats()["misses"], 2)
+            self.assertEqual(DataReader.cache.stats()["hits"], 1)
+        finally:
+            reader.close()
+            DataReader.dispose()
+            os.remove(path)
+
 
 if __name__ == "__main__":
     unittest.main()
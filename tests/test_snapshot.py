@@ -0,0 +1,76 @@
+import asyncio
+import datetime
+import os
+import tempfile
+import unittest
+
+
+import numpy as np
+
+
+from api.engine import MemoryEngine
+from api.reader import AsyncDataReader, DataReader
+from loader.engine import DataLoadEngine
+from loader.models import db
+from snapshot import DictionaryColumn, Snapshot
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        MemoryEngine.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        with db.engine.connect() as connection:
+            DataLoadEngine.write_snapshot(connection, self.directory.name)
+        self.sql = DataReader()
+        self.snapshot = DataReader("snapshot:///" + self.directory.name)
+
+    def tearDown(self):
+        self.sql.close()
+        self.directory.cleanup()
+        MemoryEngine.clear()
+
+    def test_dictionary_column(self):
+        values = np.array(["b", None, "a", "b", "ä"], dtype=object)
+        column = DictionaryColumn.encode(values)
+        self.assertEqual(len(column.data), 4)
+        self.assertEqual(column[:].tolist(), values.tolist())
+        self.assertEqual(column[np.array([4, 1])].tolist(), ["ä", None])
+
+    def test_directory(self):
+        self.assertEqual(DataReader("snapshot:////srv/snapshot").snapshot_directory, "/srv/snapshot")
+        self.assertEqual(DataReader("snapshot:///snapshot").snapshot_directory, "snapshot")
+
+    def test_reads(self):
+        self.assertEqual(self.snapshot.read_top_selling_products(2019), self.sql.read_top_selling_products(2019))
+        self.assertEqual(self.snapshot.read_top_selling_products(2018), [])
+        self.assertEqual(self.snapshot.read_last_order_per_customer(), self.sql.read_last_order_per_customer())
+        self.assertEqual(
+            self.snapshot.read_last_order_per_customer(100, 20), self.sql.read_last_order_per_customer(100, 20))
+        date = datetime.date(2019, 3, 10)
+        self.assertEqual(self.snapshot.read_birthdays(date), self.sql.read_birthdays(date))
+        self.assertIsInstance(self.snapshot.engine.store().birthday_ids, np.memmap)
+
+    def test_async(self):
+        async def read():
+            async with AsyncDataReader("snapshot:///" + self.directory.name) as reader:
+                return await reader.read_last_order_per_customer()
+
+        self.assertEqual(asyncio.run(read()), self.sql.read_last_order_per_customer())
+
+    def test_publish(self):
+        first = self.snapshot.engine.store()
+        with db.engine.connect() as connection:
+            second = DataLoadEngine.write_snapshot(connection, self.directory.name)
+            third = DataLoadEngine.write_snapshot(connection, self.directory.name)
+
+        # The snapshot before the current one is kept for the readers, which have just read its manifest.
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         sorted([Snapshot.MANIFEST, os.path.basename(second), os.path.basename(third)]))
+        self.assertEqual(first.last_order_ids.tolist(), self.snapshot.engine.store().last_order_ids.tolist())
+
+        MemoryEngine.clear()
+        self.assertEqual(self.snapshot.engine.store().path, os.path.basename(third))
+
+
+if __name__ == "__main__":
+    unittest.main()